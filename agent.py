@@ -1,11 +1,18 @@
 """LangGraph agent for crypto market analysis"""
-from typing import TypedDict, Annotated, Optional
-from langgraph.graph import StateGraph, END
+from typing import TypedDict, Annotated, Optional, AsyncIterator, Iterator, Tuple
 import asyncio
+import queue
+import threading
+import config
 from models import MarketData, MarketAnalysis
 from data_collector import get_data_collector
 from market_analyzer import get_market_analyzer
 from report_generator import get_report_generator
+from cache import TTLCache
+from incremental import IncrementalAnalyzer
+from history import HistoryStore, get_history_store
+from scheduler import RefreshScheduler, SymbolLeases
+from metrics import NODE_DURATION
 
 
 # Define state as TypedDict for LangGraph
@@ -16,6 +23,12 @@ class GraphState(TypedDict):
     analysis: Optional[MarketAnalysis]
     report: str
     error: Optional[str]
+    reused: bool  # inputs barely moved: previous analysis and report reused
+
+
+def _is_report_cacheable(report: str) -> bool:
+    """Only successful reports are shared; errors are retried on the next request"""
+    return bool(report) and not report.startswith('❌')
 
 
 class CryptoAnalysisAgent:
@@ -25,39 +38,70 @@ class CryptoAnalysisAgent:
         self.data_collector = get_data_collector()
         self.market_analyzer = get_market_analyzer()
         self.report_generator = get_report_generator()
+        # Reuses the previous analysis and report while inputs barely move
+        self.incremental = IncrementalAnalyzer(self.market_analyzer, self.report_generator)
+        # Every new analysis is queued for the persistent history (written off the hot path)
+        self.history: Optional[HistoryStore] = get_history_store() if config.HISTORY_ENABLED else None
+        self.loop = self._start_loop()
         self.graph = self._build_graph()
+        # Reports shared by every caller of this agent, keyed by (symbol, timeframe);
+        # concurrent misses for one key share a single workflow run
+        self.report_cache = TTLCache(max_entries=config.CACHE_MAX_ENTRIES, stale_factor=1.0,
+                                     cacheable=_is_report_cacheable)
+        # Symbols each session wants streamed; the socket is shared and closed when none are left
+        self._stream_owners = SymbolLeases()
+        self._stream_owners_lock = threading.Lock()
+        self._stream_sync: Optional[asyncio.Lock] = None
+        self._stream_expiry: Optional[asyncio.Task] = None
+    
+    def _start_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the long-lived event loop that drives all async work"""
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="agent-loop", daemon=True)
+        thread.start()
+        return loop
     
-    def _build_graph(self) -> StateGraph:
+    def _run(self, coro):
+        """Run a coroutine on the agent loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+    
+    def _build_graph(self):
         """Build the LangGraph workflow"""
+        # Imported here: langgraph/langchain are the slowest imports of the app
+        from langgraph.graph import StateGraph, END
+        from langchain_core.runnables import RunnableLambda
         
         # Define the workflow graph
         workflow = StateGraph(GraphState)
         
         # Add nodes
-        workflow.add_node("collect_data", self.collect_data_node)
+        workflow.add_node("collect_data", RunnableLambda(self.collect_data_node, afunc=self.acollect_data_node))
         workflow.add_node("analyze_market", self.analyze_market_node)
         workflow.add_node("generate_report", self.generate_report_node)
         
         # Define edges
         workflow.set_entry_point("collect_data")
         workflow.add_edge("collect_data", "analyze_market")
-        workflow.add_edge("analyze_market", "generate_report")
+        workflow.add_conditional_edges(
+            "analyze_market",
+            lambda state: "reuse" if state.get('reused') else "report",
+            {"reuse": END, "report": "generate_report"},
+        )
         workflow.add_edge("generate_report", END)
         
         return workflow.compile()
     
     def collect_data_node(self, state: GraphState) -> GraphState:
+        """Node: Collect market data (sync graph path)"""
+        return self._run(self.acollect_data_node(state))
+    
+    async def acollect_data_node(self, state: GraphState) -> GraphState:
         """Node: Collect market data"""
         try:
             print(f"📊 Collecting data for {state['symbol']}...")
             
-            # Run async data collection in sync context
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            market_data = loop.run_until_complete(
-                self.data_collector.collect_market_data(state['symbol'])
-            )
-            loop.close()
+            with NODE_DURATION.time(node='collect_data'):
+                market_data = await self.data_collector.collect_market_data(state['symbol'])
             
             state['raw_data'] = market_data
             print(f"✅ Data collected for {state['symbol']}")
@@ -76,8 +120,18 @@ class CryptoAnalysisAgent:
             
             print(f"🔍 Analyzing market for {state['symbol']}...")
             
-            analysis = self.market_analyzer.analyze_market(state['raw_data'])
+            with NODE_DURATION.time(node='analyze_market'):
+                analysis, changed = self.incremental.analyze(state['raw_data'])
             state['analysis'] = analysis
+            if self.history is not None:
+                self.history.record(analysis)
+            
+            if not changed:
+                # Nothing moved past its threshold: skip the report node
+                state['report'] = self.incremental.report(analysis)
+                state['reused'] = True
+                print(f"♻️ Inputs unchanged for {state['symbol']}, reusing previous report")
+                return state
             
             print(f"✅ Analysis completed for {state['symbol']}")
             
@@ -100,7 +154,8 @@ class CryptoAnalysisAgent:
             
             print(f"📝 Generating report for {state['symbol']}...")
             
-            report = self.report_generator.format_report(state['analysis'])
+            with NODE_DURATION.time(node='generate_report'):
+                report = self.incremental.report(state['analysis'])
             state['report'] = report
             
             print(f"✅ Report generated for {state['symbol']}")
@@ -111,20 +166,38 @@ class CryptoAnalysisAgent:
         
         return state
     
+    def _initial_state(self, symbol: str) -> GraphState:
+        """Create the initial graph state for a symbol"""
+        return {
+            'symbol': symbol,
+            'raw_data': None,
+            'analysis': None,
+            'report': '',
+            'error': None,
+            'reused': False
+        }
+    
     def analyze_symbol(self, symbol: str) -> str:
         """Run complete analysis for a symbol"""
+        return self._run(self.aanalyze_symbol(symbol))
+    
+    async def aanalyze_symbol(self, symbol: str) -> str:
+        """
+        Run complete analysis for a symbol on the agent loop.
+        Reports are reused for ANALYSIS_CACHE_TTL seconds, and concurrent
+        requests for the same symbol share one workflow run.
+        """
+        key = ('report', symbol, config.TIMEFRAME)
+        return await self.report_cache.get_or_fetch(key, config.ANALYSIS_CACHE_TTL, lambda: self._analyze(symbol))
+    
+    async def arun_workflow(self, symbol: str) -> GraphState:
+        """Run the workflow for a symbol, bypassing the report cache; returns the final state"""
+        return await self.graph.ainvoke(self._initial_state(symbol))
+    
+    async def _analyze(self, symbol: str) -> str:
+        """Run the workflow for a symbol"""
         try:
-            # Create initial state as dict
-            initial_state: GraphState = {
-                'symbol': symbol,
-                'raw_data': None,
-                'analysis': None,
-                'report': '',
-                'error': None
-            }
-            
-            # Run the graph
-            final_state = self.graph.invoke(initial_state)
+            final_state = await self.arun_workflow(symbol)
             
             return final_state['report']
             
@@ -132,24 +205,188 @@ class CryptoAnalysisAgent:
             print(f"❌ Error in agent workflow: {e}")
             return f"❌ Lỗi: {str(e)}\n\nChưa đủ dữ liệu — đang chờ cập nhật."
     
-    def analyze_multiple_symbols(self, symbols: list) -> dict:
-        """Run analysis for multiple symbols"""
-        results = {}
+    async def analyze_many(self, symbols: list, concurrency: Optional[int] = None) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Analyze many symbols concurrently, at most `concurrency` at a time.
+        Yields (symbol, report) pairs in completion order.
+        Must be iterated on the agent loop (see stream_analyze_many).
+        """
+        semaphore = asyncio.Semaphore(concurrency or config.ANALYSIS_CONCURRENCY)
+        await self.prefetch_snapshot(symbols)
         
-        for symbol in symbols:
-            print(f"\n{'='*60}")
-            print(f"Analyzing {symbol}...")
-            print('='*60)
-            
+        async def run(symbol: str) -> Tuple[str, str]:
+            async with semaphore:
+                return symbol, await self.aanalyze_symbol(symbol)
+        
+        tasks = [asyncio.create_task(run(symbol)) for symbol in symbols]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def prefetch_snapshot(self, symbols: list):
+        """
+        One bulk ticker/funding request per cycle instead of one per symbol,
+        once the per-symbol weight for `symbols` reaches the bulk weight
+        """
+        if len(symbols) >= config.BULK_SNAPSHOT_MIN_SYMBOLS and self.data_collector.get_fresh_snapshot() is None:
+            await self.data_collector.fetch_bulk_snapshot()
+    
+    def stream_analyze_many(self, symbols: list, concurrency: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """Blocking iterator over analyze_many, for sync callers such as Streamlit"""
+        results = queue.Queue()
+        done = object()
+        
+        async def pump():
             try:
-                report = self.analyze_symbol(symbol)
-                results[symbol] = report
-            except Exception as e:
-                results[symbol] = f"❌ Lỗi: {str(e)}\n\nChưa đủ dữ liệu — đang chờ cập nhật."
+                async for item in self.analyze_many(symbols, concurrency):
+                    results.put(item)
+            finally:
+                results.put(done)
+        
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item = results.get()
+                if item is done:
+                    break
+                yield item
+            future.result()
+        finally:
+            future.cancel()
+    
+    def analyze_multiple_symbols(self, symbols: list, concurrency: Optional[int] = None) -> dict:
+        """Run analysis for multiple symbols"""
+        return dict(self.stream_analyze_many(symbols, concurrency))
+    
+    def start_streaming(self, symbols: list):
+        """
+        Stream the symbols' candles, funding and liquidations over one
+        WebSocket instead of polling them; symbols are added to those
+        already streamed. For single-owner processes (the daemon); UI
+        sessions share the stream through stream_for/release_stream.
+        """
+        async def start():
+            collector = self.data_collector
+            if collector.stream is None:
+                from stream import MarketStream
+                collector.stream = MarketStream(collector)
+            await collector.stream.track(symbols)
+            collector.stream.start()
+        
+        self._run(start())
+    
+    def stop_streaming(self):
+        """Close the WebSocket stream and go back to polling, for every caller"""
+        async def stop():
+            if self.data_collector.stream is not None:
+                await self.data_collector.stream.stop()
+                self.data_collector.stream = None
         
-        return results
+        self._run(stop())
+    
+    def stream_for(self, owner, symbols: list):
+        """
+        Stream symbols on behalf of a session, replacing what it asked for
+        before. Each symbol stays subscribed while any session with a live
+        lease wants it, and the socket is closed only when none is left.
+        """
+        with self._stream_owners_lock:
+            self._stream_owners.register(owner, symbols)
+        self._run(self._sync_stream())
+    
+    def renew_stream(self, owner):
+        """Keep a session's streamed symbols for another lease period"""
+        with self._stream_owners_lock:
+            self._stream_owners.renew(owner)
+    
+    def release_stream(self, owner):
+        """Stop streaming a session's symbols that no other session wants"""
+        with self._stream_owners_lock:
+            if owner not in self._stream_owners:
+                return
+            self._stream_owners.release(owner)
+        self._run(self._sync_stream())
+    
+    async def _sync_stream(self):
+        """Subscribe what sessions want now; close the socket once nothing is wanted"""
+        if self._stream_sync is None:
+            self._stream_sync = asyncio.Lock()
+        async with self._stream_sync:
+            with self._stream_owners_lock:
+                self._stream_owners.expire()
+                wanted = set(self._stream_owners.wanted())
+            collector = self.data_collector
+            if not wanted:
+                if collector.stream is not None:
+                    await collector.stream.stop()
+                    collector.stream = None
+                return
+            if collector.stream is None:
+                from stream import MarketStream
+                collector.stream = MarketStream(collector)
+            tracked = set(collector.stream.tracked)
+            if tracked - wanted:
+                await collector.stream.untrack(tracked - wanted)
+            if wanted - tracked:
+                await collector.stream.track(wanted - tracked)
+            collector.stream.start()
+            if self._stream_expiry is None:
+                self._stream_expiry = asyncio.create_task(self._expire_stream_owners())
+    
+    async def _expire_stream_owners(self):
+        """Drop the streamed symbols of sessions that stopped renewing their lease, while streaming"""
+        while self.data_collector.stream is not None:
+            await asyncio.sleep(self._stream_owners.lease / 4)
+            with self._stream_owners_lock:
+                expired = self._stream_owners.expire()
+            if expired:
+                await self._sync_stream()
+        self._stream_expiry = None
+    
+    def close(self):
+        """Release collector resources and stop the agent event loop"""
+        self._run(self.data_collector.close())
+        if self.history is not None:
+            self.history.flush()
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
 
 def get_agent() -> CryptoAnalysisAgent:
     """Factory function to get agent instance"""
     return CryptoAnalysisAgent()
+
+
+_shared_agent: Optional[CryptoAnalysisAgent] = None
+_shared_agent_lock = threading.Lock()
+
+
+def get_shared_agent() -> CryptoAnalysisAgent:
+    """
+    Process-wide agent shared by all sessions, so exchange load follows
+    the number of distinct symbols rather than the number of viewers
+    """
+    global _shared_agent
+    with _shared_agent_lock:
+        if _shared_agent is None:
+            _shared_agent = CryptoAnalysisAgent()
+        return _shared_agent
+
+
+_shared_scheduler: Optional[RefreshScheduler] = None
+
+
+def get_shared_scheduler() -> RefreshScheduler:
+    """
+    Process-wide background scheduler of the shared agent, with one report
+    store for all sessions; sessions register the symbols they follow
+    """
+    global _shared_scheduler
+    agent = get_shared_agent()
+    with _shared_agent_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RefreshScheduler(agent)
+            _shared_scheduler.start()
+        return _shared_scheduler
@@ -0,0 +1,317 @@
+"""Local HTTP/JSON API serving the latest analyses from one shared refresh loop
+
+Usage:
+    python api.py [--host HOST] [--port PORT] [--symbols BTC/USDT ETH/USDT ...] [--interval S]
+
+Endpoints:
+    GET  /analysis/{symbol}          latest analysis of one symbol (e.g. /analysis/BTC/USDT)
+    GET  /analysis?symbols=A,B       latest analyses of many symbols, keyed by symbol
+    POST /analysis                   same, with a JSON body {"symbols": [...]}
+    GET  /events?symbols=A,B         server-sent events: one 'analysis' event per change
+    GET  /health                     tracked symbols and subscribers
+    GET  /metrics                    Prometheus text
+"""
+import argparse
+import asyncio
+import dataclasses
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from aiohttp import web
+import config
+from agent import CryptoAnalysisAgent, get_agent
+from models import MarketAnalysis
+from scheduler import RefreshScheduler
+from metrics import REGISTRY, API_REQUESTS
+
+
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9]+/[A-Z0-9]+(:[A-Z0-9]+)?$')
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def normalize_symbol(symbol: str) -> str:
+    """'btc-usdt' and 'BTC/USDT' both name BTC/USDT"""
+    return symbol.strip().upper().replace('-', '/')
+
+
+@dataclass
+class Snapshot:
+    """One symbol's latest analysis, serialized once per change"""
+    analysis: MarketAnalysis
+    body: bytes  # JSON object
+    etag: str
+
+
+@dataclass
+class _Subscriber:
+    symbols: Optional[frozenset]  # None: every tracked symbol
+    changed: Dict[str, None] = field(default_factory=dict)  # symbols changed since the last send, in order
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+def _etag(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+
+
+class AnalysisService:
+    """
+    Serves the latest MarketAnalysis per symbol over HTTP. One
+    RefreshScheduler re-analyzes every tracked symbol on the agent loop;
+    each new analysis is serialized once, and requests only read those
+    bytes, so the exchange load follows the number of symbols and the
+    refresh interval, never the number of clients. Symbols are tracked
+    when first requested (up to API_MAX_SYMBOLS); one whose first analysis
+    fails is dropped and retried on a request an interval later.
+    Runs on the agent loop.
+    """
+
+    def __init__(self, agent: CryptoAnalysisAgent, interval: float = config.API_REFRESH_INTERVAL,
+                 max_symbols: int = config.API_MAX_SYMBOLS):
+        self.agent = agent
+        self.interval = interval
+        self.max_symbols = max_symbols
+        self.scheduler = RefreshScheduler(agent)
+        self.scheduler.store.subscribe(self._on_publish)
+        self.snapshots: Dict[str, Snapshot] = {}
+        self._errors: Dict[str, Tuple[str, float]] = {}  # symbol -> (error report, monotonic time) of a failed first analysis
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._subscribers: List[_Subscriber] = []
+        self._closing = False
+        self.runner: Optional[web.AppRunner] = None
+
+    def track(self, symbols: Iterable[str]):
+        """Re-analyze symbols every `interval` seconds from now on"""
+        symbols = list(symbols)
+        for symbol in symbols:
+            if symbol not in self._ready or self._errors.pop(symbol, None) is not None:
+                self._ready[symbol] = asyncio.Event()
+        self.scheduler.track(symbols, self.interval)
+
+    def _on_publish(self, symbol: str, entry: Dict):
+        """Scheduler listener: re-serialize when the symbol's analysis changed"""
+        try:
+            analysis = self.agent.incremental.latest(symbol)
+            current = self.snapshots.get(symbol)
+            if analysis is None or entry['report'].startswith('❌'):
+                if current is None:
+                    # Never analyzed (unknown symbol or exchange down): stop polling it
+                    self._errors[symbol] = (entry['report'], time.monotonic())
+                    self.scheduler.untrack([symbol])
+                    self._ready[symbol].set()
+                return
+            if current is not None and current.analysis is analysis:
+                return
+            data = dataclasses.asdict(analysis)
+            data['report'] = entry['report']
+            body = json.dumps(data, default=_json_default, ensure_ascii=False).encode()
+            self.snapshots[symbol] = Snapshot(analysis, body, _etag(body))
+            self._ready[symbol].set()
+            for subscriber in self._subscribers:
+                if subscriber.symbols is None or symbol in subscriber.symbols:
+                    subscriber.changed[symbol] = None
+                    subscriber.wakeup.set()
+        except Exception as e:
+            print(f"❌ Error publishing analysis for {symbol}: {e}")
+
+    async def snapshot(self, symbol: str) -> Optional[Snapshot]:
+        """The symbol's snapshot, tracking it and waiting for its first analysis if needed"""
+        if symbol not in self.snapshots:
+            if symbol in self._errors:
+                if time.monotonic() - self._errors[symbol][1] < self.interval:
+                    return None  # failed less than an interval ago; tracked again below otherwise
+            if symbol not in self.scheduler.tracked:
+                if not SYMBOL_PATTERN.match(symbol):
+                    raise web.HTTPBadRequest(text=json.dumps({'error': f"invalid symbol: {symbol}"}),
+                                             content_type='application/json')
+                if len(self.scheduler.tracked) >= self.max_symbols:
+                    raise web.HTTPTooManyRequests(text=json.dumps({'error': "too many symbols tracked"}),
+                                                  content_type='application/json')
+                self.track([symbol])
+            try:
+                await asyncio.wait_for(self._ready[symbol].wait(), config.API_FIRST_RESULT_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        return self.snapshots.get(symbol)
+
+    async def wait_ready(self, symbols: Iterable[str], timeout: Optional[float] = None):
+        """Wait until every symbol has its first analysis (or failed it)"""
+        await asyncio.wait_for(asyncio.gather(*(self._ready[symbol].wait() for symbol in symbols)), timeout)
+
+    @staticmethod
+    def _not_modified(request: web.Request, etag: str) -> bool:
+        header = request.headers.get('If-None-Match')
+        if not header:
+            return False
+        return header.strip() == '*' or etag in (tag.strip() for tag in header.split(','))
+
+    def _respond(self, request: web.Request, body: bytes, etag: str) -> web.Response:
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if self._not_modified(request, etag):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type='application/json', charset='utf-8', headers=headers)
+
+    async def handle_symbol(self, request: web.Request) -> web.Response:
+        symbol = normalize_symbol(request.match_info['symbol'])
+        snapshot = await self.snapshot(symbol)
+        if snapshot is None:
+            if symbol in self._errors:
+                return web.json_response({'symbol': symbol, 'error': self._errors[symbol][0]}, status=502)
+            return web.json_response({'symbol': symbol, 'status': 'pending'}, status=202)
+        return self._respond(request, snapshot.body, snapshot.etag)
+
+    async def handle_batch(self, request: web.Request) -> web.Response:
+        if request.method == 'POST':
+            try:
+                symbols = (await request.json())['symbols']
+            except (ValueError, KeyError, TypeError):
+                return web.json_response({'error': 'expected {"symbols": [...]}'}, status=400)
+        else:
+            symbols = request.query.get('symbols', '').split(',')
+        symbols = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s.strip()))
+        if not symbols:
+            return web.json_response({'error': 'no symbols given'}, status=400)
+
+        snapshots = await asyncio.gather(*(self.snapshot(symbol) for symbol in symbols))
+        # Assembled from the stored bytes: nothing is serialized again per request
+        parts = [json.dumps(symbol).encode() + b':' + (snapshot.body if snapshot else b'null')
+                 for symbol, snapshot in zip(symbols, snapshots)]
+        etag = _etag(b','.join((snapshot.etag if snapshot else 'null').encode() for snapshot in snapshots))
+        return self._respond(request, b'{' + b','.join(parts) + b'}', etag)
+
+    async def handle_events(self, request: web.Request) -> web.StreamResponse:
+        symbols = None
+        if request.query.get('symbols'):
+            symbols = frozenset(normalize_symbol(s) for s in request.query['symbols'].split(',') if s.strip())
+            for symbol in symbols - set(self.scheduler.tracked) - set(self.snapshots):
+                if SYMBOL_PATTERN.match(symbol) and len(self.scheduler.tracked) < self.max_symbols:
+                    self.track([symbol])
+
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+        await response.prepare(request)
+
+        subscriber = _Subscriber(symbols)
+        # Start with the current state of every requested symbol
+        for symbol in self.snapshots:
+            if symbols is None or symbol in symbols:
+                subscriber.changed[symbol] = None
+        self._subscribers.append(subscriber)
+        try:
+            while not self._closing:
+                for symbol in list(subscriber.changed):
+                    del subscriber.changed[symbol]
+                    snapshot = self.snapshots[symbol]
+                    await response.write(b'event: analysis\nid: ' + snapshot.etag.encode() +
+                                         b'\ndata: ' + snapshot.body + b'\n\n')
+                subscriber.wakeup.clear()
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), config.API_SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    await response.write(b': keep-alive\n\n')
+        except ConnectionResetError:
+            pass  # client went away
+        finally:
+            self._subscribers.remove(subscriber)
+        return response
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'tracked': len(self.scheduler.tracked),
+            'ready': len(self.snapshots),
+            'failed': sorted(self._errors),
+            'subscribers': len(self._subscribers),
+            'interval': self.interval,
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=REGISTRY.to_prometheus(), content_type='text/plain')
+
+    @web.middleware
+    async def _count_requests(self, request: web.Request, handler) -> web.StreamResponse:
+        route = request.match_info.route.resource
+        endpoint = route.canonical if route is not None else 'unmatched'
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            API_REQUESTS.inc(endpoint=endpoint, status=e.status)
+            raise
+        API_REQUESTS.inc(endpoint=endpoint, status=response.status)
+        return response
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._count_requests])
+        app.router.add_get('/analysis/{symbol:.+}', self.handle_symbol)
+        app.router.add_get('/analysis', self.handle_batch)
+        app.router.add_post('/analysis', self.handle_batch)
+        app.router.add_get('/events', self.handle_events)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        return app
+
+    async def start(self, host: str = config.API_HOST, port: int = config.API_PORT,
+                    symbols: Iterable[str] = ()) -> str:
+        """Start serving and refreshing on the agent loop; returns the base URL"""
+        self.track(symbols)
+        self.scheduler.start()
+        self.runner = web.AppRunner(self.build_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        return self.url
+
+    @property
+    def url(self) -> str:
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        """Stop refreshing, end event streams and close the server"""
+        self.scheduler.stop()
+        self._closing = True
+        for subscriber in self._subscribers:
+            subscriber.wakeup.set()
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the latest crypto market analyses over HTTP/JSON")
+    parser.add_argument('--host', default=config.API_HOST)
+    parser.add_argument('--port', type=int, default=config.API_PORT)
+    parser.add_argument('--symbols', nargs='+', default=config.DEFAULT_SYMBOLS,
+                        help="Symbols refreshed from the start (others are added when requested)")
+    parser.add_argument('--interval', type=float, default=config.API_REFRESH_INTERVAL,
+                        help="Seconds between re-analyses of each symbol")
+    args = parser.parse_args()
+
+    agent = get_agent()
+    service = AnalysisService(agent, args.interval)
+    url = agent._run(service.start(args.host, args.port, [normalize_symbol(s) for s in args.symbols]))
+    print(f"🚀 API đang chạy tại {url} (Ctrl+C để dừng)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent._run(service.stop())
+        agent.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 """Streamlit app for Crypto Market Analysis Agent"""
 import streamlit as st
 import time
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 import config
-from agent import get_agent
+from agent import get_shared_agent, get_shared_scheduler
+from scanner import get_market_scanner
+import metrics
 import pandas as pd
 
 
@@ -68,6 +71,8 @@ st.markdown("""
 
 def initialize_session_state():
     """Initialize session state variables"""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex  # owner of this session's shared registrations
     if 'agent' not in st.session_state:
         st.session_state.agent = None
     if 'reports' not in st.session_state:
@@ -78,6 +83,14 @@ def initialize_session_state():
         st.session_state.auto_refresh = False
     if 'selected_symbols' not in st.session_state:
         st.session_state.selected_symbols = config.DEFAULT_SYMBOLS
+    if 'scheduler' not in st.session_state:
+        st.session_state.scheduler = None
+    if 'cleared_at' not in st.session_state:
+        st.session_state.cleared_at = datetime.min
+    if 'scan_result' not in st.session_state:
+        st.session_state.scan_result = None
+    if 'streaming' not in st.session_state:
+        st.session_state.streaming = config.STREAMING_ENABLED
 
 
 def load_agent():
@@ -85,13 +98,62 @@ def load_agent():
     if st.session_state.agent is None:
         with st.spinner("🚀 Đang khởi tạo Agent..."):
             try:
-                st.session_state.agent = get_agent()
+                st.session_state.agent = get_shared_agent()
+                st.session_state.scheduler = get_shared_scheduler()
                 st.success("✅ Agent đã sẵn sàng!")
             except Exception as e:
                 st.error(f"❌ Lỗi khởi tạo Agent: {str(e)}")
                 st.session_state.agent = None
 
 
+def sync_scheduler(interval: int):
+    """
+    Register the selected symbols with the shared background scheduler
+    while auto-refresh is on; other sessions' symbols are left alone
+    """
+    scheduler = st.session_state.scheduler
+    if scheduler is None:
+        return
+    
+    if st.session_state.auto_refresh:
+        scheduler.register(st.session_state.session_id, st.session_state.selected_symbols, interval)
+    else:
+        scheduler.release(st.session_state.session_id)
+
+
+def sync_streaming():
+    """
+    Stream the selected symbols over the shared WebSocket while streaming
+    mode is on; turning it off only drops what no other session streams
+    """
+    agent = st.session_state.agent
+    try:
+        if st.session_state.streaming:
+            agent.stream_for(st.session_state.session_id, st.session_state.selected_symbols)
+        else:
+            agent.release_stream(st.session_state.session_id)
+    except Exception as e:
+        st.error(f"❌ Lỗi kết nối WebSocket: {str(e)}")
+
+
+def merge_scheduled_reports():
+    """Pull newer reports published by the background scheduler"""
+    scheduler = st.session_state.scheduler
+    if scheduler is None:
+        return
+    # Polling keeps this session's symbols registered; a closed tab lets them lapse
+    scheduler.renew(st.session_state.session_id)
+    st.session_state.agent.renew_stream(st.session_state.session_id)
+    
+    reports = st.session_state.reports
+    for symbol, data in scheduler.store.latest(st.session_state.selected_symbols).items():
+        if data['timestamp'] <= st.session_state.cleared_at:
+            continue
+        if symbol not in reports or data['timestamp'] > reports[symbol]['timestamp']:
+            reports[symbol] = data
+            st.session_state.last_update = max(st.session_state.last_update or data['timestamp'], data['timestamp'])
+
+
 def analyze_markets(symbols):
     """Analyze selected markets"""
     if st.session_state.agent is None:
@@ -101,22 +163,26 @@ def analyze_markets(symbols):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for idx, symbol in enumerate(symbols):
-        status_text.text(f"📊 Đang phân tích {symbol}... ({idx + 1}/{len(symbols)})")
-        
-        try:
-            report = st.session_state.agent.analyze_symbol(symbol)
+    status_text.text(f"📊 Đang phân tích {len(symbols)} cặp coin...")
+    
+    completed = set()
+    try:
+        # Reports stream in as soon as each symbol finishes
+        for symbol, report in st.session_state.agent.stream_analyze_many(symbols):
             st.session_state.reports[symbol] = {
                 'report': report,
                 'timestamp': datetime.now()
             }
-        except Exception as e:
-            st.session_state.reports[symbol] = {
-                'report': f"❌ Lỗi: {str(e)}\n\nChưa đủ dữ liệu — đang chờ cập nhật.",
-                'timestamp': datetime.now()
-            }
-        
-        progress_bar.progress((idx + 1) / len(symbols))
+            completed.add(symbol)
+            status_text.text(f"📊 Đã phân tích {symbol} ({len(completed)}/{len(symbols)})")
+            progress_bar.progress(len(completed) / len(symbols))
+    except Exception as e:
+        for symbol in symbols:
+            if symbol not in completed:
+                st.session_state.reports[symbol] = {
+                    'report': f"❌ Lỗi: {str(e)}\n\nChưa đủ dữ liệu — đang chờ cập nhật.",
+                    'timestamp': datetime.now()
+                }
     
     status_text.text("✅ Hoàn thành phân tích!")
     st.session_state.last_update = datetime.now()
@@ -125,6 +191,189 @@ def analyze_markets(symbols):
     status_text.empty()
 
 
+def _histogram_frame(histogram: metrics.Histogram, label: str) -> pd.DataFrame:
+    """Histogram summary as a table in milliseconds"""
+    rows = []
+    for row in histogram.summary():
+        rows.append({
+            label: row[label],
+            'Số lần': row['count'],
+            'TB (ms)': round(row['mean'] * 1000, 1) if row['mean'] is not None else None,
+            'p50 (ms)': round(row['p50'] * 1000, 1) if row['p50'] is not None else None,
+            'p95 (ms)': round(row['p95'] * 1000, 1) if row['p95'] is not None else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def render_metrics_panel():
+    """Debug panel with the in-process metrics"""
+    with st.expander("🛠️ Debug: Metrics"):
+        st.write("**Thời gian từng node:**")
+        st.dataframe(_histogram_frame(metrics.NODE_DURATION, 'node'), use_container_width=True, hide_index=True)
+        
+        st.write("**Thời gian gọi API:**")
+        st.dataframe(_histogram_frame(metrics.FETCH_DURATION, 'source'), use_container_width=True, hide_index=True)
+        
+        errors = metrics.FETCH_ERRORS.values()
+        if errors:
+            st.write("**Lỗi theo nguồn:**")
+            st.dataframe(pd.DataFrame(
+                [{'source': source, 'kind': kind, 'Số lỗi': int(count)} for (source, kind), count in errors.items()]
+            ), use_container_width=True, hide_index=True)
+        
+        hit_rates = metrics.cache_hit_rates()
+        if hit_rates:
+            st.write("**Tỷ lệ cache hit:**")
+            st.dataframe(pd.DataFrame(
+                [{'source': source, 'Hit rate': f"{rate:.0%}"} for source, rate in sorted(hit_rates.items())]
+            ), use_container_width=True, hide_index=True)
+        
+        in_flight = sum(metrics.IN_FLIGHT.values().values())
+        st.write(f"**Request đang chạy:** {int(in_flight)}")
+        
+        if st.checkbox("Hiển thị Prometheus text"):
+            st.code(metrics.REGISTRY.to_prometheus(), language="text")
+
+
+def run_scan(top_k: int):
+    """Scan all USDT-M perpetuals and deep-analyze the top candidates"""
+    scanner = get_market_scanner(st.session_state.agent)
+    with st.spinner("🔎 Đang quét toàn bộ thị trường USDT-M..."):
+        try:
+            st.session_state.scan_result = scanner.scan(top_k)
+        except Exception as e:
+            st.error(f"❌ Lỗi quét thị trường: {str(e)}")
+
+
+def render_scan_results():
+    """Screening table and candidate reports of the last scan"""
+    result = st.session_state.scan_result
+    if result is None:
+        return
+    
+    st.subheader("🔎 Kết quả quét thị trường")
+    st.caption(f"_{len(result.screen)} cặp được sàng lọc, {len(result.candidates)} cặp được phân tích sâu "
+               f"trong {result.seconds:.1f}s — {result.timestamp.strftime('%H:%M:%S %d/%m/%Y')}_")
+    
+    screen = result.screen.head(config.SCANNER_TOP_K * 5).rename(columns={
+        'symbol': 'Cặp coin',
+        'price': 'Giá',
+        'quote_volume': 'Volume 24h (USDT)',
+        'price_change_pct': 'Thay đổi giá (%)',
+        'range_pct': 'Biên độ 24h (%)',
+        'funding_rate': 'Funding rate',
+        'volume_change_pct': 'Thay đổi volume (%)',
+        'funding_extreme': 'Funding cực đoan',
+        'score': 'Điểm',
+    })
+    st.dataframe(screen, use_container_width=True, hide_index=True)
+    
+    for symbol in result.candidates:
+        if symbol in result.reports:
+            with st.expander(f"📊 {symbol}"):
+                st.markdown(result.reports[symbol])
+    
+    st.divider()
+
+
+TREND_EMOJIS = {'bullish': '📈', 'bearish': '📉', 'neutral': '➡️'}
+
+
+def render_history(history, latest):
+    """Overview from the persistent history: latest snapshot per symbol, one symbol's trail, recent anomalies"""
+    summary_data = []
+    for symbol in st.session_state.selected_symbols:
+        if symbol in latest:
+            row = latest[symbol]
+            summary_data.append({
+                'Cặp coin': symbol,
+                'Thời gian': row['timestamp'].strftime("%H:%M:%S %d/%m"),
+                'Giá': row['price'],
+                'Xu hướng': f"{TREND_EMOJIS.get(row['trend'], '')} {row['trend']}",
+                'Volume (%)': round(row['volume_change_pct'], 1),
+                'Funding': row['funding_rate_status'],
+                'Biến động': row['volatility_status'],
+                'Bất thường': row['anomaly_count'],
+                'Định hướng': row['trading_direction'],
+            })
+        elif symbol in st.session_state.reports:
+            summary_data.append({
+                'Cặp coin': symbol,
+                'Thời gian': st.session_state.reports[symbol]['timestamp'].strftime("%H:%M:%S %d/%m"),
+            })
+    
+    if summary_data:
+        st.dataframe(pd.DataFrame(summary_data), use_container_width=True, hide_index=True)
+    
+    if not latest:
+        return
+    
+    st.write("**📈 Lịch sử phân tích:**")
+    symbol = st.selectbox("Cặp coin:", options=list(latest), key='history_symbol')
+    snapshots = pd.DataFrame(history.last_snapshots(symbol, config.HISTORY_UI_ROWS))
+    if not snapshots.empty:
+        st.line_chart(snapshots.set_index('timestamp')[['price', 'ma_20', 'ma_50']])
+        st.dataframe(snapshots[['timestamp', 'price', 'trend', 'volume_change_pct', 'funding_rate',
+                                'volatility_status', 'anomaly_count']].iloc[::-1].rename(columns={
+            'timestamp': 'Thời gian',
+            'price': 'Giá',
+            'trend': 'Xu hướng',
+            'volume_change_pct': 'Volume (%)',
+            'funding_rate': 'Funding rate',
+            'volatility_status': 'Biến động',
+            'anomaly_count': 'Bất thường',
+        }), use_container_width=True, hide_index=True)
+    
+    anomalies = history.anomalies(datetime.now() - timedelta(days=1), symbols=st.session_state.selected_symbols)
+    if anomalies:
+        st.write("**⚠️ Bất thường trong 24h:**")
+        st.dataframe(pd.DataFrame(anomalies)[['timestamp', 'symbol', 'type', 'severity', 'description']].rename(columns={
+            'timestamp': 'Thời gian',
+            'symbol': 'Cặp coin',
+            'type': 'Loại',
+            'severity': 'Mức độ',
+            'description': 'Mô tả',
+        }), use_container_width=True, hide_index=True)
+
+
+def render_reports():
+    """Report tabs (runs as a fragment so auto-refresh does not rerun the page)"""
+    # Requests for symbols on screen go ahead of background ones
+    st.session_state.agent.data_collector.limiter.mark_visible(st.session_state.selected_symbols)
+    merge_scheduled_reports()
+    
+    # Snapshots survive reloads; the overview is built from them when history is on
+    history = st.session_state.agent.history
+    latest = history.latest(st.session_state.selected_symbols) if history is not None else {}
+    
+    if st.session_state.reports or latest:
+        # Create tabs for different views
+        tab1, tab2 = st.tabs(["📊 Báo cáo chi tiết", "📋 Tổng quan"])
+        
+        with tab1:
+            if not st.session_state.reports:
+                st.info("ℹ️ Chưa có báo cáo trong phiên này. Nhấn nút **Phân tích ngay** để bắt đầu.")
+            
+            # Detailed reports
+            for symbol in st.session_state.selected_symbols:
+                if symbol in st.session_state.reports:
+                    report_data = st.session_state.reports[symbol]
+                    
+                    with st.container():
+                        st.markdown(f'<div class="report-container">', unsafe_allow_html=True)
+                        st.markdown(report_data['report'])
+                        
+                        # Timestamp
+                        timestamp = report_data['timestamp'].strftime("%H:%M:%S %d/%m/%Y")
+                        st.caption(f"_Cập nhật lúc: {timestamp}_")
+                        st.markdown('</div>', unsafe_allow_html=True)
+        
+        with tab2:
+            render_history(history, latest)
+    else:
+        st.info("ℹ️ Chưa có báo cáo. Nhấn nút **Phân tích ngay** để bắt đầu.")
+
+
 def main():
     """Main application"""
     initialize_session_state()
@@ -158,6 +407,7 @@ def main():
         auto_refresh = st.checkbox("Bật tự động cập nhật", value=st.session_state.auto_refresh)
         st.session_state.auto_refresh = auto_refresh
         
+        refresh_interval = config.REFRESH_INTERVAL
         if auto_refresh:
             refresh_interval = st.slider(
                 "Khoảng thời gian (giây):",
@@ -167,6 +417,25 @@ def main():
                 step=30
             )
         
+        st.session_state.streaming = st.checkbox(
+            "📡 Dữ liệu realtime (WebSocket)",
+            value=st.session_state.streaming,
+            help="Nhận nến, funding và thanh lý qua WebSocket thay vì gọi REST định kỳ"
+        )
+        
+        st.divider()
+        
+        # Market scanner
+        st.subheader("🔎 Quét toàn thị trường")
+        scan_top_k = st.slider(
+            "Số cặp phân tích sâu:",
+            min_value=5,
+            max_value=30,
+            value=config.SCANNER_TOP_K,
+            step=5
+        )
+        scan_clicked = st.button("🔎 Quét thị trường", use_container_width=True)
+        
         st.divider()
         
         # Agent info
@@ -180,6 +449,8 @@ def main():
         
         st.divider()
         
+        render_metrics_panel()
+        
         # About
         with st.expander("📖 Về ứng dụng"):
             st.markdown("""
@@ -208,6 +479,10 @@ def main():
         st.error("❌ Không thể khởi tạo Agent. Vui lòng kiểm tra cấu hình và thử lại.")
         return
     
+    # Background refresh
+    sync_scheduler(refresh_interval)
+    sync_streaming()
+    
     # Control buttons
     col1, col2, col3 = st.columns([2, 1, 1])
     
@@ -219,6 +494,7 @@ def main():
         if st.button("🗑️ Xóa báo cáo", use_container_width=True):
             st.session_state.reports = {}
             st.session_state.last_update = None
+            st.session_state.cleared_at = datetime.now()
             st.rerun()
     
     with col3:
@@ -227,51 +503,15 @@ def main():
     
     st.divider()
     
-    # Display reports
-    if st.session_state.reports:
-        # Create tabs for different views
-        tab1, tab2 = st.tabs(["📊 Báo cáo chi tiết", "📋 Tổng quan"])
-        
-        with tab1:
-            # Detailed reports
-            for symbol in st.session_state.selected_symbols:
-                if symbol in st.session_state.reports:
-                    report_data = st.session_state.reports[symbol]
-                    
-                    with st.container():
-                        st.markdown(f'<div class="report-container">', unsafe_allow_html=True)
-                        st.markdown(report_data['report'])
-                        
-                        # Timestamp
-                        timestamp = report_data['timestamp'].strftime("%H:%M:%S %d/%m/%Y")
-                        st.caption(f"_Cập nhật lúc: {timestamp}_")
-                        st.markdown('</div>', unsafe_allow_html=True)
-        
-        with tab2:
-            # Summary view
-            summary_data = []
-            
-            for symbol in st.session_state.selected_symbols:
-                if symbol in st.session_state.reports:
-                    report_data = st.session_state.reports[symbol]
-                    
-                    # Extract key info (simplified)
-                    summary_data.append({
-                        'Cặp coin': symbol,
-                        'Thời gian': report_data['timestamp'].strftime("%H:%M:%S"),
-                        'Trạng thái': '✅ Đã phân tích'
-                    })
-            
-            if summary_data:
-                df = pd.DataFrame(summary_data)
-                st.dataframe(df, use_container_width=True, hide_index=True)
-    else:
-        st.info("ℹ️ Chưa có báo cáo. Nhấn nút **Phân tích ngay** để bắt đầu.")
+    if scan_clicked:
+        run_scan(scan_top_k)
+    render_scan_results()
     
-    # Auto-refresh logic
-    if st.session_state.auto_refresh and st.session_state.reports:
-        time.sleep(refresh_interval)
-        st.rerun()
+    # Display reports; with auto-refresh or streaming on, only this part reruns to pick up
+    # new reports and keep the session's shared registrations alive
+    polling = st.session_state.auto_refresh or st.session_state.streaming
+    run_every = config.UI_POLL_INTERVAL if polling else None
+    st.fragment(render_reports, run_every=run_every)()
 
 
 if __name__ == "__main__":
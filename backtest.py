@@ -0,0 +1,151 @@
+"""Historical replay of the MarketAnalyzer rules"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+from models import MarketDataBatch, BatchAnalysis
+from market_analyzer import MarketAnalyzer, get_market_analyzer, FUNDING_STATUSES, VOLATILITY_STATUSES
+import config
+
+
+def _to_ms(timestamps: pd.Series) -> np.ndarray:
+    """Timestamps (datetime64 or epoch ms) as int64 epoch milliseconds"""
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps.astype('datetime64[ms]').astype(np.int64).to_numpy()
+    return timestamps.astype(np.int64).to_numpy()
+
+
+def _as_of(timestamps: np.ndarray, values: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """Last value at or before each time in `at` (NaN before the first sample)"""
+    index = np.searchsorted(timestamps, at, side='right') - 1
+    result = values[np.clip(index, 0, None)].astype(np.float64)
+    result[index < 0] = np.nan
+    return result
+
+
+def _zero_to_nan(values: np.ndarray) -> np.ndarray:
+    # The live collector stores falsy readings as None
+    return np.where(values == 0, np.nan, values)
+
+
+class ReplayEngine:
+    """
+    Evaluates the analyzer rules for every bar of a long history at once.
+    Per-bar inputs are rebuilt the way DataCollector derives them from
+    candles, then classified with MarketAnalyzer.analyze_batch, the
+    vectorized form of the live rules.
+    """
+
+    def __init__(self, analyzer: Optional[MarketAnalyzer] = None):
+        self.analyzer = analyzer or get_market_analyzer()
+
+    def build_batch(
+        self,
+        symbol: str,
+        ohlcv: pd.DataFrame,
+        funding: Optional[pd.DataFrame] = None,
+        open_interest: Optional[pd.DataFrame] = None,
+    ) -> MarketDataBatch:
+        """
+        Per-bar MarketData inputs for one symbol.
+        ohlcv: timestamp/open/high/low/close/volume candles, oldest first.
+        funding: timestamp/fundingRate rows (ccxt funding rate history).
+        open_interest: timestamp/openInterestAmount rows (ccxt OI history).
+        Funding and OI are taken as of each bar's close.
+        """
+        ohlcv = ohlcv.reset_index(drop=True)
+        timestamps = _to_ms(ohlcv['timestamp'])
+        bar_ms = int(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 0
+        closes_at = timestamps + bar_ms
+        bars = len(ohlcv)
+
+        close = ohlcv['close'].astype(np.float64)
+        volume = ohlcv['volume'].astype(np.float64)
+        day = 24  # hourly candles, as in DataCollector's 24h fallbacks
+
+        mas = {period: close.rolling(window=period).mean().to_numpy() for period in (20, 50, 200)}
+
+        funding_rate = np.full(bars, np.nan)
+        if funding is not None and len(funding):
+            funding = funding.sort_values('timestamp')
+            funding_rate = _zero_to_nan(_as_of(_to_ms(funding['timestamp']),
+                                               funding['fundingRate'].to_numpy(np.float64), closes_at))
+
+        oi = np.full(bars, np.nan)
+        oi_change = np.full(bars, np.nan)
+        if open_interest is not None and len(open_interest):
+            open_interest = open_interest.sort_values('timestamp')
+            oi_timestamps = _to_ms(open_interest['timestamp'])
+            oi_values = open_interest['openInterestAmount'].to_numpy(np.float64)
+            oi = _zero_to_nan(_as_of(oi_timestamps, oi_values, closes_at))
+            oi_past = _zero_to_nan(_as_of(oi_timestamps, oi_values, closes_at - config.OI_SPIKE_LOOKBACK * 1000))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                oi_change = (oi - oi_past) / oi_past
+
+        missing = np.full(bars, np.nan)
+        return MarketDataBatch(
+            symbols=[symbol] * bars,
+            price=close.to_numpy(),
+            volume_24h=volume.rolling(window=day, min_periods=1).sum().to_numpy(),
+            volume_avg_7d=volume.rolling(window=config.VOLUME_LOOKBACK * day, min_periods=1).mean().to_numpy(),
+            ma_20=_zero_to_nan(mas[20]),
+            ma_50=_zero_to_nan(mas[50]),
+            ma_200=_zero_to_nan(mas[200]),
+            funding_rate=funding_rate,
+            high_24h=ohlcv['high'].astype(np.float64).rolling(window=day, min_periods=1).max().to_numpy(),
+            low_24h=ohlcv['low'].astype(np.float64).rolling(window=day, min_periods=1).min().to_numpy(),
+            liquidations_total=missing,
+            liquidations_long=missing,
+            liquidations_short=missing,
+            open_interest=oi,
+            open_interest_change=oi_change,
+        )
+
+    @staticmethod
+    def signals_frame(result: BatchAnalysis, timestamps: np.ndarray) -> pd.DataFrame:
+        """Compact per-bar signal table"""
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(timestamps, unit='ms'),
+            'symbol': pd.Categorical(result.data.symbols),
+            'trend': pd.Categorical(np.where(result.trend_known, result.trend, 'unknown'),
+                                    categories=['bullish', 'bearish', 'neutral', 'unknown']),
+            'trend_strong': result.trend_strong,
+            'volume_change_pct': result.volume_change_pct.astype(np.float32),
+            'funding_rate_status': pd.Categorical(result.funding_rate_status, categories=FUNDING_STATUSES),
+            'volatility_status': pd.Categorical(result.volatility_status, categories=VOLATILITY_STATUSES),
+            'volume_spike': result.volume_spike,
+            'funding_extreme': result.funding_extreme,
+            'oi_spike': result.oi_spike,
+            'liquidation_risk': result.liquidation_risk,
+        })
+
+    def replay(
+        self,
+        symbol: str,
+        ohlcv: pd.DataFrame,
+        funding: Optional[pd.DataFrame] = None,
+        open_interest: Optional[pd.DataFrame] = None,
+    ) -> pd.DataFrame:
+        """Rule outcomes for every bar of one symbol's history"""
+        batch = self.build_batch(symbol, ohlcv, funding, open_interest)
+        result = self.analyzer.analyze_batch(batch)
+        return self.signals_frame(result, _to_ms(ohlcv['timestamp'].reset_index(drop=True)))
+
+    def replay_many(self, histories: Dict[str, Dict[str, pd.DataFrame]]) -> pd.DataFrame:
+        """
+        Replay several symbols. histories maps symbol to a dict with an
+        'ohlcv' frame and optional 'funding' / 'open_interest' frames.
+        """
+        frames = [
+            self.replay(symbol, history['ohlcv'], history.get('funding'), history.get('open_interest'))
+            for symbol, history in histories.items()
+        ]
+        if not frames:
+            return pd.DataFrame()
+        signals = pd.concat(frames, ignore_index=True)
+        signals['symbol'] = signals['symbol'].astype('category')
+        return signals
+
+
+def get_replay_engine() -> ReplayEngine:
+    """Factory function to get ReplayEngine instance"""
+    return ReplayEngine()
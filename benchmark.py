@@ -0,0 +1,918 @@
+"""Benchmarks for the crypto market analysis pipeline
+
+Usage:
+    python benchmark.py http [--requests N] [--base-url URL]
+    python benchmark.py indicators [--candles N] [--ticks N]
+    python benchmark.py replay [--symbols N] [--bars N]
+    python benchmark.py pipeline [--sizes 10 100 500] [--latency S] [--jitter S] [--concurrency N]
+    python benchmark.py scan [--symbols N] [--top-k N] [--latency S] [--concurrency N]
+    python benchmark.py sharded [--symbols N] [--workers 1 2 4] [--latency S] [--concurrency N]
+    python benchmark.py reanalysis [--symbols N] [--active 0.05 0.25 1.0] [--cycles N]
+    python benchmark.py stream [--symbols N] [--seconds S] [--interval S] [--gap N]
+    python benchmark.py history [--symbols N] [--snapshots N] [--queries N]
+    python benchmark.py api [--symbols N] [--clients N] [--seconds S]
+    python benchmark.py daemon [--symbols N] [--interval S] [--cycles N]
+    python benchmark.py startup [--runs N]
+
+Every benchmark also takes [--output FILE] to save its results as JSON and
+[--baseline FILE] to print the change of each metric against a saved run.
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+import aiohttp
+import numpy as np
+import pandas as pd
+import config
+from data_collector import DataCollector
+from indicators import IndicatorEngine
+from backtest import get_replay_engine
+from market_analyzer import get_market_analyzer
+from agent import CryptoAnalysisAgent
+from scanner import get_market_scanner
+from sharding import ShardedAnalyzer
+from stream import MarketStream
+from incremental import IncrementalAnalyzer
+from history import HistoryStore
+from api import AnalysisService
+from report_generator import get_report_generator
+from models import MarketData
+from rate_limiter import RateLimiter
+from fake_exchange import FakeExchange, FakeBinanceServer
+
+
+UNLIMITED_WEIGHT = 10 ** 12
+
+
+def format_ms(seconds: float) -> str:
+    """Format a duration in milliseconds"""
+    return f"{seconds * 1000:.2f} ms"
+
+
+# ---------------------------------------------------------------------------
+# HTTP connection pooling
+# ---------------------------------------------------------------------------
+
+async def _fetch_with_fresh_sessions(base_url: str, requests: int) -> List[float]:
+    """Old behaviour: one ClientSession (DNS + connect + TLS) per request"""
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base_url}/fapi/v1/allForceOrders",
+                                   params={'symbol': 'BTCUSDT', 'limit': 100}) as response:
+                await response.json()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def _fetch_with_pooled_session(base_url: str, requests: int) -> List[float]:
+    """Current behaviour: DataCollector's shared keep-alive session"""
+    config.BINANCE_FAPI_URL = base_url
+    collector = DataCollector()
+    collector.limiter = RateLimiter(limit=UNLIMITED_WEIGHT)  # measure connection reuse, not weight budgeting
+    timings = []
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            # Bypass the TTL cache so every iteration goes over the wire
+            await collector._get_json('/fapi/v1/allForceOrders', {'symbol': 'BTCUSDT', 'limit': 100})
+            timings.append(time.perf_counter() - start)
+    finally:
+        await collector.close()
+    return timings
+
+
+async def bench_http(requests: int, base_url: str = None) -> Dict[str, float]:
+    """Compare per-request latency of fresh sessions against the pooled session"""
+    server = None
+    if base_url is None:
+        server = FakeBinanceServer()
+        base_url = await server.start()
+    try:
+        fresh = await _fetch_with_fresh_sessions(base_url, requests)
+        pooled = await _fetch_with_pooled_session(base_url, requests)
+    finally:
+        if server is not None:
+            await server.stop()
+
+    fresh_avg = sum(fresh) / len(fresh)
+    # The first pooled request pays for the connection; steady state does not
+    pooled_avg = sum(pooled[1:]) / max(len(pooled) - 1, 1)
+    print(f"Target: {base_url} ({requests} requests)")
+    print(f"  fresh session per request: {format_ms(fresh_avg)} avg")
+    print(f"  pooled keep-alive session: {format_ms(pooled_avg)} avg (first: {format_ms(pooled[0])})")
+    print(f"  saved per request:         {format_ms(fresh_avg - pooled_avg)}")
+    return {'fresh_avg': fresh_avg, 'pooled_avg': pooled_avg}
+
+
+# ---------------------------------------------------------------------------
+# Moving-average / volume-average computation
+# ---------------------------------------------------------------------------
+
+def _synthetic_candles(count: int, seed: int = 42) -> np.ndarray:
+    """Random-walk hourly candles as [timestamp, open, high, low, close, volume] rows"""
+    rng = np.random.default_rng(seed)
+    closes = 30000 + np.cumsum(rng.normal(0, 50, count))
+    volumes = rng.uniform(100, 1000, count)
+    timestamps = np.arange(count, dtype=np.float64) * 3_600_000
+    return np.column_stack([timestamps, closes, closes + 10, closes - 10, closes, volumes])
+
+
+def bench_indicators(candles: int, ticks: int) -> Dict[str, float]:
+    """
+    Compare the pandas recompute (rolling mean over the whole buffer on
+    every update) with the incremental engine. Each candle receives
+    `ticks` live updates before it closes.
+    """
+    rows = _synthetic_candles(candles)
+    volume_window = config.VOLUME_LOOKBACK * 24
+    rng = np.random.default_rng(7)
+    updates = [row.copy() for row in rows for _ in range(ticks)]
+    for update in updates:
+        update[4] += rng.normal(0, 5)
+
+    def pandas_update(df: pd.DataFrame):
+        mas = {period: df['close'].rolling(window=period).mean().iloc[-1] for period in config.MA_PERIODS}
+        return mas, df['volume'].rolling(window=volume_window, min_periods=1).mean().iloc[-1]
+
+    # pandas: rebuild the (capped) frame and recompute every indicator per update
+    seen = []
+    start = time.perf_counter()
+    for update in updates:
+        if seen and seen[-1][0] == update[0]:
+            seen[-1] = update
+        else:
+            seen.append(update)
+        window = seen[-config.CANDLE_BUFFER_SIZE:]
+        pandas_update(pd.DataFrame(window, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']))
+    pandas_time = time.perf_counter() - start
+
+    engine = IndicatorEngine({'close': config.MA_PERIODS, 'volume': [volume_window]}, {'volume': 1})
+    start = time.perf_counter()
+    for update in updates:
+        engine.update([update])
+        for period in config.MA_PERIODS:
+            engine.mean('close', period)
+        engine.mean('volume', volume_window)
+    engine_time = time.perf_counter() - start
+
+    # The engine is exact against pandas over the full candle stream
+    full = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    full['close'] = [updates[(i + 1) * ticks - 1][4] for i in range(candles)]
+    expected, expected_volume = pandas_update(full)
+    exact = all(engine.mean('close', period) == expected[period] for period in config.MA_PERIODS)
+    exact = exact and engine.mean('volume', volume_window) == expected_volume
+
+    print(f"{len(updates)} updates ({candles} candles x {ticks} ticks)")
+    print(f"  pandas rolling recompute: {format_ms(pandas_time / len(updates))} per update")
+    print(f"  incremental engine:       {format_ms(engine_time / len(updates))} per update")
+    print(f"  speedup:                  {pandas_time / engine_time:.1f}x")
+    print(f"  matches pandas exactly:   {exact}")
+    return {'pandas': pandas_time, 'engine': engine_time, 'exact': bool(exact)}
+
+
+# ---------------------------------------------------------------------------
+# Historical replay
+# ---------------------------------------------------------------------------
+
+def _synthetic_history(bars: int, seed: int) -> Dict[str, pd.DataFrame]:
+    """Hourly candles with 8h funding and 5m open interest for one symbol"""
+    rng = np.random.default_rng(seed)
+    rows = _synthetic_candles(bars, seed)
+    ohlcv = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    ohlcv['high'] += rng.uniform(0, 800, bars)
+    ohlcv['volume'] *= rng.choice([1, 1, 1, 3], bars)
+    end = int(rows[-1, 0]) + 3_600_000
+    funding_times = np.arange(0, end, 8 * 3_600_000)
+    funding = pd.DataFrame({'timestamp': funding_times,
+                            'fundingRate': rng.normal(0, 0.006, len(funding_times))})
+    oi_times = np.arange(0, end, 300_000)
+    oi = pd.DataFrame({'timestamp': oi_times,
+                       'openInterestAmount': 1e5 * np.exp(np.cumsum(rng.normal(0, 0.02, len(oi_times))))})
+    ohlcv['timestamp'] = ohlcv['timestamp'].astype(np.int64)
+    return {'ohlcv': ohlcv, 'funding': funding, 'open_interest': oi}
+
+
+def bench_replay(symbols: int, bars: int, checked_bars: int = 500) -> Dict[str, float]:
+    """Replay `bars` hourly bars for `symbols` symbols and check against the live path"""
+    histories = {f"SYM{i}/USDT": _synthetic_history(bars, seed=i) for i in range(symbols)}
+    engine = get_replay_engine()
+
+    start = time.perf_counter()
+    signals = engine.replay_many(histories)
+    elapsed = time.perf_counter() - start
+
+    # Check one symbol bar by bar against the live scalar rules and indicator engine
+    symbol, history = next(iter(histories.items()))
+    batch = engine.build_batch(symbol, history['ohlcv'], history['funding'], history['open_interest'])
+    live = IndicatorEngine({'close': [20, 50, 200], 'volume': [config.VOLUME_LOOKBACK * 24]}, {'volume': 1})
+    analyzer = get_market_analyzer()
+    rows = history['ohlcv'].to_numpy()
+    mismatches = 0
+    for i in range(min(bars, checked_bars)):
+        live.update([rows[i]])
+        expected_mas = [live.mean('close', period) for period in (20, 50, 200)]
+        replayed_mas = [batch.ma_20[i], batch.ma_50[i], batch.ma_200[i]]
+        if not all(np.isnan(r) if e is None else e == r for e, r in zip(expected_mas, replayed_mas)):
+            mismatches += 1
+        if live.mean('volume', config.VOLUME_LOOKBACK * 24) != batch.volume_avg_7d[i]:
+            mismatches += 1
+
+        analysis = analyzer.analyze_market(batch.market_data(i))
+        row = signals.iloc[i]
+        anomaly_types = {a.type for a in analysis.anomalies}
+        outcome = (row['trend'] if row['trend'] != 'unknown' else 'neutral', row['funding_rate_status'],
+                   row['volatility_status'], bool(row['volume_spike']), bool(row['funding_extreme']),
+                   bool(row['oi_spike']))
+        expected = (analysis.trend, analysis.funding_rate_status, analysis.volatility_status,
+                    'volume_spike' in anomaly_types, 'funding_extreme' in anomaly_types, 'oi_spike' in anomaly_types)
+        if outcome != expected or not np.isclose(row['volume_change_pct'], analysis.volume_change_pct, rtol=1e-6):
+            mismatches += 1
+
+    print(f"{symbols} symbols x {bars} bars = {len(signals)} rows")
+    print(f"  replay time:        {elapsed:.3f} s ({len(signals) / elapsed:,.0f} bars/s)")
+    print(f"  signal table:       {signals.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    print(f"  live-path mismatch: {mismatches} in {min(bars, checked_bars)} checked bars")
+    return {'elapsed': elapsed, 'rows': len(signals), 'mismatches': mismatches}
+
+
+# ---------------------------------------------------------------------------
+# Full pipeline against the fake exchange
+# ---------------------------------------------------------------------------
+
+class TimedAgent(CryptoAnalysisAgent):
+    """Agent that records the duration of every graph node call"""
+
+    def __init__(self):
+        self.node_timings: Dict[str, List[float]] = defaultdict(list)
+        super().__init__()
+
+    async def acollect_data_node(self, state):
+        start = time.perf_counter()
+        try:
+            return await super().acollect_data_node(state)
+        finally:
+            self.node_timings['collect_data'].append(time.perf_counter() - start)
+
+    def analyze_market_node(self, state):
+        start = time.perf_counter()
+        try:
+            return super().analyze_market_node(state)
+        finally:
+            self.node_timings['analyze_market'].append(time.perf_counter() - start)
+
+    def generate_report_node(self, state):
+        start = time.perf_counter()
+        try:
+            return super().generate_report_node(state)
+        finally:
+            self.node_timings['generate_report'].append(time.perf_counter() - start)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if values else (0.0, 0.0, 0.0)
+    return {'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000}
+
+
+def _run_pipeline_cycle(size: int, latency: float, jitter: float, concurrency: int,
+                        trace_memory: bool) -> Dict:
+    """One cold collect -> analyze -> report cycle over `size` fake symbols"""
+    symbols = [f"FAKE{i}/USDT" for i in range(size)]
+    if trace_memory:
+        tracemalloc.start()
+    agent = TimedAgent()
+    server = FakeBinanceServer(latency, jitter)
+    try:
+        config.BINANCE_FAPI_URL = agent._run(server.start())
+        agent.data_collector.exchange = FakeExchange(symbols, latency, jitter)
+        agent.data_collector.limiter = RateLimiter(limit=UNLIMITED_WEIGHT)  # the fake exchange has no weight limit
+        with contextlib.redirect_stdout(io.StringIO()):  # silence per-node progress prints
+            start = time.perf_counter()
+            reports = dict(agent.stream_analyze_many(symbols, concurrency))
+            elapsed = time.perf_counter() - start
+        failed = sum(1 for report in reports.values() if report.startswith('❌'))
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6 if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        agent._run(server.stop())
+        agent.close()
+
+    return {
+        'symbols': size,
+        'seconds': elapsed,
+        'symbols_per_sec': size / elapsed,
+        'failed': failed,
+        'nodes': {node: _percentiles(timings) for node, timings in agent.node_timings.items()},
+        'peak_memory_mb': peak_mb,
+    }
+
+
+def bench_pipeline(sizes: List[int], latency: float, jitter: float, concurrency: int) -> Dict[str, Dict]:
+    """Throughput, node latency percentiles and peak memory for each symbol count"""
+    results = {}
+    for size in sizes:
+        result = _run_pipeline_cycle(size, latency, jitter, concurrency, trace_memory=False)
+        # Memory is measured in a separate run so tracing does not skew the timings
+        result['peak_memory_mb'] = _run_pipeline_cycle(size, latency, jitter, concurrency,
+                                                       trace_memory=True)['peak_memory_mb']
+        results[str(size)] = result
+
+        print(f"{size} symbols: {result['symbols_per_sec']:.1f} symbols/s, "
+              f"{result['seconds']:.2f} s, peak {result['peak_memory_mb']:.1f} MB, {result['failed']} failed")
+        for node, stats in result['nodes'].items():
+            print(f"  {node:<16} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                  f"p99 {stats['p99_ms']:8.2f} ms")
+    return results
+
+
+def flatten_results(results: Dict, prefix: str = '') -> Dict[str, Any]:
+    """Nested benchmark results as {'outer/inner': value}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_results(value, f"{name}/"))
+        else:
+            flat[name] = value
+    return flat
+
+
+def compare_results(results: Dict, baseline: Dict):
+    """Print the relative change of each metric against a saved baseline"""
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    old = flatten_results(baseline)
+    print("\nChange vs baseline:")
+    for name, value in flatten_results(results).items():
+        if name not in old:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            print(f"  {name:<40} {change(value, old[name])}")
+        else:
+            print(f"  {name:<40} {old[name]} -> {value}")
+
+
+# ---------------------------------------------------------------------------
+# Full-market scan
+# ---------------------------------------------------------------------------
+
+def bench_scan(symbols: int, top_k: int, latency: float, concurrency: int) -> Dict[str, float]:
+    """End-to-end scan time over a fake universe: bulk screen plus deep analysis of top_k"""
+    universe = [f"FAKE{i}/USDT" for i in range(symbols)]
+    agent = CryptoAnalysisAgent()
+    server = FakeBinanceServer(latency)
+    try:
+        config.BINANCE_FAPI_URL = agent._run(server.start())
+        agent.data_collector.exchange = FakeExchange(universe, latency)
+        agent.data_collector.limiter = RateLimiter(limit=UNLIMITED_WEIGHT)
+        scanner = get_market_scanner(agent)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = scanner.scan(top_k, concurrency)
+        calls = dict(agent.data_collector.exchange.calls)
+    finally:
+        agent._run(server.stop())
+        agent.close()
+
+    print(f"Universe: {symbols} symbols, {len(result.screen)} screened, top {len(result.candidates)} analyzed")
+    print(f"  scan time:      {result.seconds:.2f} s")
+    print(f"  exchange calls: {sum(calls.values())} ({calls})")
+    return {'seconds': result.seconds, 'screened': len(result.screen), 'analyzed': len(result.candidates)}
+
+
+# ---------------------------------------------------------------------------
+# Sharded multi-process analysis
+# ---------------------------------------------------------------------------
+
+def _fake_collector(universe: List[str], latency: float, fapi_url: str) -> DataCollector:
+    """DataCollector on the fake exchange (built inside each worker process)"""
+    config.BINANCE_FAPI_URL = fapi_url
+    collector = DataCollector()
+    collector.exchange = FakeExchange(universe, latency)
+    collector.limiter = RateLimiter(limit=UNLIMITED_WEIGHT)
+    return collector
+
+
+def bench_sharded(symbols: int, workers: List[int], latency: float, concurrency: int) -> Dict[int, float]:
+    """Symbols/s of one cold sharded cycle for each worker count"""
+    universe = [f"FAKE{i}/USDT" for i in range(symbols)]
+    server = FakeBinanceServer(latency)
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        fapi_url = loop.run_until_complete(server.start())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        print(f"{symbols} symbols, {os.cpu_count()} CPU cores available")
+        for count in workers:
+            analyzer = ShardedAnalyzer(count, functools.partial(_fake_collector, universe, latency, fapi_url),
+                                       concurrency)
+            try:
+                analyzer.start()
+                result = analyzer.analyze(universe, reports=True)
+            finally:
+                analyzer.close()
+            results[count] = symbols / result.seconds
+            speedup = results[count] / results[workers[0]]
+            print(f"  {count} worker(s): {results[count]:8.1f} symbols/s ({speedup:.2f}x), "
+                  f"{int(result.ok.sum())}/{symbols} ok, {len(result.reports)} reports")
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Dirty-checked re-analysis
+# ---------------------------------------------------------------------------
+
+def _market_data(symbol: str, rng: np.random.Generator) -> MarketData:
+    price = rng.uniform(1, 50000)
+    return MarketData(
+        symbol=symbol, timestamp=datetime.now(), price=price,
+        volume_24h=rng.uniform(1e6, 1e9), volume_avg_7d=rng.uniform(1e6, 1e9),
+        open_interest=rng.uniform(1e4, 1e6), open_interest_change=rng.normal(0, 0.05),
+        funding_rate=rng.normal(0, 0.005),
+        ma_20=price * rng.uniform(0.95, 1.05), ma_50=price * rng.uniform(0.9, 1.1), ma_200=price * rng.uniform(0.8, 1.2),
+        high_24h=price * 1.03, low_24h=price * 0.97,
+        liquidations={'total_liquidations': 60, 'long_liquidations': 40, 'short_liquidations': 20},
+        timeframe_mas={tf: {'ma_20': price, 'ma_50': price, 'ma_200': None} for tf in config.ANALYSIS_TIMEFRAMES},
+        candle_time=0,
+    )
+
+
+def _tick(data: MarketData, move: float) -> MarketData:
+    """The same market a cycle later, with price and MAs moved by `move` (relative)"""
+    scale = 1 + move
+    return dataclasses.replace(
+        data, timestamp=datetime.now(), price=data.price * scale, ma_20=data.ma_20 * (1 + move / 20),
+        timeframe_mas={tf: {k: v * (1 + move / 20) if v else v for k, v in mas.items()}
+                       for tf, mas in data.timeframe_mas.items()},
+    )
+
+
+def bench_reanalysis(symbols: int, active: List[float], cycles: int) -> Dict[str, Dict[str, float]]:
+    """
+    CPU per cycle of full recompute vs dirty-checked re-analysis when only a
+    fraction of the symbols moved past the thresholds
+    """
+    analyzer = get_market_analyzer()
+    generator = get_report_generator()
+    rng = np.random.default_rng(0)
+    base = [_market_data(f"FAKE{i}/USDT", rng) for i in range(symbols)]
+    results = {}
+    for fraction in active:
+        incremental = IncrementalAnalyzer(analyzer, generator)
+        for data in base:
+            incremental.report(incremental.analyze(data)[0])
+        full_times, incremental_times = [], []
+        current = list(base)
+        for _ in range(cycles):
+            movers = set(rng.choice(symbols, int(symbols * fraction), replace=False))
+            current = [_tick(d, 0.01 if i in movers else 0.00001) for i, d in enumerate(current)]
+
+            start = time.perf_counter()
+            for data in current:
+                generator.format_report(analyzer.analyze_market(data))
+            full_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for data in current:
+                incremental.report(incremental.analyze(data)[0])
+            incremental_times.append(time.perf_counter() - start)
+
+        full, dirty = statistics.median(full_times), statistics.median(incremental_times)
+        results[str(fraction)] = {'full_ms': full * 1000, 'incremental_ms': dirty * 1000}
+        print(f"{fraction:>5.0%} active of {symbols}: full {format_ms(full)}, "
+              f"dirty-checked {format_ms(dirty)} per cycle ({full / dirty:.1f}x)")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Analysis history store
+# ---------------------------------------------------------------------------
+
+def bench_history(symbols: int, snapshots: int, queries: int) -> Dict[str, float]:
+    """Bulk write rate, record() cost and query latency over symbols x snapshots rows"""
+    analyzer = get_market_analyzer()
+    rng = np.random.default_rng(0)
+    analyses = [analyzer.analyze_market(_market_data(f"FAKE{i}/USDT", rng)) for i in range(symbols)]
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(minutes=snapshots)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, 'history.sqlite3'), retention_days=0)
+
+        written, write_time = 0, 0.0
+        for step in range(snapshots):
+            timestamp = start + timedelta(minutes=step)
+            batch = [dataclasses.replace(a, timestamp=timestamp) for a in analyses]
+            begin = time.perf_counter()
+            store.write(batch)
+            write_time += time.perf_counter() - begin
+            written += len(batch)
+        results['rows'] = written
+        results['write_rows_per_sec'] = written / write_time
+        print(f"wrote {written} snapshots: {written / write_time:,.0f} rows/s in batches of {symbols}, "
+              f"file {os.path.getsize(store.path) / 1e6:.0f} MB")
+
+        # What the analysis path pays: queueing only
+        batch = [dataclasses.replace(a, timestamp=end + timedelta(minutes=1)) for a in analyses]
+        begin = time.perf_counter()
+        for analysis in batch:
+            store.record(analysis)
+        results['record_us'] = (time.perf_counter() - begin) / len(batch) * 1e6
+        store.flush()
+        print(f"record(): {results['record_us']:.1f} us per snapshot (written by the background thread)")
+
+        def timed(name: str, query):
+            timings = []
+            for i in range(queries):
+                begin = time.perf_counter()
+                rows = query(i)
+                timings.append(time.perf_counter() - begin)
+            results[f"{name}_p50_ms"] = statistics.median(timings) * 1000
+            results[f"{name}_p95_ms"] = float(np.percentile(timings, 95)) * 1000
+            print(f"  {name:<24} p50 {format_ms(statistics.median(timings))}, "
+                  f"p95 {format_ms(float(np.percentile(timings, 95)))} ({len(rows)} rows)")
+
+        names = [a.symbol for a in analyses]
+        timed('last_100', lambda i: store.last_snapshots(names[i % symbols], 100))
+        timed('latest_20_symbols', lambda i: store.latest(names[i % symbols:i % symbols + 20]))
+        timed('anomalies_1h', lambda i: store.anomalies(end - timedelta(hours=1), end))
+        timed('anomalies_1d_5_symbols', lambda i: store.anomalies(end - timedelta(days=1), end,
+                                                                  names[i % symbols:i % symbols + 5]))
+
+        store.retention_days = snapshots / 2 / 1440  # drop the older half
+        begin = time.perf_counter()
+        store.compact(now=end)
+        results['compact_seconds'] = time.perf_counter() - begin
+        print(f"compact (drop half): {results['compact_seconds']:.2f} s")
+        store.close()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# HTTP/JSON API
+# ---------------------------------------------------------------------------
+
+def bench_api(symbols: int, clients: int, seconds: float) -> Dict[str, float]:
+    """
+    Request rate and latency of the API once every symbol is analyzed, and
+    the exchange calls made while serving (should be none)
+    """
+    names = [f"FAKE{i}/USDT" for i in range(symbols)]
+    agent = CryptoAnalysisAgent()
+    server = FakeBinanceServer()
+    service = AnalysisService(agent, interval=3600)  # no refresh during the measurement
+    try:
+        config.BINANCE_FAPI_URL = agent._run(server.start())
+        exchange = agent.data_collector.exchange = FakeExchange(names)
+        agent.data_collector.limiter = RateLimiter(limit=UNLIMITED_WEIGHT)
+        with contextlib.redirect_stdout(io.StringIO()):
+            url = agent._run(service.start('127.0.0.1', 0, names))
+            agent._run(service.wait_ready(names, timeout=60))
+        calls_before = sum(exchange.calls.values()) + server.requests
+
+        async def load() -> List[float]:
+            latencies = []
+            etags: Dict[str, str] = {}
+            deadline = time.perf_counter() + seconds
+            connector = aiohttp.TCPConnector(limit=clients)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                async def client(i: int):
+                    while time.perf_counter() < deadline:
+                        symbol = names[i % symbols]
+                        i += 1
+                        # Half the clients poll with If-None-Match, as a caching consumer would
+                        headers = {'If-None-Match': etags[symbol]} if i % 2 and symbol in etags else {}
+                        start = time.perf_counter()
+                        async with session.get(f"{url}/analysis/{symbol}", headers=headers) as response:
+                            await response.read()
+                            etags[symbol] = response.headers.get('ETag', '')
+                        latencies.append(time.perf_counter() - start)
+                await asyncio.gather(*(client(i) for i in range(clients)))
+            return latencies
+
+        latencies = asyncio.run(load())
+        calls = sum(exchange.calls.values()) + server.requests - calls_before
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent._run(service.stop())
+            agent._run(server.stop())
+            agent.close()
+
+    result = {'requests_per_sec': len(latencies) / seconds, 'exchange_calls': calls,
+              **_percentiles(latencies)}
+    print(f"{clients} clients over {symbols} symbols: {result['requests_per_sec']:,.0f} requests/s, "
+          f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+          f"exchange calls while serving: {calls}")
+    return result
+
+
+# ---------------------------------------------------------------------------
+# WebSocket streaming
+# ---------------------------------------------------------------------------
+
+async def _wait_until(condition, timeout: float) -> float:
+    """Seconds until condition() holds (raises TimeoutError after timeout)"""
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("condition not reached")
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start
+
+
+async def bench_stream(symbols: int, seconds: float, interval: float, gap: int) -> Dict[str, float]:
+    """
+    Streaming against the local WebSocket stand-in: time to go live, state
+    freshness and REST calls while streaming, and recovery after a dropped
+    connection with `gap` candles opened while disconnected
+    """
+    universe = [f"FAKE{i}/USDT" for i in range(symbols)]
+    exchange = FakeExchange(universe)
+    server = FakeBinanceServer(exchange=exchange, stream_interval=interval)
+    config.BINANCE_FAPI_URL = await server.start()
+    collector = DataCollector()
+    collector.exchange = exchange
+    collector.limiter = RateLimiter(limit=UNLIMITED_WEIGHT)
+    stream = collector.stream = MarketStream(collector, url=server.ws_url)
+
+    def all_live() -> bool:
+        return all(stream.live_state(symbol) is not None for symbol in universe)
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await stream.track(universe)
+            stream.start()
+            live_seconds = await _wait_until(all_live, 60)
+
+            # State age seen by readers, and REST calls made while streaming
+            calls_before = sum(exchange.calls.values()) + server.requests
+            ages, collect_times = [], []
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                now = time.time()
+                ages.extend(now - stream.states[symbol].updated for symbol in universe)
+                start = time.perf_counter()
+                await collector.collect_market_data(universe[len(collect_times) % symbols])
+                collect_times.append(time.perf_counter() - start)
+                await asyncio.sleep(interval / 2)
+            candle_calls = exchange.calls.get('fetch_ohlcv', 0)
+            rest_calls = sum(exchange.calls.values()) + server.requests - calls_before
+
+            # Drop the connection, open `gap` candles meanwhile, and wait for the backfill
+            await server.drop_connections()
+            await _wait_until(lambda: not stream.connected, 5)
+            for symbol in universe:
+                exchange.tick(symbol, new_candles=gap)
+            recovery_seconds = await _wait_until(all_live, 60)
+            backfill_calls = exchange.calls.get('fetch_ohlcv', 0) - candle_calls
+
+        # Closed candles must match the exchange exactly after the backfill
+        def matches(symbol: str) -> bool:
+            buffer = collector.candle_store.get(symbol, config.BASE_TIMEFRAME)
+            expected = np.array(exchange.fetch_ohlcv(symbol, config.BASE_TIMEFRAME, limit=len(buffer)))
+            return np.array_equal(buffer.tail('close')[:-1], expected[:-1, 4])
+
+        matched = sum(matches(symbol) for symbol in universe)
+    finally:
+        await collector.close()
+        await server.stop()
+
+    p50, p95 = np.percentile(ages, [50, 95])
+    print(f"{symbols} symbols, {server.stream_messages} stream messages over {server.connections} connections")
+    print(f"  live after:        {live_seconds:.2f} s (subscribe + REST backfill)")
+    print(f"  state age:         p50 {format_ms(p50)}, p95 {format_ms(p95)}")
+    print(f"  collect (live):    p50 {format_ms(np.percentile(collect_times, 50))}")
+    print(f"  REST calls live:   {rest_calls} in {seconds:.0f} s (ticker/OI only; candles, funding, liquidations streamed)")
+    print(f"  reconnect:         {recovery_seconds:.2f} s to live again, {backfill_calls} candle backfill calls")
+    print(f"  candles after gap: {matched}/{symbols} symbols match the exchange")
+    return {'live_seconds': live_seconds, 'age_p50': p50, 'age_p95': p95,
+            'recovery_seconds': recovery_seconds, 'matched': matched}
+
+
+# ---------------------------------------------------------------------------
+# Startup time
+# ---------------------------------------------------------------------------
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from agent import get_agent
+imported = time.perf_counter()
+agent = get_agent()
+created = time.perf_counter()
+agent._run(agent.data_collector.ensure_markets())
+ready = time.perf_counter()
+print(json.dumps({'import': imported - start, 'get_agent': created - imported, 'markets': ready - created,
+                  'markets_loaded': bool(agent.data_collector.exchange.markets)}))
+agent.close()
+"""
+
+
+def _startup_run() -> Dict:
+    """Time one fresh interpreter: import agent, get_agent(), market metadata ready"""
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(runs: int) -> Dict[str, Dict[str, float]]:
+    """Cold (no markets cache) vs warm (fresh markets cache) startup, median of `runs`"""
+    cache_file = config.MARKETS_CACHE_FILE
+    backup = f"{cache_file}.bench-backup"
+    if os.path.exists(cache_file):
+        os.replace(cache_file, backup)
+    results = {}
+    try:
+        cold = []
+        for _ in range(runs):
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+            cold.append(_startup_run())
+        warm = [_startup_run() for _ in range(runs)] if os.path.exists(cache_file) else []
+    finally:
+        if os.path.exists(backup):
+            os.replace(backup, cache_file)
+
+    for name, samples in (('cold', cold), ('warm', warm)):
+        if not samples:
+            print(f"{name}: skipped (markets could not be loaded, so no cache was written)")
+            continue
+        medians = {phase: statistics.median(s[phase] for s in samples) for phase in ('import', 'get_agent', 'markets')}
+        results[name] = medians
+        loaded = all(s['markets_loaded'] for s in samples)
+        print(f"{name}: import {format_ms(medians['import'])}, get_agent() {format_ms(medians['get_agent'])}, "
+              f"markets {format_ms(medians['markets'])}{'' if loaded else ' (not loaded)'}, "
+              f"total {format_ms(sum(medians.values()))}")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Headless daemon
+# ---------------------------------------------------------------------------
+
+DAEMON_SCRIPT = """
+import contextlib, io, json, os, resource, statistics, sys
+import config
+config.HISTORY_ENABLED = False
+from agent import get_agent
+from daemon import AnalysisDaemon, JsonLinesWriter
+from fake_exchange import FakeExchange, FakeBinanceServer
+from rate_limiter import RateLimiter
+symbols, interval, cycles = [f"FAKE{{i}}/USDT" for i in range({symbols})], {interval}, {cycles}
+agent = get_agent()
+server = FakeBinanceServer()
+config.BINANCE_FAPI_URL = agent._run(server.start())
+agent.data_collector.exchange = FakeExchange(symbols)
+agent.data_collector.limiter = RateLimiter(limit=10 ** 12)
+output = io.StringIO()
+daemon = AnalysisDaemon(agent, symbols, interval, writer=JsonLinesWriter(stream=output))
+with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+    agent._run(daemon.run(cycles))
+    agent._run(server.stop())
+    agent.close()
+late = sorted(daemon.lateness)
+print(json.dumps({{'lines': output.getvalue().count(chr(10)), 'skipped': daemon.skipped,
+                  'late_p50': statistics.median(late), 'late_max': late[-1],
+                  'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def bench_daemon(symbols: int, interval: float, cycles: int) -> Dict[str, float]:
+    """Schedule accuracy and peak memory of the daemon in a fresh interpreter"""
+    script = DAEMON_SCRIPT.format(symbols=symbols, interval=interval, cycles=cycles)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"{cycles} cycles of {symbols} symbols every {interval}s: {stats['lines']} lines, "
+          f"cycle start lateness p50 {format_ms(stats['late_p50'])}, max {format_ms(stats['late_max'])}, "
+          f"{stats['skipped']} slots skipped, peak RSS {stats['max_rss_mb']:.0f} MB")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crypto analysis benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    # Every benchmark can save its results and compare them with an earlier run
+    results_parser = argparse.ArgumentParser(add_help=False)
+    results_parser.add_argument('--output', help="Save results as JSON")
+    results_parser.add_argument('--baseline', help="Compare against results saved with --output")
+    add_benchmark = functools.partial(subparsers.add_parser, parents=[results_parser])
+
+    http_parser = add_benchmark('http', help="Pooled vs per-request HTTP sessions")
+    http_parser.add_argument('--requests', type=int, default=200)
+    http_parser.add_argument('--base-url', default=None,
+                             help="Benchmark a real endpoint (e.g. https://fapi.binance.com) instead of the local stand-in")
+
+    indicators_parser = add_benchmark('indicators', help="pandas rolling vs incremental indicators")
+    indicators_parser.add_argument('--candles', type=int, default=1000)
+    indicators_parser.add_argument('--ticks', type=int, default=5)
+
+    replay_parser = add_benchmark('replay', help="Vectorized historical replay of the analyzer rules")
+    replay_parser.add_argument('--symbols', type=int, default=30)
+    replay_parser.add_argument('--bars', type=int, default=24 * 365)
+
+    pipeline_parser = add_benchmark('pipeline', help="Collect -> analyze -> report against a fake exchange")
+    pipeline_parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500])
+    pipeline_parser.add_argument('--latency', type=float, default=0.02, help="Injected latency per call (s)")
+    pipeline_parser.add_argument('--jitter', type=float, default=0.01, help="Uniform +/- jitter per call (s)")
+    pipeline_parser.add_argument('--concurrency', type=int, default=config.ANALYSIS_CONCURRENCY)
+
+    scan_parser = add_benchmark('scan', help="Full-market scan against a fake exchange")
+    scan_parser.add_argument('--symbols', type=int, default=300)
+    scan_parser.add_argument('--top-k', type=int, default=config.SCANNER_TOP_K)
+    scan_parser.add_argument('--latency', type=float, default=0.02, help="Injected latency per call (s)")
+    scan_parser.add_argument('--concurrency', type=int, default=config.ANALYSIS_CONCURRENCY)
+
+    sharded_parser = add_benchmark('sharded', help="Multi-process sharded analysis against a fake exchange")
+    sharded_parser.add_argument('--symbols', type=int, default=400)
+    sharded_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    sharded_parser.add_argument('--latency', type=float, default=0.0, help="Injected latency per call (s)")
+    sharded_parser.add_argument('--concurrency', type=int, default=16, help="Concurrent symbols per worker")
+
+    reanalysis_parser = add_benchmark('reanalysis', help="Full recompute vs dirty-checked re-analysis")
+    reanalysis_parser.add_argument('--symbols', type=int, default=500)
+    reanalysis_parser.add_argument('--active', type=float, nargs='+', default=[0.0, 0.05, 0.25, 1.0],
+                                   help="Fractions of symbols moving past the thresholds each cycle")
+    reanalysis_parser.add_argument('--cycles', type=int, default=5)
+
+    stream_parser = add_benchmark('stream', help="WebSocket streaming against a local stand-in server")
+    stream_parser.add_argument('--symbols', type=int, default=20)
+    stream_parser.add_argument('--seconds', type=float, default=5.0, help="How long to sample live state")
+    stream_parser.add_argument('--interval', type=float, default=0.25, help="Seconds between events per stream")
+    stream_parser.add_argument('--gap', type=int, default=5, help="Candles opened while disconnected")
+
+    history_parser = add_benchmark('history', help="Analysis history store writes and queries")
+    history_parser.add_argument('--symbols', type=int, default=1000)
+    history_parser.add_argument('--snapshots', type=int, default=1000, help="Snapshots per symbol (one per minute)")
+    history_parser.add_argument('--queries', type=int, default=200)
+
+    api_parser = add_benchmark('api', help="HTTP API request rate against analyzed fake symbols")
+    api_parser.add_argument('--symbols', type=int, default=50)
+    api_parser.add_argument('--clients', type=int, default=50, help="Concurrent client connections")
+    api_parser.add_argument('--seconds', type=float, default=5.0)
+
+    daemon_parser = add_benchmark('daemon', help="Daemon schedule accuracy and memory against a fake exchange")
+    daemon_parser.add_argument('--symbols', type=int, default=20)
+    daemon_parser.add_argument('--interval', type=float, default=1.0)
+    daemon_parser.add_argument('--cycles', type=int, default=10)
+
+    startup_parser = add_benchmark('startup', help="Cold vs warm get_agent() startup time")
+    startup_parser.add_argument('--runs', type=int, default=3)
+
+    args = parser.parse_args()
+    config.HISTORY_ENABLED = False  # keep fake symbols out of the local history
+
+    if args.benchmark == 'http':
+        results = asyncio.run(bench_http(args.requests, args.base_url))
+    elif args.benchmark == 'indicators':
+        results = bench_indicators(args.candles, args.ticks)
+    elif args.benchmark == 'replay':
+        results = bench_replay(args.symbols, args.bars)
+    elif args.benchmark == 'pipeline':
+        results = bench_pipeline(args.sizes, args.latency, args.jitter, args.concurrency)
+    elif args.benchmark == 'scan':
+        results = bench_scan(args.symbols, args.top_k, args.latency, args.concurrency)
+    elif args.benchmark == 'sharded':
+        results = bench_sharded(args.symbols, args.workers, args.latency, args.concurrency)
+    elif args.benchmark == 'reanalysis':
+        results = bench_reanalysis(args.symbols, args.active, args.cycles)
+    elif args.benchmark == 'stream':
+        results = asyncio.run(bench_stream(args.symbols, args.seconds, args.interval, args.gap))
+    elif args.benchmark == 'history':
+        results = bench_history(args.symbols, args.snapshots, args.queries)
+    elif args.benchmark == 'api':
+        results = bench_api(args.symbols, args.clients, args.seconds)
+    elif args.benchmark == 'daemon':
+        results = bench_daemon(args.symbols, args.interval, args.cycles)
+    elif args.benchmark == 'startup':
+        results = bench_startup(args.runs)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare_results(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
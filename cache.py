@@ -0,0 +1,187 @@
+"""TTL caching for data collection"""
+import asyncio
+import functools
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+import config
+from metrics import CACHE_LOOKUPS
+
+
+def _is_cacheable(value: Any) -> bool:
+    """Fetch methods signal failure with None or an empty result; never cache those"""
+    if value is None:
+        return False
+    try:
+        return len(value) > 0
+    except TypeError:
+        return True
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight task.
+    Every caller gets the task's result or exception. A caller that is
+    cancelled only stops waiting; the shared task is cancelled once no
+    caller is waiting for it any more.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Counter = Counter()  # callers awaiting each task
+        self.stats: Counter = Counter()  # 'leaders' started a task, 'followers' joined one
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable]) -> Any:
+        """Await fetch(), or the call already in flight for key"""
+        task = self._tasks.get(key)
+        if task is None:
+            self.stats['leaders'] += 1
+            task = asyncio.ensure_future(fetch())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats['followers'] += 1
+
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                self._forget(key, task)  # later callers start afresh
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with a TTL per entry and stale-while-revalidate.
+    Keys are tuples whose first element is the data source name, which is
+    used for the per-source hit/miss counters. Concurrent misses and
+    refreshes of one key share a single fetch.
+    """
+
+    def __init__(self, max_entries: int = 1024, stale_factor: float = 2.0,
+                 cacheable: Callable[[Any], bool] = _is_cacheable):
+        self.max_entries = max_entries
+        self.stale_factor = stale_factor
+        self.cacheable = cacheable
+        self._entries: 'OrderedDict[Hashable, Tuple[float, float, Any]]' = OrderedDict()  # key -> (stored_at, ttl, value)
+        self.inflight = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+        self.stats: Dict[str, Counter] = defaultdict(Counter)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: Hashable, ttl: float, value: Any):
+        if not self.cacheable(value):
+            return
+        self._entries[key] = (time.monotonic(), ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self.stats[evicted[0]]['evictions'] += 1
+
+    async def _fetch_and_store(self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable]) -> Any:
+        # Failures raise before anything is stored, so they never reach the cache
+        value = await fetch()
+        self._store(key, ttl, value)
+        return value
+
+    async def _revalidate(self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable]):
+        try:
+            await self.inflight.do(key, lambda: self._fetch_and_store(key, ttl, fetch))
+        except Exception as e:
+            print(f"Error revalidating {key}: {e}")
+
+    async def get_or_fetch(self, key: Tuple, ttl: Optional[float], fetch: Callable[[], Awaitable]) -> Any:
+        """
+        Return the cached value for key, calling fetch on a miss.
+        Values older than ttl but within ttl * stale_factor are returned
+        as-is while a background refresh runs. A ttl of None bypasses the cache.
+        """
+        source = key[0]
+        if not ttl:
+            return await self.inflight.do(key, fetch)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, _, value = entry
+            age = time.monotonic() - stored_at
+            if age < ttl:
+                self._entries.move_to_end(key)
+                self.stats[source]['hits'] += 1
+                CACHE_LOOKUPS.inc(source=source, result='hit')
+                return value
+            if age < ttl * self.stale_factor:
+                self._entries.move_to_end(key)
+                self.stats[source]['stale_hits'] += 1
+                CACHE_LOOKUPS.inc(source=source, result='stale')
+                if key not in self.inflight:
+                    task = asyncio.create_task(self._revalidate(key, ttl, fetch))
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+                return value
+
+        self.stats[source]['misses'] += 1
+        CACHE_LOOKUPS.inc(source=source, result='miss')
+        return await self.inflight.do(key, lambda: self._fetch_and_store(key, ttl, fetch))
+
+    def hit_rate(self, source: Optional[str] = None) -> float:
+        """Fraction of lookups served from cache (fresh or stale)"""
+        counters = [self.stats[source]] if source else list(self.stats.values())
+        hits = sum(c['hits'] + c['stale_hits'] for c in counters)
+        total = hits + sum(c['misses'] for c in counters)
+        return hits / total if total else 0.0
+
+    def invalidate(self, source: Optional[str] = None):
+        """Drop all entries, or only those of one source"""
+        if source is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == source]:
+            del self._entries[key]
+
+
+def cached(source: str):
+    """
+    Cache an async DataCollector method in self.cache, keyed by the method
+    and its arguments (methods may share a source), with the TTL configured for the source in config.CACHE_TTLS.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            key = (source, method.__qualname__, args, tuple(sorted(kwargs.items())))
+            return await self.cache.get_or_fetch(
+                key, config.CACHE_TTLS.get(source), lambda: method(self, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+def coalesced(source: str):
+    """
+    Share one in-flight call of an async DataCollector method between
+    concurrent callers with the same arguments, without caching the result.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            key = (source, method.__qualname__, args, tuple(sorted(kwargs.items())))
+            return await self.cache.inflight.do(key, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+"""In-memory candle storage for incremental OHLCV updates"""
+import numpy as np
+from typing import Dict, Iterable, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class CandleBuffer:
+    """Fixed-capacity, NumPy-backed ring buffer of OHLCV candles"""
+
+    FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, len(self.FIELDS)), dtype=np.float64)
+        self._start = 0  # physical index of the oldest candle
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _newest_index(self) -> int:
+        return (self._start + self._size - 1) % self.capacity
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Open time (ms) of the newest, possibly still-open, candle"""
+        if not self._size:
+            return None
+        return int(self._data[self._newest_index(), 0])
+
+    def upsert(self, candles: Iterable[Sequence[float]]) -> int:
+        """
+        Merge ccxt-style [timestamp, open, high, low, close, volume] rows.
+        A row with the newest timestamp replaces that candle (it was still
+        open), newer rows are appended and evict the oldest once full, and
+        older rows are ignored. Returns the number of rows written.
+        """
+        written = 0
+        for candle in candles:
+            timestamp = candle[0]
+            if self._size:
+                newest = self._newest_index()
+                newest_timestamp = self._data[newest, 0]
+                if timestamp == newest_timestamp:
+                    self._data[newest] = candle[:len(self.FIELDS)]
+                    written += 1
+                    continue
+                if timestamp < newest_timestamp:
+                    continue
+
+            if self._size < self.capacity:
+                index = (self._start + self._size) % self.capacity
+                self._size += 1
+            else:
+                index = self._start
+                self._start = (self._start + 1) % self.capacity
+            self._data[index] = candle[:len(self.FIELDS)]
+            written += 1
+        return written
+
+    def tail(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        """Last n values of a field in chronological order (all if n is None)"""
+        n = self._size if n is None else min(n, self._size)
+        column = self.FIELDS.index(field)
+        end = (self._start + self._size) % self.capacity
+        first = (end - n) % self.capacity
+        if first + n <= self.capacity:
+            return self._data[first:first + n, column]
+        return np.concatenate((self._data[first:, column], self._data[:end, column]))
+
+    def to_frame(self) -> 'pd.DataFrame':
+        """Buffer contents as a DataFrame shaped like DataCollector.fetch_ohlcv"""
+        import pandas as pd
+        df = pd.DataFrame({field: self.tail(field) for field in self.FIELDS})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+
+class CandleStore:
+    """Per-symbol, per-timeframe candle buffers"""
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], CandleBuffer] = {}
+
+    def get(self, symbol: str, timeframe: str) -> CandleBuffer:
+        """Get the buffer for a symbol/timeframe, creating an empty one"""
+        key = (symbol, timeframe)
+        if key not in self._buffers:
+            self._buffers[key] = CandleBuffer(self.capacity)
+        return self._buffers[key]
@@ -1,4 +1,5 @@
 """Configuration file for Crypto Market Analysis Agent"""
+import os
 
 # API Configuration
 BINANCE_API_KEY = ""  # User needs to set this
@@ -12,13 +13,151 @@ MA_PERIODS = [20, 50, 200]
 VOLUME_LOOKBACK = 7  # days
 FUNDING_RATE_THRESHOLD = 0.01  # 1%
 OI_SPIKE_THRESHOLD = 0.15  # 15% increase
+OI_SPIKE_LOOKBACK = 3600  # seconds, window the OI increase is measured over
 VOLUME_SPIKE_THRESHOLD = 0.30  # 30% increase
 
+# Data collection
+COLLECTOR_MAX_WORKERS = 16  # threads for blocking exchange calls
+SOURCE_TIMEOUT_DEFAULT = 10  # seconds
+SOURCE_TIMEOUTS = {  # seconds, per data source
+    "ohlcv": 10,
+    "ticker": 5,
+    "funding_rate": 5,
+    "open_interest": 5,
+    "liquidations": 5,
+    "sentiment": 2,
+    "bulk_snapshot": 10,
+    "oi_history": 10,
+}
+
+# Bulk snapshot: all tickers and funding rates in one request each per cycle
+BULK_SNAPSHOT_TTL = 30  # seconds a snapshot is used instead of per-symbol calls
+
+# Per-source cache TTLs (seconds) in front of the DataCollector fetches
+CACHE_TTLS = {
+    "ohlcv": 15,
+    "ticker": 10,
+    "funding_rate": 300,  # settles every 8 hours
+    "open_interest": 20,
+    "liquidations": 30,
+    "sentiment": 3600,
+}
+CACHE_MAX_ENTRIES = 1024  # least recently used entries are evicted beyond this
+CACHE_STALE_FACTOR = 2.0  # serve stale data up to TTL x factor while refreshing
+
+# Candle buffers: seeded once, then topped up with only new/open candles
+CANDLE_BUFFER_SIZE = 200  # candles kept per symbol and timeframe
+CANDLE_TOPUP_LIMIT = 99  # max candles per top-up (lowest Binance kline weight tier)
+
+# Open interest history (for OI spike detection)
+OI_HISTORY_RESOLUTION = 300  # seconds per slot
+OI_HISTORY_SLOTS = 288  # 24h at 5 minute resolution
+OI_HISTORY_SEED = True  # backfill from the exchange's OI history on first use
+OI_HISTORY_SEED_PERIOD = "5m"  # must match OI_HISTORY_RESOLUTION
+OI_HISTORY_SEED_RETRY = 600  # seconds before a failed seed is retried (never, if the exchange lacks the endpoint)
+
+# Raw Binance REST endpoints (shared keep-alive connection pool)
+BINANCE_FAPI_URL = "https://fapi.binance.com"
+HTTP_POOL_SIZE = 20  # total open connections
+HTTP_POOL_PER_HOST = 10  # open connections per host
+HTTP_KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept
+HTTP_DNS_CACHE_TTL = 300  # seconds
+
+# WebSocket streaming of klines, mark price (with funding) and force orders
+STREAMING_ENABLED = False  # stream tracked symbols instead of polling candles/funding/liquidations
+BINANCE_WS_URL = "wss://fstream.binance.com"
+STREAM_MAX_STREAMS = 200  # Binance limit per connection; each symbol uses 3 streams
+STREAM_HEARTBEAT = 30  # seconds between WebSocket pings
+STREAM_RECONNECT_MIN = 1  # seconds before reconnecting, doubled after each failure
+STREAM_RECONNECT_MAX = 60  # seconds
+STREAM_LIQUIDATION_HISTORY = 100  # force orders kept per symbol (as many as the REST endpoint returns)
+
+# Binance USD-M request weight budget
+BINANCE_WEIGHT_LIMIT = 2400  # weight per minute per IP
+RATE_LIMIT_SAFETY = 0.9  # fraction of the limit we allow ourselves
+RATE_LIMIT_BACKOFF = 60  # seconds to pause after a 429/418 without Retry-After
+VISIBLE_SYMBOL_TTL = 120  # seconds a symbol shown in the UI keeps foreground priority
+REQUEST_WEIGHTS = {
+    'fetch_ticker': 1,
+    'fetch_tickers': 40,
+    'fetch_funding_rate': 1,
+    'fetch_funding_rates': 10,
+    'fetch_open_interest': 1,
+    'fetch_open_interest_history': 1,
+    '/fapi/v1/allForceOrders': 20,
+    'allForceOrders_all': 50,  # allForceOrders without a symbol
+}  # klines are weighted by limit (see rate_limiter.kline_weight)
+# Break-even of the bulk snapshot (ticker + funding for all symbols) against per-symbol calls: 25
+BULK_SNAPSHOT_MIN_SYMBOLS = ((REQUEST_WEIGHTS['fetch_tickers'] + REQUEST_WEIGHTS['fetch_funding_rates'])
+                             // (REQUEST_WEIGHTS['fetch_ticker'] + REQUEST_WEIGHTS['fetch_funding_rate']))
+REQUEST_PRIORITIES = {
+    'fetch_ohlcv': 0,
+    'fetch_ticker': 0,
+    'fetch_tickers': 0,
+    'fetch_funding_rate': 1,
+    'fetch_funding_rates': 1,
+    'fetch_open_interest': 1,
+    'fetch_open_interest_history': 2,
+    '/fapi/v1/allForceOrders': 2,
+    'sentiment': 3,
+}  # lower is sent first when the budget is tight
+
+# Full-market scanner
+SCANNER_TOP_K = 10  # candidates that get the full analysis
+SCANNER_MIN_QUOTE_VOLUME = 5_000_000  # minimum 24h quote volume (USDT) to be screened
+
+# Number of symbols analyzed concurrently
+ANALYSIS_CONCURRENCY = 4
+ANALYSIS_CACHE_TTL = 30  # seconds a finished report is reused for the same symbol/timeframe
+
 # Data refresh interval (seconds)
 REFRESH_INTERVAL = 60
+SCHEDULER_TICK = 1.0  # seconds between background scheduler due-checks
+UI_POLL_INTERVAL = 5  # seconds between UI reads of refreshed reports
+SESSION_LEASE_TTL = 120  # seconds a UI session's tracked symbols outlive its last poll
+
+# Local HTTP/JSON API (python api.py)
+API_HOST = "127.0.0.1"
+API_PORT = 8080
+API_REFRESH_INTERVAL = 60  # seconds between re-analyses of each served symbol
+API_MAX_SYMBOLS = 200  # symbols clients can get tracked
+API_FIRST_RESULT_TIMEOUT = 30  # seconds a request for a new symbol waits for its first analysis
+API_SSE_HEARTBEAT = 15  # seconds between keep-alive comments on event streams
+
+# Headless daemon (python daemon.py)
+DAEMON_OUTPUT_MAX_BYTES = 50 * 1024 * 1024  # JSON lines file size before rotating
+DAEMON_OUTPUT_BACKUPS = 5  # rotated files kept
+
+# Dirty-checked re-analysis: the previous analysis and report are reused while none of
+# these inputs moved by more than its relative threshold since the last analysis
+# (0: any change, liquidations by total count); a new base candle always re-analyzes
+REANALYZE_THRESHOLDS = {
+    'price': 0.001,
+    'volume_24h': 0.01,
+    'funding_rate': 0.02,
+    'open_interest_change': 0.05,
+    'liquidations': 0.0,
+}
 
 # OpenAI API Key (for LangGraph - optional, can work without it)
 OPENAI_API_KEY = ""  # User can set this for enhanced analysis
 
 # Analysis timeframe
 TIMEFRAME = "1h"  # candlestick timeframe
+BASE_TIMEFRAME = "15m"  # the only series topped up from the exchange; others are resampled from it
+ANALYSIS_TIMEFRAMES = ["15m", "1h", "4h", "1d"]  # trend is reported for each
+
+# Exchange market metadata cache (skips load_markets on startup)
+MARKETS_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'binance_markets.json')
+MARKETS_CACHE_TTL = 24 * 3600  # seconds
+
+# Analysis history: append-only SQLite store of every analysis, for the overview tab
+HISTORY_ENABLED = True
+HISTORY_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'history.sqlite3')
+HISTORY_BATCH_SIZE = 500  # snapshots per write transaction
+HISTORY_FLUSH_INTERVAL = 1.0  # seconds a queued snapshot may wait before being written
+HISTORY_QUEUE_SIZE = 10000  # snapshots waiting to be written; more are dropped rather than block analysis
+HISTORY_RETENTION_DAYS = 30  # older snapshots and anomalies are deleted
+HISTORY_COMPACT_INTERVAL = 3600  # seconds between retention passes
+HISTORY_CACHE_KB = 16384  # SQLite page cache per connection
+HISTORY_UI_ROWS = 100  # snapshots shown per symbol in the overview tab
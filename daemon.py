@@ -0,0 +1,234 @@
+"""Headless analysis daemon writing one JSON line per symbol per cycle
+
+Usage:
+    python daemon.py [--symbols BTC/USDT ETH/USDT ...] [--interval S] [--concurrency N]
+                     [--output FILE|-] [--max-bytes N] [--backups N] [--align] [--cycles N]
+                     [--stream] [--history] [--verbose]
+
+Each line is a compact JSON object, e.g.
+    {"ts":1760680800000,"symbol":"BTC/USDT","price":67250.1,"trend":"bullish",...}
+or, when a symbol failed this cycle, {"ts":...,"symbol":"...","error":"..."}.
+Only JSON lines go to stdout; errors, timeouts and rate-limit notices go to
+stderr, along with per-node progress when --verbose is given.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import logging.handlers
+import math
+import os
+import signal
+import sys
+import time
+from typing import Dict, List, Optional, TextIO
+import config
+
+
+class JsonLinesWriter:
+    """Compact JSON lines to a stream, or to a file rotated by size"""
+
+    def __init__(self, path: str = '-', max_bytes: int = config.DAEMON_OUTPUT_MAX_BYTES,
+                 backups: int = config.DAEMON_OUTPUT_BACKUPS, stream: Optional[TextIO] = None):
+        if path == '-':
+            handler = logging.StreamHandler(stream or sys.stdout)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                           encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.getLogger(f"{__name__}.output.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(handler)
+        self._handler = handler
+
+    def write(self, record: Dict):
+        self._logger.info(json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str))
+
+    def flush(self):
+        self._handler.flush()
+
+    def close(self):
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+# Leading marks of the agent's per-node progress prints (shown only with --verbose)
+PROGRESS_MARKS = ('📊', '🔍', '♻️', '📝', '✅')
+
+
+class DiagnosticsStream(io.TextIOBase):
+    """
+    Stands in for stdout while the pipeline runs, so its prints never mix
+    with the JSON lines: errors, timeouts and rate-limit notices go to
+    `target` (stderr), per-node progress only when verbose.
+    """
+
+    def __init__(self, target: TextIO, verbose: bool = False):
+        self.target = target
+        self.verbose = verbose
+        self._line = ''
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        # print() writes the text and the newline separately; filter whole lines
+        *lines, self._line = (self._line + text).split('\n')
+        for line in lines:
+            if self.verbose or not line.startswith(PROGRESS_MARKS):
+                self.target.write(line + '\n')
+        return len(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+def analysis_record(state: Dict) -> Dict:
+    """Final workflow state as a compact output record"""
+    analysis = state.get('analysis')
+    if state.get('error') or analysis is None:
+        return {'ts': int(time.time() * 1000), 'symbol': state['symbol'],
+                'error': state.get('error') or "Chưa có phân tích"}
+    data = analysis.market_data
+    return {
+        'ts': int(analysis.timestamp.timestamp() * 1000),
+        'symbol': analysis.symbol,
+        'price': data.price if data else None,
+        'trend': analysis.trend,
+        'tf': {timeframe: trend for timeframe, (trend, _) in analysis.timeframe_trends.items()},
+        'volume_change_pct': round(analysis.volume_change_pct, 2),
+        'funding_rate': data.funding_rate if data else None,
+        'funding': analysis.funding_rate_status,
+        'oi_change': data.open_interest_change if data else None,
+        'volatility': analysis.volatility_status,
+        'anomalies': [{'type': a.type, 'severity': a.severity, 'value': a.value} for a in analysis.anomalies],
+        'levels': analysis.key_levels,
+        'direction': analysis.trading_direction,
+        'reused': bool(state.get('reused')),
+    }
+
+
+class AnalysisDaemon:
+    """
+    Runs the agent workflow for a fixed symbol list on a fixed schedule.
+    Cycle k starts at start + k * interval on the monotonic clock, so time
+    spent analyzing never shifts later cycles; a cycle that overruns its
+    slot makes the daemon skip the missed slots instead of running them
+    back to back. Runs on the agent loop.
+    """
+
+    def __init__(self, agent, symbols: List[str], interval: float = config.REFRESH_INTERVAL,
+                 concurrency: int = config.ANALYSIS_CONCURRENCY, writer: Optional[JsonLinesWriter] = None):
+        self.agent = agent
+        self.symbols = symbols
+        self.interval = interval
+        self.concurrency = concurrency
+        self.writer = writer or JsonLinesWriter()
+        self.cycles = 0
+        self.skipped = 0
+        self.lateness: List[float] = []  # seconds each cycle started after its slot
+
+    async def run_cycle(self):
+        """Analyze every symbol once, writing each record as soon as it is ready"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await self.agent.prefetch_snapshot(self.symbols)
+
+        async def run(symbol: str):
+            async with semaphore:
+                try:
+                    state = await self.agent.arun_workflow(symbol)
+                except Exception as e:
+                    state = {'symbol': symbol, 'error': str(e)}
+            self.writer.write(analysis_record(state))
+
+        await asyncio.gather(*(run(symbol) for symbol in self.symbols))
+        self.writer.flush()
+
+    async def run(self, cycles: Optional[int] = None, align: bool = False):
+        """Run `cycles` cycles (forever if None); `align` starts on a wall-clock multiple of the interval"""
+        start = time.monotonic()
+        if align:
+            start += (self.interval - time.time() % self.interval) % self.interval
+        slot = 0
+        while cycles is None or self.cycles < cycles:
+            due = start + slot * self.interval
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            late = time.monotonic() - due
+            self.lateness.append(late)
+            del self.lateness[:-1000]
+
+            began = time.monotonic()
+            await self.run_cycle()
+            self.cycles += 1
+            elapsed = time.monotonic() - began
+            print(f"🕒 Cycle {self.cycles}: {len(self.symbols)} symbols in {elapsed:.2f}s "
+                  f"(started {late * 1000:.1f} ms late)", file=sys.stderr)
+
+            slot += 1
+            # Slots already past are skipped, not caught up on
+            next_slot = max(slot, math.ceil((time.monotonic() - start) / self.interval))
+            if next_slot > slot:
+                self.skipped += next_slot - slot
+                print(f"⚠️ Cycle took {elapsed:.2f}s, longer than the {self.interval}s interval; "
+                      f"skipping {next_slot - slot} slot(s)", file=sys.stderr)
+            slot = next_slot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless crypto market analysis daemon (JSON lines output)")
+    parser.add_argument('--symbols', nargs='+', default=config.DEFAULT_SYMBOLS)
+    parser.add_argument('--interval', type=float, default=config.REFRESH_INTERVAL, help="Seconds between cycles")
+    parser.add_argument('--concurrency', type=int, default=config.ANALYSIS_CONCURRENCY,
+                        help="Symbols analyzed at the same time")
+    parser.add_argument('--output', default='-', help="JSON lines file, rotated by size ('-' for stdout)")
+    parser.add_argument('--max-bytes', type=int, default=config.DAEMON_OUTPUT_MAX_BYTES,
+                        help="Rotate the output file at this size")
+    parser.add_argument('--backups', type=int, default=config.DAEMON_OUTPUT_BACKUPS,
+                        help="Rotated output files kept")
+    parser.add_argument('--align', action='store_true', help="Start cycles on wall-clock multiples of the interval")
+    parser.add_argument('--cycles', type=int, default=None, help="Stop after N cycles (default: run until stopped)")
+    parser.add_argument('--stream', action='store_true', help="Take candles, funding and liquidations from WebSocket")
+    parser.add_argument('--history', action='store_true', help="Also record analyses in the history store")
+    parser.add_argument('--verbose', action='store_true', help="Also show per-node progress on stderr")
+    args = parser.parse_args()
+
+    # Off unless asked: the JSON lines already are the daemon's record
+    config.HISTORY_ENABLED = args.history
+    from agent import get_agent
+
+    writer = JsonLinesWriter(args.output, args.max_bytes, args.backups, stream=sys.stdout)
+    # Prints from the pipeline must not end up in the JSON lines on stdout
+    diagnostics = DiagnosticsStream(sys.stderr, args.verbose)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    agent = get_agent()
+    daemon = AnalysisDaemon(agent, args.symbols, args.interval, args.concurrency, writer)
+    future = None
+    try:
+        with contextlib.redirect_stdout(diagnostics):
+            if args.stream:
+                agent.start_streaming(args.symbols)
+            future = asyncio.run_coroutine_threadsafe(daemon.run(args.cycles, args.align), agent.loop)
+            future.result()
+    except KeyboardInterrupt:
+        print(f"🛑 Stopped after {daemon.cycles} cycles", file=sys.stderr)
+    finally:
+        if future is not None:
+            future.cancel()
+        with contextlib.redirect_stdout(diagnostics):
+            agent.close()
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
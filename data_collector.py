@@ -1,32 +1,212 @@
 """Data collection module for crypto market data"""
-import ccxt
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Dict, Iterable, Optional, List, Any, Awaitable, Tuple, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import asyncio
-import aiohttp
-from models import MarketData
+import json
+import os
+import time
+from models import MarketData, MarketSnapshot
+from candle_store import CandleBuffer, CandleStore
+from indicators import IndicatorEngine
+from resampler import Resampler
+from cache import TTLCache, cached, coalesced
+from oi_history import OIHistoryStore
+from rate_limiter import RateLimiter
+from metrics import FETCH_DURATION, FETCH_ERRORS, IN_FLIGHT
 import config
 
+# Volume average window, in hourly candles (the only volume window the indicator engines keep)
+VOLUME_WINDOW = config.VOLUME_LOOKBACK * 24
+
+if TYPE_CHECKING:  # ccxt, pandas and aiohttp are imported on first use to keep startup fast
+    import aiohttp
+    import pandas as pd
+    from stream import MarketStream
+
+
+def _read_markets_cache(path: str, ttl: float) -> Optional[Dict]:
+    """Cached market metadata, or None when missing, stale or unreadable"""
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_markets_cache(path: str, markets: Dict, currencies: Optional[Dict]):
+    """Persist market metadata atomically"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'markets': markets, 'currencies': currencies or {}}, f)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Error writing markets cache: {e}")
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Whether a ccxt error is an HTTP 429 / 418"""
+    import ccxt
+    return isinstance(error, ccxt.DDoSProtection)
+
+
+def liquidation_summary(sides: Iterable[str]) -> Dict[str, int]:
+    """Liquidation counts from force order sides (a SELL order closes a long)"""
+    sides = list(sides)
+    return {
+        'total_liquidations': len(sides),
+        'long_liquidations': sum(1 for side in sides if side == 'SELL'),
+        'short_liquidations': sum(1 for side in sides if side == 'BUY'),
+    }
+
+
+async def _resolved(value: Any) -> Any:
+    """Awaitable that returns an already known value"""
+    return value
+
 
 class DataCollector:
     """Collects market data from various sources"""
     
     def __init__(self):
-        self.exchange = ccxt.binance({
-            'apiKey': config.BINANCE_API_KEY,
-            'secret': config.BINANCE_API_SECRET,
-            'enableRateLimit': True,
-            'options': {
-                'defaultType': 'future'  # Use futures for funding rate and OI
-            }
-        })
+        self._exchange = None  # created on first use, see the exchange property
+        # The ccxt client is synchronous, so its calls run on a thread pool
+        # to keep them from blocking the event loop
+        self.executor = ThreadPoolExecutor(max_workers=config.COLLECTOR_MAX_WORKERS)
+        self.candle_store = CandleStore(capacity=config.CANDLE_BUFFER_SIZE)
+        self.indicators: Dict[tuple, IndicatorEngine] = {}
+        self.resamplers: Dict[tuple, Resampler] = {}
+        self.snapshot: Optional[MarketSnapshot] = None
+        self.oi_history = OIHistoryStore(config.OI_HISTORY_RESOLUTION, config.OI_HISTORY_SLOTS)
+        self._oi_seeded = set()
+        self._oi_seed_retry: Dict[str, float] = {}  # symbol -> monotonic time a failed seed may be retried
+        self.cache = TTLCache(max_entries=config.CACHE_MAX_ENTRIES, stale_factor=config.CACHE_STALE_FACTOR)
+        self.limiter = RateLimiter()
+        # Keep-alive session shared by all raw REST calls, created lazily
+        # on the loop that first uses it
+        self.session: Optional['aiohttp.ClientSession'] = None
+        # WebSocket stream feeding candles, funding and liquidations, when enabled
+        self.stream: Optional['MarketStream'] = None
+    
+    @property
+    def exchange(self):
+        """The ccxt client (ccxt is imported when this is first used)"""
+        if self._exchange is None:
+            import ccxt
+            self._exchange = ccxt.binance({
+                'apiKey': config.BINANCE_API_KEY,
+                'secret': config.BINANCE_API_SECRET,
+                'enableRateLimit': False,  # weight budgeting is done by self.limiter
+                'options': {
+                    'defaultType': 'future'  # Use futures for funding rate and OI
+                }
+            })
+        return self._exchange
+    
+    @exchange.setter
+    def exchange(self, exchange):
+        self._exchange = exchange
+    
+    @coalesced('markets')
+    async def ensure_markets(self):
+        """
+        Make sure the exchange has market metadata, taking it from the
+        on-disk cache when fresh instead of a load_markets round trip
+        """
+        exchange = self.exchange
+        if not hasattr(exchange, 'load_markets') or exchange.markets:
+            return
+        cached = _read_markets_cache(config.MARKETS_CACHE_FILE, config.MARKETS_CACHE_TTL)
+        if cached and cached.get('markets'):
+            exchange.set_markets(cached['markets'], cached.get('currencies') or None)
+            return
+        try:
+            await self._run_sync(exchange.load_markets)
+            _write_markets_cache(config.MARKETS_CACHE_FILE, exchange.markets, exchange.currencies)
+        except Exception as e:
+            print(f"Error loading markets: {e}")
+    
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        """Get the pooled HTTP session, creating it on first use"""
+        if self.session is None or self.session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=config.HTTP_POOL_SIZE,
+                limit_per_host=config.HTTP_POOL_PER_HOST,
+                keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+    
+    async def _get_json(self, path: str, params: Optional[Dict] = None) -> Optional[Any]:
+        """GET a raw Binance futures endpoint over the pooled session"""
+        url = f"{config.BINANCE_FAPI_URL}{path}"
+        await self.limiter.acquire(path, params, (params or {}).get('symbol'))
+        with IN_FLIGHT.track_inprogress(source=path), FETCH_DURATION.time(source=path):
+            try:
+                async with self._get_session().get(url, params=params) as response:
+                    self.limiter.observe_headers(response.headers)
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status in (418, 429):
+                        self.limiter.backoff(response.headers)
+                    FETCH_ERRORS.inc(source=path, kind=f'http_{response.status}')
+            except Exception:
+                FETCH_ERRORS.inc(source=path, kind='error')
+                raise
+        return None
+    
+    async def close(self):
+        """Release the HTTP connection pool and executor threads"""
+        if self.stream is not None:
+            await self.stream.stop()
+            self.stream = None
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.executor.shutdown(wait=False)
+    
+    async def _run_sync(self, func, *args, **kwargs):
+        """Run a blocking exchange call in the executor"""
+        loop = asyncio.get_running_loop()
+        source = getattr(func, '__name__', 'exchange')
+        symbol = args[0] if args and isinstance(args[0], str) else None
+        await self.limiter.acquire(source, kwargs, symbol)
+        with IN_FLIGHT.track_inprogress(source=source), FETCH_DURATION.time(source=source):
+            try:
+                result = await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+            except Exception as e:
+                if _is_rate_limited(e):
+                    FETCH_ERRORS.inc(source=source, kind='rate_limited')
+                    self.limiter.backoff(getattr(self.exchange, 'last_response_headers', None))
+                else:
+                    FETCH_ERRORS.inc(source=source, kind='error')
+                raise
+        self.limiter.observe_headers(getattr(self.exchange, 'last_response_headers', None))
+        return result
+    
+    async def _with_timeout(self, source: str, symbol: str, coro: Awaitable, default: Any = None) -> Any:
+        """Await a fetch with the timeout configured for its source"""
+        timeout = config.SOURCE_TIMEOUTS.get(source, config.SOURCE_TIMEOUT_DEFAULT)
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            FETCH_ERRORS.inc(source=source, kind='timeout')
+            print(f"Timeout fetching {source} for {symbol} after {timeout}s")
+            return default
         
-    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', limit: int = 200) -> pd.DataFrame:
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', limit: int = 200) -> 'pd.DataFrame':
         """Fetch OHLCV data"""
+        import pandas as pd
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            ohlcv = await self._run_sync(self.exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
             return df
@@ -34,55 +214,207 @@ class DataCollector:
             print(f"Error fetching OHLCV for {symbol}: {e}")
             return pd.DataFrame()
     
+    async def _fetch_candle_rows(self, symbol: str, timeframe: str, candles: CandleBuffer) -> Tuple[List, bool]:
+        """
+        Rows that bring a candle buffer up to date, and whether they are a
+        full (re)seed rather than a top-up of the still-open candle onwards
+        """
+        if candles.last_timestamp is None:
+            return await self._run_sync(self.exchange.fetch_ohlcv, symbol, timeframe, limit=candles.capacity), True
+        rows = await self._run_sync(self.exchange.fetch_ohlcv, symbol, timeframe,
+                                    since=candles.last_timestamp, limit=config.CANDLE_TOPUP_LIMIT)
+        if len(rows) >= config.CANDLE_TOPUP_LIMIT:
+            # Too far behind to top up in one call, reseed instead
+            return await self._run_sync(self.exchange.fetch_ohlcv, symbol, timeframe, limit=candles.capacity), True
+        return rows, False
+    
+    @cached('ohlcv')
+    async def update_candles(self, symbol: str, timeframe: str = '1h') -> CandleBuffer:
+        """
+        Bring the symbol's candle buffer up to date.
+        The first call seeds the full buffer; later calls fetch only the
+        still-open candle and any that opened since. Raises on failure, so
+        a buffer that missed its top-up is never cached as fresh.
+        """
+        candles = self.candle_store.get(symbol, timeframe)
+        rows, _ = await self._fetch_candle_rows(symbol, timeframe, candles)
+        candles.upsert(rows)
+        self.get_indicators(symbol, timeframe).update(rows)
+        return candles
+    
+    @property
+    def timeframes(self) -> List[str]:
+        """Timeframes kept per symbol: the base series first, then the analyzed ones"""
+        return list(dict.fromkeys([config.BASE_TIMEFRAME, config.TIMEFRAME] + config.ANALYSIS_TIMEFRAMES))
+    
+    def get_resampler(self, symbol: str, timeframe: str) -> Resampler:
+        """Get the resampler deriving a symbol's timeframe from its base series"""
+        key = (symbol, timeframe)
+        if key not in self.resamplers:
+            self.resamplers[key] = Resampler(config.BASE_TIMEFRAME, timeframe)
+        return self.resamplers[key]
+    
+    def timeframe_buffers(self, symbol: str) -> Dict[str, CandleBuffer]:
+        """The symbol's candle buffer for every kept timeframe"""
+        return {timeframe: self.candle_store.get(symbol, timeframe) for timeframe in self.timeframes}
+    
+    def apply_base_candles(self, symbol: str, rows: List):
+        """
+        Merge new or updated base-timeframe candles and fold them into the
+        current bucket of every higher timeframe
+        """
+        self.candle_store.get(symbol, config.BASE_TIMEFRAME).upsert(rows)
+        self.get_indicators(symbol, config.BASE_TIMEFRAME).update(rows)
+        for timeframe in self.timeframes[1:]:
+            resampled = self.get_resampler(symbol, timeframe).add(rows)
+            self.candle_store.get(symbol, timeframe).upsert(resampled)
+            self.get_indicators(symbol, timeframe).update(resampled)
+    
+    async def refresh_timeframes(self, symbol: str) -> Dict[str, CandleBuffer]:
+        """
+        Bring every timeframe of a symbol up to date with one base-series
+        request (uncached; raises on failure). Higher timeframes are
+        resampled locally from the base candles; they are fetched natively
+        only when the base is (re)seeded, for history older than the base
+        buffer covers.
+        """
+        base = self.candle_store.get(symbol, config.BASE_TIMEFRAME)
+        rows, seeded = await self._fetch_candle_rows(symbol, config.BASE_TIMEFRAME, base)
+        if seeded:
+            await asyncio.gather(*(self.update_candles(symbol, timeframe) for timeframe in self.timeframes[1:]))
+        self.apply_base_candles(symbol, rows)
+        return self.timeframe_buffers(symbol)
+    
+    @cached('ohlcv')
+    async def update_timeframes(self, symbol: str) -> Dict[str, CandleBuffer]:
+        """
+        Cached refresh_timeframes. Failures raise instead of returning the
+        buffers as they are, so the cache keeps serving its last good entry
+        (stale-while-revalidate) and retries on the next call.
+        """
+        return await self.refresh_timeframes(symbol)
+    
+    async def current_timeframes(self, symbol: str) -> Dict[str, CandleBuffer]:
+        """update_timeframes, or the buffers as they are when the update fails"""
+        try:
+            return await self.update_timeframes(symbol)
+        except Exception as e:
+            print(f"Error updating candles for {symbol}: {e}")
+            return self.timeframe_buffers(symbol)
+    
+    def get_indicators(self, symbol: str, timeframe: str = '1h') -> IndicatorEngine:
+        """Get the incremental indicator engine for a symbol/timeframe"""
+        key = (symbol, timeframe)
+        if key not in self.indicators:
+            self.indicators[key] = IndicatorEngine(
+                windows={'close': config.MA_PERIODS, 'volume': [VOLUME_WINDOW]},
+                min_periods={'volume': 1},  # average what we have until a full week
+            )
+        return self.indicators[key]
+    
+    @cached('funding_rate')
     async def fetch_funding_rate(self, symbol: str) -> Optional[float]:
         """Fetch current funding rate"""
         try:
             # Convert symbol format for futures
             futures_symbol = symbol.replace('/', '')
-            funding = self.exchange.fetch_funding_rate(symbol)
+            funding = await self._run_sync(self.exchange.fetch_funding_rate, symbol)
             return funding.get('fundingRate', None)
         except Exception as e:
             print(f"Error fetching funding rate for {symbol}: {e}")
             return None
     
+    @cached('open_interest')
     async def fetch_open_interest(self, symbol: str) -> Optional[float]:
         """Fetch open interest"""
         try:
-            oi = self.exchange.fetch_open_interest(symbol)
+            oi = await self._run_sync(self.exchange.fetch_open_interest, symbol)
             return oi.get('openInterestAmount', None)
         except Exception as e:
             print(f"Error fetching open interest for {symbol}: {e}")
             return None
     
+    @coalesced('oi_history')
+    async def seed_oi_history(self, symbol: str):
+        """
+        Backfill a symbol's OI history from the exchange's open interest
+        history. The symbol counts as seeded only once the backfill succeeded;
+        a failed or timed-out seed is retried after OI_HISTORY_SEED_RETRY,
+        and not at all if the exchange does not support the endpoint.
+        """
+        # Set before the call so a timeout (which cancels us) also backs off
+        self._oi_seed_retry[symbol] = time.monotonic() + config.OI_HISTORY_SEED_RETRY
+        try:
+            history = await self._run_sync(
+                self.exchange.fetch_open_interest_history, symbol, config.OI_HISTORY_SEED_PERIOD,
+                limit=min(config.OI_HISTORY_SLOTS, 500)  # Binance caps this endpoint at 500
+            )
+            self.oi_history.get(symbol).extend(
+                (entry['timestamp'], entry['openInterestAmount'])
+                for entry in history
+                if entry.get('timestamp') and entry.get('openInterestAmount')
+            )
+            self._oi_seeded.add(symbol)
+            self._oi_seed_retry.pop(symbol, None)
+        except Exception as e:
+            import ccxt
+            if isinstance(e, ccxt.NotSupported):
+                self._oi_seed_retry[symbol] = float('inf')
+            print(f"Error seeding open interest history for {symbol}: {e}")
+    
+    @cached('ticker')
     async def fetch_24h_ticker(self, symbol: str) -> Dict:
         """Fetch 24h ticker data"""
         try:
-            ticker = self.exchange.fetch_ticker(symbol)
+            ticker = await self._run_sync(self.exchange.fetch_ticker, symbol)
             return ticker
         except Exception as e:
             print(f"Error fetching ticker for {symbol}: {e}")
             return {}
     
+    async def fetch_force_orders(self, symbol: str) -> Optional[List[Dict]]:
+        """Latest liquidation (force) orders of a symbol, uncached"""
+        futures_symbol = symbol.replace('/', '')
+        return await self._get_json('/fapi/v1/allForceOrders', {'symbol': futures_symbol, 'limit': 100})
+
+    @cached('liquidations')
     async def fetch_liquidations(self, symbol: str) -> Optional[Dict]:
         """Fetch liquidation data (using Binance API)"""
         try:
-            async with aiohttp.ClientSession() as session:
-                futures_symbol = symbol.replace('/', '')
-                url = f"https://fapi.binance.com/fapi/v1/allForceOrders?symbol={futures_symbol}&limit=100"
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Process liquidation data
-                        liq_data = {
-                            'total_liquidations': len(data),
-                            'long_liquidations': sum(1 for x in data if x['side'] == 'SELL'),
-                            'short_liquidations': sum(1 for x in data if x['side'] == 'BUY'),
-                        }
-                        return liq_data
+            data = await self.fetch_force_orders(symbol)
+            if data is not None:
+                # Process liquidation data
+                return liquidation_summary(x['side'] for x in data)
         except Exception as e:
             print(f"Error fetching liquidations for {symbol}: {e}")
         return None
     
+    @coalesced('bulk_snapshot')
+    async def fetch_bulk_snapshot(self) -> Optional[MarketSnapshot]:
+        """Fetch tickers and funding rates for all futures symbols, one request each"""
+        async def fetch():
+            await self.ensure_markets()
+            tickers, funding_rates = await asyncio.gather(
+                self._run_sync(self.exchange.fetch_tickers),
+                self._run_sync(self.exchange.fetch_funding_rates),
+            )
+            return MarketSnapshot(timestamp=datetime.now(), tickers=tickers, funding_rates=funding_rates)
+        
+        try:
+            snapshot = await self._with_timeout('bulk_snapshot', 'all symbols', fetch())
+            if snapshot is not None:
+                self.snapshot = snapshot
+        except Exception as e:
+            print(f"Error fetching bulk snapshot: {e}")
+        return self.snapshot
+    
+    def get_fresh_snapshot(self) -> Optional[MarketSnapshot]:
+        """The bulk snapshot, if one was fetched within BULK_SNAPSHOT_TTL"""
+        if self.snapshot is not None and self.snapshot.is_fresh(config.BULK_SNAPSHOT_TTL):
+            return self.snapshot
+        return None
+    
+    @cached('sentiment')
     async def fetch_sentiment(self, symbol: str) -> Optional[float]:
         """Fetch market sentiment (placeholder - can integrate with sentiment API)"""
         # This is a placeholder. In production, integrate with:
@@ -96,58 +428,86 @@ class DataCollector:
             print(f"Error fetching sentiment for {symbol}: {e}")
             return None
     
-    def calculate_moving_averages(self, df: pd.DataFrame) -> Dict[str, float]:
-        """Calculate moving averages"""
-        mas = {}
-        for period in config.MA_PERIODS:
-            if len(df) >= period:
-                mas[f'ma_{period}'] = df['close'].rolling(window=period).mean().iloc[-1]
-            else:
-                mas[f'ma_{period}'] = None
-        return mas
-    
-    def calculate_volume_avg(self, df: pd.DataFrame, days: int = 7) -> float:
-        """Calculate average volume"""
-        if len(df) < days * 24:  # hourly data
-            return df['volume'].mean()
-        return df['volume'].tail(days * 24).mean()
+    def calculate_moving_averages(self, indicators: IndicatorEngine) -> Dict[str, float]:
+        """Calculate moving averages (None until enough candles)"""
+        return {f'ma_{period}': indicators.mean('close', period) for period in config.MA_PERIODS}
+    
+    def calculate_volume_avg(self, indicators: IndicatorEngine) -> float:
+        """Average volume over config.VOLUME_LOOKBACK days"""
+        return indicators.mean('volume', VOLUME_WINDOW)
     
     async def collect_market_data(self, symbol: str) -> MarketData:
         """Collect all market data for a symbol"""
         try:
-            # Fetch OHLCV data
-            df = await self.fetch_ohlcv(symbol, config.TIMEFRAME, limit=200)
+            await self.ensure_markets()
+            
+            # Use the bulk snapshot for ticker and funding when it is fresh
+            snapshot = self.get_fresh_snapshot()
+            snapshot_ticker = snapshot.ticker(symbol) if snapshot else None
+            snapshot_funding = snapshot.funding(symbol) if snapshot else None
+            
+            # Streamed candles, funding and liquidations replace polling while the stream is live
+            live = self.stream.live_state(symbol) if self.stream is not None else None
+            live_funding = live.funding_rate if live is not None else None
+            
+            # Fetch all sources concurrently, each bounded by its own timeout
+            seed_oi = (config.OI_HISTORY_SEED and symbol not in self._oi_seeded
+                       and self._oi_seed_retry.get(symbol, 0.0) <= time.monotonic())
             
-            if df.empty:
+            timeframes, ticker, funding_rate, open_interest, liquidations, sentiment, _ = await asyncio.gather(
+                _resolved(self.timeframe_buffers(symbol)) if live is not None else
+                self._with_timeout('ohlcv', symbol, self.current_timeframes(symbol), self.timeframe_buffers(symbol)),
+                _resolved(snapshot_ticker) if snapshot_ticker is not None else
+                self._with_timeout('ticker', symbol, self.fetch_24h_ticker(symbol), {}),
+                _resolved(live_funding) if live_funding is not None else
+                _resolved(snapshot_funding.get('fundingRate')) if snapshot_funding is not None else
+                self._with_timeout('funding_rate', symbol, self.fetch_funding_rate(symbol)),
+                self._with_timeout('open_interest', symbol, self.fetch_open_interest(symbol)),
+                _resolved(live.liquidation_summary()) if live is not None else
+                self._with_timeout('liquidations', symbol, self.fetch_liquidations(symbol)),
+                self._with_timeout('sentiment', symbol, self.fetch_sentiment(symbol)),
+                self._with_timeout('oi_history', symbol, self.seed_oi_history(symbol)) if seed_oi else
+                _resolved(None),
+            )
+            
+            candles = timeframes[config.TIMEFRAME]
+            if not len(candles):
                 raise ValueError(f"No OHLCV data available for {symbol}")
             
-            # Fetch other data
-            ticker = await self.fetch_24h_ticker(symbol)
-            funding_rate = await self.fetch_funding_rate(symbol)
-            open_interest = await self.fetch_open_interest(symbol)
-            liquidations = await self.fetch_liquidations(symbol)
-            sentiment = await self.fetch_sentiment(symbol)
+            # Track open interest to measure its change over the lookback
+            oi_history = self.oi_history.get(symbol)
+            if open_interest:
+                oi_history.add(int(time.time() * 1000), float(open_interest))
+            oi_change = oi_history.change(config.OI_SPIKE_LOOKBACK)
             
             # Calculate indicators
-            mas = self.calculate_moving_averages(df)
-            volume_avg_7d = self.calculate_volume_avg(df, days=7)
+            indicators = self.get_indicators(symbol, config.TIMEFRAME)
+            mas = self.calculate_moving_averages(indicators)
+            timeframe_mas = {
+                tf: self.calculate_moving_averages(self.get_indicators(symbol, tf))
+                for tf in config.ANALYSIS_TIMEFRAMES
+            }
+            volume_avg_7d = self.calculate_volume_avg(indicators)
             
             # Create MarketData object
             market_data = MarketData(
                 symbol=symbol,
                 timestamp=datetime.now(),
-                price=float(df['close'].iloc[-1]),
-                volume_24h=float(ticker.get('quoteVolume', df['volume'].tail(24).sum())),
+                price=float(candles.tail('close', 1)[-1]),
+                volume_24h=float(ticker.get('quoteVolume', candles.tail('volume', 24).sum())),
                 volume_avg_7d=float(volume_avg_7d),
                 open_interest=float(open_interest) if open_interest else None,
+                open_interest_change=oi_change,
                 funding_rate=float(funding_rate) if funding_rate else None,
                 ma_20=float(mas.get('ma_20')) if mas.get('ma_20') else None,
                 ma_50=float(mas.get('ma_50')) if mas.get('ma_50') else None,
                 ma_200=float(mas.get('ma_200')) if mas.get('ma_200') else None,
-                high_24h=float(ticker.get('high', df['high'].tail(24).max())),
-                low_24h=float(ticker.get('low', df['low'].tail(24).min())),
+                high_24h=float(ticker.get('high', candles.tail('high', 24).max())),
+                low_24h=float(ticker.get('low', candles.tail('low', 24).min())),
                 liquidations=liquidations,
-                sentiment_score=sentiment
+                sentiment_score=sentiment,
+                timeframe_mas=timeframe_mas,
+                candle_time=timeframes[config.BASE_TIMEFRAME].last_timestamp
             )
             
             return market_data
@@ -0,0 +1,302 @@
+"""Deterministic in-process stand-in for Binance futures, for offline benchmarks"""
+import asyncio
+import json
+import math
+import random
+import time
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+from aiohttp import WSMsgType, web
+
+
+TIMEFRAME_MS = {'1m': 60_000, '5m': 300_000, '15m': 900_000, '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+
+
+def _seed(symbol: str) -> int:
+    return zlib.crc32(symbol.encode())
+
+
+class FakeLatency:
+    """Injected latency: `latency` seconds plus uniform +/- `jitter`, from a seeded RNG"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def next(self) -> float:
+        if not self.latency and not self.jitter:
+            return 0.0
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+
+class FakeExchange:
+    """
+    Implements the ccxt methods DataCollector uses. Data depends only on the
+    symbol (and the candle index), so runs are reproducible.
+    """
+
+    def __init__(self, symbols: List[str], latency: float = 0.0, jitter: float = 0.0,
+                 history: int = 1000, timeframe: str = '15m', seed: int = 0):
+        self.symbols = list(symbols)
+        self.delay = FakeLatency(latency, jitter, seed)
+        self.history = history
+        self.timeframe_ms = TIMEFRAME_MS[timeframe]
+        now = int(time.time() * 1000)
+        self.first_timestamp = (now // self.timeframe_ms - history + 1) * self.timeframe_ms
+        self._candles: Dict[str, np.ndarray] = {}
+        self._resampled: Dict[tuple, np.ndarray] = {}
+        self._rng = np.random.default_rng(seed)
+        self.calls: Dict[str, int] = {}
+
+    def _call(self, method: str):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        delay = self.delay.next()
+        if delay:
+            time.sleep(delay)
+
+    def _series(self, symbol: str) -> np.ndarray:
+        """[timestamp, open, high, low, close, volume] rows for a symbol"""
+        if symbol not in self._candles:
+            rng = np.random.default_rng(_seed(symbol))
+            base = rng.uniform(1, 50000)
+            closes = base * np.exp(np.cumsum(rng.normal(0, 0.01, self.history)))
+            opens = np.concatenate(([closes[0]], closes[:-1]))
+            spread = closes * rng.uniform(0.001, 0.02, self.history)
+            timestamps = self.first_timestamp + np.arange(self.history) * self.timeframe_ms
+            volumes = rng.uniform(100, 10000, self.history)
+            self._candles[symbol] = np.column_stack([
+                timestamps, opens, np.maximum(opens, closes) + spread, np.minimum(opens, closes) - spread,
+                closes, volumes,
+            ])
+        return self._candles[symbol]
+
+    def tick(self, symbol: str, new_candles: int = 0) -> List[float]:
+        """
+        Advance the market: open `new_candles` candles, then move the open
+        candle's close. Returns the open candle, as streamed in kline events.
+        """
+        rows = self._series(symbol)
+        if new_candles:
+            last = rows[-1]
+            closes = last[4] * np.exp(np.cumsum(self._rng.normal(0, 0.01, new_candles)))
+            opens = np.concatenate(([last[4]], closes[:-1]))
+            added = np.column_stack([
+                last[0] + np.arange(1, new_candles + 1) * self.timeframe_ms, opens,
+                np.maximum(opens, closes), np.minimum(opens, closes), closes,
+                self._rng.uniform(100, 10000, new_candles),
+            ])
+            rows = np.vstack([rows, added])
+        else:
+            rows = rows.copy()
+        close = rows[-1, 4] * math.exp(self._rng.normal(0, 0.001))
+        rows[-1, 2:6] = [max(rows[-1, 2], close), min(rows[-1, 3], close), close,
+                         rows[-1, 5] + self._rng.uniform(0, 10)]
+        self._candles[symbol] = rows  # replaced whole, so executor threads never see a partial update
+        for key in [key for key in self._resampled if key[0] == symbol]:
+            del self._resampled[key]
+        return rows[-1].tolist()
+
+    def _series_for(self, symbol: str, timeframe: str) -> np.ndarray:
+        """The symbol's series aggregated to a timeframe (a multiple of the generated one)"""
+        step = TIMEFRAME_MS[timeframe]
+        if step == self.timeframe_ms:
+            return self._series(symbol)
+        if step % self.timeframe_ms:
+            raise ValueError(f"FakeExchange generates {self.timeframe_ms} ms candles, cannot serve {timeframe}")
+        key = (symbol, timeframe)
+        if key not in self._resampled:
+            rows = self._series(symbol)
+            buckets = rows[:, 0] - rows[:, 0] % step
+            _, starts = np.unique(buckets, return_index=True)
+            ends = np.append(starts[1:], len(rows)) - 1
+            self._resampled[key] = np.column_stack([
+                buckets[starts], rows[starts, 1], np.maximum.reduceat(rows[:, 2], starts),
+                np.minimum.reduceat(rows[:, 3], starts), rows[ends, 4], np.add.reduceat(rows[:, 5], starts),
+            ])
+        return self._resampled[key]
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', since: Optional[int] = None,
+                    limit: Optional[int] = None, params: Optional[Dict] = None) -> List[List[float]]:
+        self._call('fetch_ohlcv')
+        rows = self._series_for(symbol, timeframe)
+        limit = limit or 500
+        if since is None:
+            selected = rows[-limit:]
+        else:
+            selected = rows[rows[:, 0] >= since][:limit]
+        return selected.tolist()
+
+    def _ticker(self, symbol: str) -> Dict:
+        rows = self._series(symbol)
+        rows = rows[rows[:, 0] > rows[-1, 0] - TIMEFRAME_MS['1d']]
+        return {
+            'symbol': symbol,
+            'last': float(rows[-1, 4]),
+            'high': float(rows[:, 2].max()),
+            'low': float(rows[:, 3].min()),
+            'quoteVolume': float((rows[:, 5] * rows[:, 4]).sum()),
+            'percentage': float((rows[-1, 4] / rows[0, 1] - 1) * 100),
+        }
+
+    def fetch_ticker(self, symbol: str, params: Optional[Dict] = None) -> Dict:
+        self._call('fetch_ticker')
+        return self._ticker(symbol)
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None, params: Optional[Dict] = None) -> Dict[str, Dict]:
+        self._call('fetch_tickers')
+        return {f"{s}:{s.split('/')[-1]}": self._ticker(s) for s in (symbols or self.symbols)}
+
+    def _funding(self, symbol: str) -> Dict:
+        rng = np.random.default_rng(_seed(symbol) + 1)
+        return {'symbol': symbol, 'fundingRate': float(rng.normal(0, 0.005)),
+                'markPrice': float(self._series(symbol)[-1, 4])}
+
+    def fetch_funding_rate(self, symbol: str, params: Optional[Dict] = None) -> Dict:
+        self._call('fetch_funding_rate')
+        return self._funding(symbol)
+
+    def fetch_funding_rates(self, symbols: Optional[List[str]] = None, params: Optional[Dict] = None) -> Dict[str, Dict]:
+        self._call('fetch_funding_rates')
+        return {f"{s}:{s.split('/')[-1]}": self._funding(s) for s in (symbols or self.symbols)}
+
+    def _open_interest(self, symbol: str, steps_back: int = 0) -> float:
+        base = 1e4 + _seed(symbol) % 990_000
+        return base * (1 + 0.05 * math.sin((_seed(symbol) % 97 - steps_back) / 7))
+
+    def fetch_open_interest(self, symbol: str, params: Optional[Dict] = None) -> Dict:
+        self._call('fetch_open_interest')
+        return {'symbol': symbol, 'openInterestAmount': self._open_interest(symbol)}
+
+    def fetch_open_interest_history(self, symbol: str, timeframe: str = '5m', since: Optional[int] = None,
+                                    limit: Optional[int] = None, params: Optional[Dict] = None) -> List[Dict]:
+        self._call('fetch_open_interest_history')
+        limit = limit or 30
+        step = TIMEFRAME_MS[timeframe]
+        now = int(time.time() * 1000) // step * step
+        return [{'symbol': symbol, 'timestamp': now - i * step, 'openInterestAmount': self._open_interest(symbol, i)}
+                for i in range(limit, 0, -1)]
+
+
+class FakeBinanceServer:
+    """
+    Local aiohttp server for the raw REST endpoints (allForceOrders) and,
+    given a FakeExchange, for the combined WebSocket stream: kline,
+    markPrice and forceOrder events every `stream_interval` seconds for
+    each subscribed stream.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0,
+                 exchange: Optional[FakeExchange] = None, stream_interval: float = 0.25):
+        self.delay = FakeLatency(latency, jitter, seed)
+        self.exchange = exchange
+        self.stream_interval = stream_interval
+        self.runner: Optional[web.AppRunner] = None
+        self.requests = 0
+        self.peers: set = set()  # client (host, port) of every REST request, one per connection used
+        self.stream_messages = 0
+        self.connections = 0
+        self.commands: List[Dict] = []  # SUBSCRIBE / UNSUBSCRIBE commands received, in order
+        self._sockets: set = set()
+        self._stream_symbols: Dict[str, str] = {}
+
+    async def _force_orders(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info('peername'))
+        delay = self.delay.next()
+        if delay:
+            await asyncio.sleep(delay)
+        symbol = request.query.get('symbol', '')
+        limit = int(request.query.get('limit', 100))
+        count = min(limit, _seed(symbol) % 120)
+        orders = [{'symbol': symbol, 'side': 'SELL' if (_seed(symbol) + i) % 3 else 'BUY'} for i in range(count)]
+        return web.json_response(orders)
+
+    def _event(self, stream: str, tick: int) -> Optional[Dict]:
+        name, kind = stream.split('@', 1)
+        if len(self._stream_symbols) != len(self.exchange.symbols):
+            self._stream_symbols = {s.replace('/', '').lower(): s for s in self.exchange.symbols}
+        symbol = self._stream_symbols.get(name)
+        if symbol is None:
+            return None
+        now = int(time.time() * 1000)
+        market_id = name.upper()
+        if kind.startswith('kline_'):
+            t, o, h, l, c, v = self.exchange.tick(symbol)
+            return {'e': 'kline', 'E': now, 's': market_id, 'k': {
+                't': int(t), 'T': int(t) + self.exchange.timeframe_ms - 1, 's': market_id, 'i': kind[6:],
+                'o': str(o), 'h': str(h), 'l': str(l), 'c': str(c), 'v': str(v), 'x': False}}
+        if kind.startswith('markPrice'):
+            funding = self.exchange._funding(symbol)
+            return {'e': 'markPriceUpdate', 'E': now, 's': market_id, 'p': str(funding['markPrice']),
+                    'r': str(funding['fundingRate'])}
+        if kind == 'forceOrder' and (tick + _seed(symbol)) % 4 == 0:
+            return {'e': 'forceOrder', 'E': now, 'o': {
+                's': market_id, 'S': 'SELL' if (tick + _seed(symbol)) % 3 else 'BUY', 'X': 'FILLED', 'T': now}}
+        return None
+
+    async def _push(self, ws: web.WebSocketResponse, subscriptions: set):
+        tick = 0
+        while not ws.closed:
+            await asyncio.sleep(self.stream_interval)
+            tick += 1
+            for stream in list(subscriptions):
+                event = self._event(stream, tick)
+                if event is not None and not ws.closed:
+                    await ws.send_str(json.dumps({'stream': stream, 'data': event}))
+                    self.stream_messages += 1
+
+    async def _stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self._sockets.add(ws)
+        subscriptions = set()
+        pusher = asyncio.create_task(self._push(ws, subscriptions))
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                command = json.loads(message.data)
+                self.commands.append(command)
+                if command.get('method') == 'SUBSCRIBE':
+                    subscriptions.update(command.get('params', []))
+                elif command.get('method') == 'UNSUBSCRIBE':
+                    subscriptions.difference_update(command.get('params', []))
+                await ws.send_str(json.dumps({'result': None, 'id': command.get('id')}))
+        finally:
+            pusher.cancel()
+            self._sockets.discard(ws)
+        return ws
+
+    async def drop_connections(self):
+        """Close every WebSocket from the server side, as Binance does on maintenance"""
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving; returns the base URL"""
+        app = web.Application()
+        app.router.add_get('/fapi/v1/allForceOrders', self._force_orders)
+        if self.exchange is not None:
+            app.router.add_get('/stream', self._stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        return self.url
+
+    @property
+    def url(self) -> str:
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ws_url(self) -> str:
+        return self.url.replace('http://', 'ws://')
+
+    async def stop(self):
+        await self.drop_connections()
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,286 @@
+"""Persistent, append-only history of analysis snapshots (SQLite)"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from models import MarketAnalysis
+from metrics import HISTORY_SNAPSHOTS
+import config
+
+
+SNAPSHOT_COLUMNS = (
+    'symbol', 'timestamp', 'price', 'volume_24h', 'volume_avg_7d', 'open_interest', 'open_interest_change',
+    'funding_rate', 'ma_20', 'ma_50', 'ma_200', 'high_24h', 'low_24h', 'trend', 'volume_change_pct',
+    'funding_rate_status', 'volatility_status', 'trading_direction', 'anomaly_count',
+)
+ANOMALY_COLUMNS = ('symbol', 'timestamp', 'type', 'severity', 'description', 'value')
+MARKET_DATA_COLUMNS = SNAPSHOT_COLUMNS[2:13]
+
+SCHEMA = """
+-- Only takes effect on a new file, before the first table and before WAL is enabled
+PRAGMA auto_vacuum = INCREMENTAL;
+CREATE TABLE IF NOT EXISTS snapshots (
+    symbol TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,  -- ms since epoch
+    price REAL,
+    volume_24h REAL,
+    volume_avg_7d REAL,
+    open_interest REAL,
+    open_interest_change REAL,
+    funding_rate REAL,
+    ma_20 REAL,
+    ma_50 REAL,
+    ma_200 REAL,
+    high_24h REAL,
+    low_24h REAL,
+    trend TEXT,
+    volume_change_pct REAL,
+    funding_rate_status TEXT,
+    volatility_status TEXT,
+    trading_direction TEXT,
+    anomaly_count INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS snapshots_by_symbol ON snapshots (symbol, timestamp);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (timestamp);
+CREATE TABLE IF NOT EXISTS anomalies (
+    symbol TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    type TEXT,
+    severity TEXT,
+    description TEXT,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS anomalies_by_time ON anomalies (timestamp);
+-- At most one anomaly of each type per snapshot, so re-queued analyses are ignored like their snapshots
+CREATE UNIQUE INDEX IF NOT EXISTS anomalies_by_symbol_type ON anomalies (symbol, type, timestamp);
+"""
+
+# Distinct symbols by jumping along the (symbol, timestamp) index instead of scanning every row
+SYMBOLS_QUERY = """
+WITH RECURSIVE s(symbol) AS (
+    SELECT MIN(symbol) FROM snapshots
+    UNION ALL
+    SELECT (SELECT MIN(symbol) FROM snapshots WHERE symbol > s.symbol) FROM s WHERE s.symbol IS NOT NULL
+)
+SELECT symbol FROM s WHERE symbol IS NOT NULL
+"""
+
+_FLUSH = object()
+_STOP = object()
+
+
+def _to_ms(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() * 1000)
+
+
+def _row_dict(cursor: sqlite3.Cursor, row: tuple) -> Dict:
+    record = {column[0]: value for column, value in zip(cursor.description, row)}
+    record['timestamp'] = datetime.fromtimestamp(record['timestamp'] / 1000)
+    return record
+
+
+def snapshot_rows(analysis: MarketAnalysis):
+    """The analysis as one snapshots row and its anomalies rows"""
+    data = analysis.market_data
+    timestamp = _to_ms(analysis.timestamp)
+    snapshot = (
+        analysis.symbol, timestamp,
+        *(getattr(data, name) if data is not None else None for name in MARKET_DATA_COLUMNS),
+        analysis.trend, analysis.volume_change_pct, analysis.funding_rate_status,
+        analysis.volatility_status, analysis.trading_direction, len(analysis.anomalies),
+    )
+    anomalies = [(analysis.symbol, timestamp, a.type, a.severity, a.description, a.value)
+                 for a in analysis.anomalies]
+    return snapshot, anomalies
+
+
+class HistoryStore:
+    """
+    Append-only store of analysis snapshots and their anomalies in one
+    SQLite file. record() only queues the snapshot; a writer thread commits
+    queued snapshots in batches and periodically deletes rows older than
+    the retention period. Rows are appended in time order, snapshots are
+    indexed by (symbol, time) and both tables by time, so "last N for a
+    symbol" and "anomalies in a range" are short index range scans. Reads
+    use one connection per thread and, with WAL, never wait for the writer.
+    """
+
+    def __init__(self, path: str = config.HISTORY_DB_FILE,
+                 batch_size: int = config.HISTORY_BATCH_SIZE,
+                 flush_interval: float = config.HISTORY_FLUSH_INTERVAL,
+                 retention_days: float = config.HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._queue = queue.Queue(maxsize=config.HISTORY_QUEUE_SIZE)
+        self._local = threading.local()
+        self._recorded: Dict[str, datetime] = {}  # symbol -> timestamp of the last queued analysis
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection(schema=True)
+
+    def _connection(self, schema: bool = False) -> sqlite3.Connection:
+        """This thread's connection (creating the schema first, if asked)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            if schema:
+                conn.executescript(SCHEMA)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA cache_size = {-config.HISTORY_CACHE_KB}")
+            self._local.conn = conn
+        return conn
+
+    def record(self, analysis: MarketAnalysis):
+        """Queue an analysis for writing (never blocks; dropped if the queue is full)"""
+        with self._lock:
+            if self._recorded.get(analysis.symbol) == analysis.timestamp:
+                return  # reused analysis, already recorded
+            self._recorded[analysis.symbol] = analysis.timestamp
+            self._start_writer()
+        try:
+            self._queue.put_nowait(analysis)
+        except queue.Full:
+            HISTORY_SNAPSHOTS.inc(result='dropped')
+
+    def flush(self):
+        """Wait until every queued snapshot is written"""
+        with self._lock:
+            if self._writer is None:
+                return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Write queued snapshots and stop the writer thread"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(_STOP)
+            writer.join()
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        conn = self._connection()
+        next_compaction = time.monotonic()
+        batch: List[MarketAnalysis] = []
+        taken = 0  # queue items to mark done once the batch is written
+        deadline = 0.0  # the oldest queued snapshot is written by then
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+                taken += 1
+            except queue.Empty:
+                item = _FLUSH
+            if item is not _FLUSH and item is not _STOP:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write(conn, batch)
+                batch = []
+            for _ in range(taken):
+                self._queue.task_done()
+            taken = 0
+            if item is _STOP:
+                conn.close()
+                self._local.conn = None
+                return
+            if time.monotonic() >= next_compaction:
+                self.compact(conn)
+                next_compaction = time.monotonic() + config.HISTORY_COMPACT_INTERVAL
+
+    def _write(self, conn: sqlite3.Connection, batch: List[MarketAnalysis]):
+        snapshots, anomalies = [], []
+        for analysis in batch:
+            snapshot, rows = snapshot_rows(analysis)
+            snapshots.append(snapshot)
+            anomalies.extend(rows)
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO snapshots VALUES ({','.join('?' * len(SNAPSHOT_COLUMNS))})", snapshots)
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO anomalies VALUES ({','.join('?' * len(ANOMALY_COLUMNS))})", anomalies)
+            HISTORY_SNAPSHOTS.inc(len(snapshots), result='written')
+        except sqlite3.Error as e:
+            print(f"Error writing analysis history: {e}")
+            HISTORY_SNAPSHOTS.inc(len(snapshots), result='dropped')
+
+    def write(self, analyses: Iterable[MarketAnalysis]):
+        """Write analyses synchronously in this thread (bulk imports, benchmarks)"""
+        self._write(self._connection(), list(analyses))
+
+    def compact(self, conn: Optional[sqlite3.Connection] = None, now: Optional[datetime] = None):
+        """Delete rows older than the retention period and release the freed pages"""
+        if not self.retention_days:
+            return
+        conn = conn or self._connection()
+        cutoff = _to_ms(now or datetime.now()) - int(self.retention_days * 86_400_000)
+        try:
+            with conn:
+                conn.execute("DELETE FROM snapshots WHERE timestamp < ?", (cutoff,))
+                conn.execute("DELETE FROM anomalies WHERE timestamp < ?", (cutoff,))
+            # executescript steps the pragma to completion; execute() would free a single page
+            conn.executescript("PRAGMA incremental_vacuum")
+        except sqlite3.Error as e:
+            print(f"Error compacting analysis history: {e}")
+
+    def symbols(self) -> List[str]:
+        """Symbols with recorded snapshots"""
+        return [symbol for (symbol,) in self._connection().execute(SYMBOLS_QUERY)]
+
+    def last_snapshots(self, symbol: str, n: int = config.HISTORY_UI_ROWS) -> List[Dict]:
+        """The symbol's last n snapshots, oldest first"""
+        cursor = self._connection().execute(
+            "SELECT * FROM snapshots WHERE symbol = ? ORDER BY timestamp DESC LIMIT ?", (symbol, n))
+        return [_row_dict(cursor, row) for row in reversed(cursor.fetchall())]
+
+    def latest(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """The newest snapshot of each symbol that has one"""
+        latest = {}
+        for symbol in symbols:
+            rows = self.last_snapshots(symbol, 1)
+            if rows:
+                latest[symbol] = rows[0]
+        return latest
+
+    def anomalies(self, start: datetime, end: Optional[datetime] = None,
+                  symbols: Optional[Iterable[str]] = None, limit: int = 1000) -> List[Dict]:
+        """Anomalies recorded between start and end (default: now), newest first"""
+        params = [_to_ms(start), _to_ms(end or datetime.now())]
+        where = "timestamp BETWEEN ? AND ?"
+        if symbols is not None:
+            symbols = list(symbols)
+            where += f" AND symbol IN ({','.join('?' * len(symbols))})"
+            params += symbols
+        cursor = self._connection().execute(
+            f"SELECT * FROM anomalies WHERE {where} ORDER BY timestamp DESC LIMIT ?", (*params, limit))
+        return [_row_dict(cursor, row) for row in cursor.fetchall()]
+
+
+_shared_store: Optional[HistoryStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Process-wide history store, so all sessions share one writer"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = HistoryStore()
+        return _shared_store
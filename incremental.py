@@ -0,0 +1,101 @@
+"""Dirty-checked re-analysis: reuse analyses and reports while inputs barely move"""
+import dataclasses
+import threading
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+from models import MarketData, MarketAnalysis
+from market_analyzer import MarketAnalyzer
+from report_generator import ReportGenerator
+from metrics import REANALYSIS
+import config
+
+
+# Inputs compared between cycles, in check_values order; MAs, ranges and the
+# volume average are derived from price and volume and are not compared
+CHECKED_FIELDS = ('price', 'volume_24h', 'funding_rate', 'open_interest_change', 'liquidations')
+
+
+def check_values(data: MarketData) -> Tuple:
+    """The checked inputs as scalars (liquidations as their total count)"""
+    liquidations = data.liquidations.get('total_liquidations') if data.liquidations else None
+    return data.price, data.volume_24h, data.funding_rate, data.open_interest_change, liquidations
+
+
+def _moved(old, new, threshold: float) -> bool:
+    """Whether a value moved by more than `threshold`, relative to its old value"""
+    return old is None or new is None or not threshold or not old or abs(new - old) > threshold * abs(old)
+
+
+def moved_fields(old: Tuple, new: Tuple, thresholds: Tuple[float, ...]) -> List[str]:
+    """Checked fields whose value moved past its threshold"""
+    if old == new:
+        return []
+    return [name for name, a, b, threshold in zip(CHECKED_FIELDS, old, new, thresholds)
+            if a != b and _moved(a, b, threshold)]
+
+
+@dataclasses.dataclass
+class _SymbolResult:
+    candle_time: Optional[int]  # base candle the analysis was computed on
+    values: Tuple  # check_values of the analyzed data
+    analysis: MarketAnalysis
+    report: Optional[str] = None
+
+
+class IncrementalAnalyzer:
+    """
+    Keeps each symbol's last analysis and report with the checked input
+    values they were computed from. While no checked input moved past its
+    config.REANALYZE_THRESHOLDS and no new base candle opened, the previous
+    analysis and report are reused; otherwise the full analysis runs. The
+    check is a handful of float comparisons, well below the cost of
+    analyze_market, so it pays off however many symbols move.
+    """
+
+    def __init__(self, analyzer: MarketAnalyzer, report_generator: ReportGenerator,
+                 thresholds: Mapping[str, float] = config.REANALYZE_THRESHOLDS):
+        self.analyzer = analyzer
+        self.report_generator = report_generator
+        self.thresholds = tuple(thresholds.get(name, 0.0) for name in CHECKED_FIELDS)
+        self._results: Dict[str, _SymbolResult] = {}
+        self._lock = threading.Lock()
+
+    def analyze(self, data: MarketData) -> Tuple[MarketAnalysis, Set[str]]:
+        """Analysis for new data and the checked fields that moved (empty when reused)"""
+        values = check_values(data)
+        with self._lock:
+            previous = self._results.get(data.symbol)
+        if previous is not None and previous.candle_time == data.candle_time:
+            changed = moved_fields(previous.values, values, self.thresholds)
+            if not changed:
+                REANALYSIS.inc(result='reused')
+                return previous.analysis, set()
+        else:
+            changed = CHECKED_FIELDS
+
+        analysis = self.analyzer.analyze_market(data)
+        REANALYSIS.inc(result='full')
+        with self._lock:
+            self._results[data.symbol] = _SymbolResult(data.candle_time, values, analysis)
+        return analysis, set(changed)
+
+    def report(self, analysis: MarketAnalysis) -> str:
+        """Rendered report, reused when the analysis is the one last rendered"""
+        with self._lock:
+            result = self._results.get(analysis.symbol)
+        if result is not None and result.analysis is analysis and result.report is not None:
+            return result.report
+        report = self.report_generator.format_report(analysis)
+        if result is not None and result.analysis is analysis:
+            result.report = report
+        return report
+
+    def latest(self, symbol: str) -> Optional[MarketAnalysis]:
+        """The symbol's most recent analysis, if any"""
+        with self._lock:
+            result = self._results.get(symbol)
+        return result.analysis if result is not None else None
+
+    def forget(self, symbol: str):
+        """Drop a symbol's state so its next analysis starts from scratch"""
+        with self._lock:
+            self._results.pop(symbol, None)
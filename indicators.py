@@ -0,0 +1,142 @@
+"""Incremental indicator engine"""
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+# Running state slots, laid out like the accumulators of pandas' roll_mean
+_NOBS, _SUM, _NEG_CT, _COMP_ADD, _COMP_REMOVE, _SAME_CT, _PREV = range(7)
+
+
+def _add(state: list, value: float):
+    """Add a value to the running sum (pandas add_mean)"""
+    if value != value:  # NaN
+        return
+    state[_NOBS] += 1
+    y = value - state[_COMP_ADD]
+    t = state[_SUM] + y
+    state[_COMP_ADD] = t - state[_SUM] - y
+    state[_SUM] = t
+    if math.copysign(1.0, value) < 0:
+        state[_NEG_CT] += 1
+    if value == state[_PREV]:
+        state[_SAME_CT] += 1
+    else:
+        state[_SAME_CT] = 1
+    state[_PREV] = value
+
+
+def _remove(state: list, value: float):
+    """Remove a value from the running sum (pandas remove_mean)"""
+    if value != value:  # NaN
+        return
+    state[_NOBS] -= 1
+    y = -value - state[_COMP_REMOVE]
+    t = state[_SUM] + y
+    state[_COMP_REMOVE] = t - state[_SUM] - y
+    state[_SUM] = t
+    if math.copysign(1.0, value) < 0:
+        state[_NEG_CT] -= 1
+
+
+class RollingMean:
+    """
+    Rolling mean over a fixed window, updated in O(1).
+    Uses the same compensated add/remove steps as pandas, so for the same
+    stream of values the result is bit-identical to
+    Series.rolling(window, min_periods).mean().iloc[-1].
+    """
+
+    def __init__(self, window: int, min_periods: Optional[int] = None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self._closed = deque(maxlen=window)  # last `window` closed values
+        self._committed = [0, 0.0, 0, 0.0, 0.0, 0, math.nan]  # state after the last closed value
+        self._live: Optional[list] = None  # committed state plus the live value
+        self._live_value: Optional[float] = None
+
+    def set_live(self, value: float):
+        """Set (or replace) the value of the still-open period"""
+        state = list(self._committed)
+        if len(self._closed) == self.window:
+            _remove(state, self._closed[0])
+        _add(state, value)
+        self._live = state
+        self._live_value = value
+
+    def close_live(self):
+        """Finalize the live value; the next set_live opens a new period"""
+        if self._live is None:
+            return
+        self._committed = self._live
+        self._closed.append(self._live_value)
+        self._live = None
+        self._live_value = None
+
+    def push(self, value: float):
+        """Append a closed value"""
+        self.set_live(value)
+        self.close_live()
+
+    @property
+    def value(self) -> Optional[float]:
+        """Current mean, or None until min_periods values are available"""
+        state = self._live if self._live is not None else self._committed
+        nobs = state[_NOBS]
+        if nobs < self.min_periods or nobs <= 0:
+            return None
+        result = state[_SUM] / nobs
+        if state[_SAME_CT] >= nobs:
+            result = state[_PREV]
+        elif state[_NEG_CT] == 0 and result < 0:
+            result = 0.0
+        elif state[_NEG_CT] == nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class IndicatorEngine:
+    """
+    Rolling means of candle fields for one symbol/timeframe.
+    Fed with the same ccxt-style candle rows as CandleBuffer: a row with the
+    current candle's timestamp replaces the live candle, a newer row closes
+    it and opens the next one, and older rows are ignored.
+    """
+
+    FIELDS = {'open': 1, 'high': 2, 'low': 3, 'close': 4, 'volume': 5}
+
+    def __init__(self, windows: Dict[str, Iterable[int]], min_periods: Optional[Dict[str, int]] = None):
+        min_periods = min_periods or {}
+        self._means: Dict[str, Dict[int, RollingMean]] = {
+            field: {window: RollingMean(window, min_periods.get(field)) for window in field_windows}
+            for field, field_windows in windows.items()
+        }
+        self.live_timestamp: Optional[int] = None
+
+    def update(self, candles: Iterable[Sequence[float]]):
+        """Apply new or updated candle rows"""
+        for candle in candles:
+            timestamp = candle[0]
+            if self.live_timestamp is not None:
+                if timestamp < self.live_timestamp:
+                    continue
+                if timestamp > self.live_timestamp:
+                    self._close_live()
+            self.live_timestamp = timestamp
+            for field, means in self._means.items():
+                value = float(candle[self.FIELDS[field]])
+                for rolling in means.values():
+                    rolling.set_live(value)
+
+    def _close_live(self):
+        for means in self._means.values():
+            for rolling in means.values():
+                rolling.close_live()
+
+    def mean(self, field: str, window: int) -> Optional[float]:
+        """Current rolling mean of a field over a configured window"""
+        return self._means[field][window].value
+
+    def windows(self, field: str) -> List[int]:
+        """Windows configured for a field"""
+        return list(self._means[field])
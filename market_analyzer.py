@@ -1,42 +1,68 @@
 """Market analysis module"""
 import numpy as np
-from typing import List, Dict, Tuple
-from models import MarketData, MarketAnalysis, Anomaly
+from typing import List, Dict, Tuple, Optional
+from models import MarketData, MarketAnalysis, Anomaly, MarketDataBatch, BatchAnalysis
 from datetime import datetime
 import config
 
 
+# (trend, emoji, description) for each trend outcome, keyed by (trend, beyond MA200)
+TREND_INSUFFICIENT = ("neutral", "➡️", "Chưa đủ dữ liệu để xác định xu hướng")
+TREND_RESULTS = {
+    ("bullish", True): ("bullish", "📈", "Xu hướng tăng mạnh, giá trên các MA chính"),
+    ("bullish", False): ("bullish", "📈", "Xu hướng tăng ngắn hạn, giá trên MA20 và MA50"),
+    ("bearish", True): ("bearish", "📉", "Xu hướng giảm mạnh, giá dưới các MA chính"),
+    ("bearish", False): ("bearish", "📉", "Xu hướng giảm ngắn hạn, giá dưới MA20 và MA50"),
+    ("neutral", False): ("neutral", "➡️", "Thị trường đang sideway, chưa có xu hướng rõ ràng"),
+}
+
+# Status labels in increasing order, as produced by analyze_funding_rate / calculate_volatility
+FUNDING_STATUSES = ("không có dữ liệu", "bình thường", "cao", "nguy hiểm")
+VOLATILITY_STATUSES = ("không xác định", "thấp", "trung bình", "mạnh")
+
+
+def _present(values: np.ndarray) -> np.ndarray:
+    """Vectorized truthiness of optional floats: not missing (NaN) and non-zero"""
+    return ~np.isnan(values) & (values != 0)
+
+
 class MarketAnalyzer:
     """Analyzes market data and detects anomalies"""
     
     def __init__(self):
         pass
     
-    def analyze_trend(self, data: MarketData) -> Tuple[str, str, str]:
+    def analyze_trend(self, data: MarketData, timeframe: Optional[str] = None) -> Tuple[str, str, str]:
         """
-        Analyze market trend based on moving averages
+        Analyze market trend based on moving averages, of the primary
+        timeframe or of another one collected in data.timeframe_mas
         Returns: (trend, emoji, description)
         """
         price = data.price
-        ma_20 = data.ma_20
-        ma_50 = data.ma_50
-        ma_200 = data.ma_200
+        mas = data.timeframe_mas.get(timeframe, {}) if timeframe else None
+        ma_20 = mas.get('ma_20') if mas is not None else data.ma_20
+        ma_50 = mas.get('ma_50') if mas is not None else data.ma_50
+        ma_200 = mas.get('ma_200') if mas is not None else data.ma_200
         
         # Check if we have enough data
         if not ma_20 or not ma_50:
-            return "neutral", "➡️", "Chưa đủ dữ liệu để xác định xu hướng"
+            return TREND_INSUFFICIENT
         
         # Determine trend
         if price > ma_20 and ma_20 > ma_50:
-            if ma_200 and price > ma_200:
-                return "bullish", "📈", "Xu hướng tăng mạnh, giá trên các MA chính"
-            return "bullish", "📈", "Xu hướng tăng ngắn hạn, giá trên MA20 và MA50"
+            return TREND_RESULTS[("bullish", bool(ma_200 and price > ma_200))]
         elif price < ma_20 and ma_20 < ma_50:
-            if ma_200 and price < ma_200:
-                return "bearish", "📉", "Xu hướng giảm mạnh, giá dưới các MA chính"
-            return "bearish", "📉", "Xu hướng giảm ngắn hạn, giá dưới MA20 và MA50"
+            return TREND_RESULTS[("bearish", bool(ma_200 and price < ma_200))]
         else:
-            return "neutral", "➡️", "Thị trường đang sideway, chưa có xu hướng rõ ràng"
+            return TREND_RESULTS[("neutral", False)]
+    
+    def analyze_timeframes(self, data: MarketData) -> Dict[str, Tuple[str, str]]:
+        """(trend, emoji) for every timeframe in data.timeframe_mas"""
+        trends = {}
+        for timeframe in data.timeframe_mas:
+            trend, emoji, _ = self.analyze_trend(data, timeframe)
+            trends[timeframe] = (trend, emoji)
+        return trends
     
     def calculate_volume_change(self, data: MarketData) -> float:
         """Calculate volume change percentage"""
@@ -72,6 +98,45 @@ class MarketAnalyzer:
         else:
             return "mạnh"
     
+    def _volume_spike_anomaly(self, volume_change: float) -> Anomaly:
+        return Anomaly(
+            type="volume_spike",
+            severity="high" if volume_change > 50 else "medium",
+            description=f"Volume tăng đột biến {volume_change:.1f}% so với trung bình",
+            value=volume_change
+        )
+    
+    def _funding_extreme_anomaly(self, funding_rate: float) -> Anomaly:
+        return Anomaly(
+            type="funding_extreme",
+            severity="high",
+            description=f"Funding rate {'dương' if funding_rate > 0 else 'âm'} cực đoan, nguy cơ squeeze",
+            value=funding_rate
+        )
+    
+    def _oi_spike_anomaly(self, oi_change: float) -> Anomaly:
+        return Anomaly(
+            type="oi_spike",
+            severity="high" if oi_change > config.OI_SPIKE_THRESHOLD * 2 else "medium",
+            description=f"Open Interest tăng đột biến {oi_change * 100:.1f}% trong {config.OI_SPIKE_LOOKBACK // 60} phút",
+            value=oi_change * 100
+        )
+    
+    def _liquidation_anomaly(self, total_liq: int, long_liq: int, short_liq: int) -> Anomaly:
+        if long_liq > short_liq * 2:
+            desc = f"Thanh lý long cao ({long_liq}), áp lực giảm mạnh"
+        elif short_liq > long_liq * 2:
+            desc = f"Thanh lý short cao ({short_liq}), áp lực tăng mạnh"
+        else:
+            desc = f"Thanh lý lớn cả 2 chiều ({total_liq} vị thế)"
+        
+        return Anomaly(
+            type="liquidation_risk",
+            severity="medium",
+            description=desc,
+            value=float(total_liq)
+        )
+    
     def detect_anomalies(self, data: MarketData) -> List[Anomaly]:
         """Detect market anomalies"""
         anomalies = []
@@ -79,44 +144,24 @@ class MarketAnalyzer:
         # 1. Volume spike detection
         volume_change = self.calculate_volume_change(data)
         if volume_change > config.VOLUME_SPIKE_THRESHOLD * 100:
-            anomalies.append(Anomaly(
-                type="volume_spike",
-                severity="high" if volume_change > 50 else "medium",
-                description=f"Volume tăng đột biến {volume_change:.1f}% so với trung bình",
-                value=volume_change
-            ))
+            anomalies.append(self._volume_spike_anomaly(volume_change))
         
         # 2. Funding rate extreme
         if data.funding_rate and abs(data.funding_rate) > config.FUNDING_RATE_THRESHOLD:
-            anomalies.append(Anomaly(
-                type="funding_extreme",
-                severity="high",
-                description=f"Funding rate {'dương' if data.funding_rate > 0 else 'âm'} cực đoan, nguy cơ squeeze",
-                value=data.funding_rate
-            ))
+            anomalies.append(self._funding_extreme_anomaly(data.funding_rate))
         
-        # 3. Open Interest spike (if we have historical OI, compare)
-        # For now, we'll skip this as we need historical data
+        # 3. Open Interest spike against the collector's OI history
+        if data.open_interest_change is not None and data.open_interest_change > config.OI_SPIKE_THRESHOLD:
+            anomalies.append(self._oi_spike_anomaly(data.open_interest_change))
         
         # 4. Liquidation risk
         if data.liquidations:
             total_liq = data.liquidations.get('total_liquidations', 0)
             if total_liq > 50:  # Threshold for high liquidations
-                long_liq = data.liquidations.get('long_liquidations', 0)
-                short_liq = data.liquidations.get('short_liquidations', 0)
-                
-                if long_liq > short_liq * 2:
-                    desc = f"Thanh lý long cao ({long_liq}), áp lực giảm mạnh"
-                elif short_liq > long_liq * 2:
-                    desc = f"Thanh lý short cao ({short_liq}), áp lực tăng mạnh"
-                else:
-                    desc = f"Thanh lý lớn cả 2 chiều ({total_liq} vị thế)"
-                
-                anomalies.append(Anomaly(
-                    type="liquidation_risk",
-                    severity="medium",
-                    description=desc,
-                    value=float(total_liq)
+                anomalies.append(self._liquidation_anomaly(
+                    total_liq,
+                    data.liquidations.get('long_liquidations', 0),
+                    data.liquidations.get('short_liquidations', 0),
                 ))
         
         return anomalies
@@ -216,7 +261,8 @@ class MarketAnalyzer:
             anomalies=anomalies,
             key_levels=key_levels,
             trading_direction="",
-            market_data=data
+            market_data=data,
+            timeframe_trends=self.analyze_timeframes(data)
         )
         
         # Generate trading direction
@@ -224,6 +270,115 @@ class MarketAnalyzer:
         
         return analysis
 
+    
+    def analyze_batch(self, batch: MarketDataBatch) -> BatchAnalysis:
+        """
+        Vectorized analyze_market over many symbols.
+        Computes trend, volume change, funding/volatility status and anomaly
+        masks with NumPy; use build_analyses to get MarketAnalysis objects.
+        """
+        price = batch.price
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Trend (same rules as analyze_trend)
+            trend_known = _present(batch.ma_20) & _present(batch.ma_50)
+            bullish = trend_known & (price > batch.ma_20) & (batch.ma_20 > batch.ma_50)
+            bearish = trend_known & ~bullish & (price < batch.ma_20) & (batch.ma_20 < batch.ma_50)
+            has_ma_200 = _present(batch.ma_200)
+            trend = np.where(bullish, "bullish", np.where(bearish, "bearish", "neutral")).astype(object)
+            trend_strong = (bullish & has_ma_200 & (price > batch.ma_200)) | \
+                           (bearish & has_ma_200 & (price < batch.ma_200))
+            
+            # Volume change (same rules as calculate_volume_change)
+            avg = batch.volume_avg_7d
+            volume_change = np.where(avg == 0, 0.0, ((batch.volume_24h - avg) / avg) * 100)
+            
+            # Funding rate status (same rules as analyze_funding_rate)
+            fr = np.abs(batch.funding_rate)
+            funding_status = np.select(
+                [np.isnan(fr), fr < config.FUNDING_RATE_THRESHOLD * 0.5, fr < config.FUNDING_RATE_THRESHOLD],
+                FUNDING_STATUSES[:3],
+                default=FUNDING_STATUSES[3],
+            ).astype(object)
+            
+            # Volatility (same rules as calculate_volatility)
+            has_range = _present(batch.high_24h) & _present(batch.low_24h)
+            volatility_pct = ((batch.high_24h - batch.low_24h) / batch.low_24h) * 100
+            volatility_status = np.select(
+                [~has_range, volatility_pct < 3, volatility_pct < 7],
+                VOLATILITY_STATUSES[:3],
+                default=VOLATILITY_STATUSES[3],
+            ).astype(object)
+            
+            # Anomaly masks (same rules as detect_anomalies)
+            volume_spike = volume_change > config.VOLUME_SPIKE_THRESHOLD * 100
+            funding_extreme = _present(batch.funding_rate) & (fr > config.FUNDING_RATE_THRESHOLD)
+            oi_spike = batch.open_interest_change > config.OI_SPIKE_THRESHOLD
+            liquidation_risk = batch.liquidations_total > 50
+        
+        return BatchAnalysis(
+            data=batch,
+            trend=trend,
+            trend_strong=trend_strong,
+            trend_known=trend_known,
+            volume_change_pct=volume_change,
+            funding_rate_status=funding_status,
+            volatility_status=volatility_status,
+            volume_spike=volume_spike,
+            funding_extreme=funding_extreme,
+            oi_spike=oi_spike,
+            liquidation_risk=liquidation_risk,
+        )
+    
+    def build_analyses(self, result: BatchAnalysis, mask: Optional[np.ndarray] = None) -> List[MarketAnalysis]:
+        """Build MarketAnalysis objects for the rows selected by mask (all rows by default)"""
+        batch = result.data
+        indices = range(len(batch)) if mask is None else np.flatnonzero(mask)
+        analyses = []
+        
+        for i in indices:
+            data = batch.market_data(i)
+            
+            if result.trend_known[i]:
+                trend, emoji, trend_desc = TREND_RESULTS[(result.trend[i], bool(result.trend_strong[i]))]
+            else:
+                trend, emoji, trend_desc = TREND_INSUFFICIENT
+            
+            volume_change = float(result.volume_change_pct[i])
+            anomalies = []
+            if result.volume_spike[i]:
+                anomalies.append(self._volume_spike_anomaly(volume_change))
+            if result.funding_extreme[i]:
+                anomalies.append(self._funding_extreme_anomaly(data.funding_rate))
+            if result.oi_spike[i]:
+                anomalies.append(self._oi_spike_anomaly(float(batch.open_interest_change[i])))
+            if result.liquidation_risk[i]:
+                anomalies.append(self._liquidation_anomaly(
+                    int(batch.liquidations_total[i]),
+                    int(batch.liquidations_long[i]),
+                    int(batch.liquidations_short[i]),
+                ))
+            
+            analysis = MarketAnalysis(
+                symbol=batch.symbols[i],
+                timestamp=datetime.now(),
+                trend=trend,
+                trend_emoji=emoji,
+                trend_description=trend_desc,
+                volume_change_pct=volume_change,
+                funding_rate_status=result.funding_rate_status[i],
+                volatility_status=result.volatility_status[i],
+                anomalies=anomalies,
+                key_levels=self.calculate_key_levels(data),
+                trading_direction="",
+                market_data=data,
+                timeframe_trends=self.analyze_timeframes(data)
+            )
+            analysis.trading_direction = self.generate_trading_direction(analysis)
+            analyses.append(analysis)
+        
+        return analyses
+
 
 def get_market_analyzer() -> MarketAnalyzer:
     """Factory function to get MarketAnalyzer instance"""
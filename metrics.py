@@ -0,0 +1,258 @@
+"""In-process metrics registry with a Prometheus text exporter"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) for every series"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{self.name}{suffix}{labels} {value}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def values(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for key, value in self.values().items():
+            yield "_total" if not self.name.endswith("_total") else "", _format_labels(self.label_names, key), value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def values(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        for key, value in self.values().items():
+            yield "", _format_labels(self.label_names, key), value
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., +Inf count, sum
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _snapshot(self) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def quantile(self, q: float, counts: List[float]) -> Optional[float]:
+        """Estimate a quantile from bucket counts (as Prometheus histogram_quantile does)"""
+        total = sum(counts[:-1])
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0.0
+        for i, count in enumerate(counts[:-1]):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i >= len(self.buckets):
+                    return self.buckets[-1]
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summary(self) -> List[Dict]:
+        """Count, mean and estimated p50/p95/p99 for every series"""
+        rows = []
+        for key, series in self._snapshot().items():
+            count = sum(series[:-1])
+            rows.append({
+                **dict(zip(self.label_names, key)),
+                'count': int(count),
+                'mean': series[-1] / count if count else None,
+                'p50': self.quantile(0.50, series),
+                'p95': self.quantile(0.95, series),
+                'p99': self.quantile(0.99, series),
+            })
+        return rows
+
+    def samples(self):
+        for key, series in self._snapshot().items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield "_bucket", _format_labels(self.label_names, key, f'le="{bound}"'), cumulative
+            cumulative += series[len(self.buckets)]
+            yield "_bucket", _format_labels(self.label_names, key, 'le="+Inf"'), cumulative
+            yield "_sum", _format_labels(self.label_names, key), series[-1]
+            yield "_count", _format_labels(self.label_names, key), cumulative
+
+
+class MetricsRegistry:
+    """Holds metrics by name; get-or-create so modules can share them"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in list(self._metrics.values())) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Metrics shared across modules
+NODE_DURATION = REGISTRY.histogram(
+    'graph_node_duration_seconds', 'Duration of LangGraph node executions', ('node',))
+FETCH_DURATION = REGISTRY.histogram(
+    'exchange_request_duration_seconds', 'Duration of exchange / REST calls', ('source',))
+FETCH_ERRORS = REGISTRY.counter(
+    'exchange_errors_total', 'Failed or timed out exchange / REST calls', ('source', 'kind'))
+IN_FLIGHT = REGISTRY.gauge(
+    'exchange_requests_in_flight', 'Exchange / REST calls currently running', ('source',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'cache_lookups_total', 'TTL cache lookups by outcome', ('source', 'result'))
+WEIGHT_USED = REGISTRY.gauge(
+    'exchange_weight_used', 'Request weight used in the current one-minute window')
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    'rate_limit_wait_seconds', 'Time requests waited for weight budget', ('source',))
+REANALYSIS = REGISTRY.counter(
+    'analysis_runs_total', 'Analyses by outcome: full or reused (inputs unchanged)', ('result',))
+STREAM_EVENTS = REGISTRY.counter(
+    'stream_events_total', 'WebSocket events applied by type', ('event',))
+STREAM_LAG = REGISTRY.histogram(
+    'stream_event_lag_seconds', 'Delay from exchange event time to local state update')
+STREAM_RECONNECTS = REGISTRY.counter(
+    'stream_reconnects_total', 'WebSocket connections lost and re-established')
+HISTORY_SNAPSHOTS = REGISTRY.counter(
+    'history_snapshots_total', 'Analysis snapshots written to or dropped from the history store', ('result',))
+API_REQUESTS = REGISTRY.counter(
+    'api_requests_total', 'HTTP API requests by endpoint and status', ('endpoint', 'status'))
+
+
+def cache_hit_rates() -> Dict[str, float]:
+    """Fraction of cache lookups served from cache, per source"""
+    totals: Dict[str, float] = {}
+    hits: Dict[str, float] = {}
+    for (source, result), value in CACHE_LOOKUPS.values().items():
+        totals[source] = totals.get(source, 0.0) + value
+        if result != 'miss':
+            hits[source] = hits.get(source, 0.0) + value
+    return {source: hits.get(source, 0.0) / total for source, total in totals.items() if total}
@@ -1,7 +1,8 @@
 """Data models for crypto market analysis"""
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+import numpy as np
 
 
 @dataclass
@@ -13,6 +14,7 @@ class MarketData:
     volume_24h: float
     volume_avg_7d: float
     open_interest: Optional[float] = None
+    open_interest_change: Optional[float] = None  # fraction vs OI_SPIKE_LOOKBACK ago
     funding_rate: Optional[float] = None
     ma_20: Optional[float] = None
     ma_50: Optional[float] = None
@@ -21,6 +23,131 @@ class MarketData:
     low_24h: Optional[float] = None
     liquidations: Optional[Dict] = None
     sentiment_score: Optional[float] = None
+    timeframe_mas: Dict[str, Dict[str, Optional[float]]] = field(default_factory=dict)  # timeframe -> {'ma_20': ...}
+    candle_time: Optional[int] = None  # open time (ms) of the newest base-timeframe candle
+
+
+@dataclass
+class MarketSnapshot:
+    """Tickers and funding/premium data for every futures symbol, fetched in bulk"""
+    timestamp: datetime
+    tickers: Dict[str, Dict] = field(default_factory=dict)
+    funding_rates: Dict[str, Dict] = field(default_factory=dict)
+    
+    def is_fresh(self, max_age: float) -> bool:
+        """Whether the snapshot is younger than max_age seconds"""
+        return (datetime.now() - self.timestamp).total_seconds() < max_age
+    
+    @staticmethod
+    def _lookup(table: Dict[str, Dict], symbol: str) -> Optional[Dict]:
+        # Futures markets are keyed by their settle currency, e.g. BTC/USDT:USDT
+        if symbol in table:
+            return table[symbol]
+        return table.get(f"{symbol}:{symbol.split('/')[-1]}")
+    
+    def ticker(self, symbol: str) -> Optional[Dict]:
+        """24h ticker for a symbol, if present"""
+        return self._lookup(self.tickers, symbol)
+    
+    def funding(self, symbol: str) -> Optional[Dict]:
+        """Funding rate / premium index entry for a symbol, if present"""
+        return self._lookup(self.funding_rates, symbol)
+
+
+def _nan_if_none(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _none_if_nan(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+@dataclass
+class MarketDataBatch:
+    """Columnar market data for many symbols (NaN marks a missing value)"""
+    symbols: List[str]
+    price: np.ndarray
+    volume_24h: np.ndarray
+    volume_avg_7d: np.ndarray
+    ma_20: np.ndarray
+    ma_50: np.ndarray
+    ma_200: np.ndarray
+    funding_rate: np.ndarray
+    high_24h: np.ndarray
+    low_24h: np.ndarray
+    liquidations_total: np.ndarray
+    liquidations_long: np.ndarray
+    liquidations_short: np.ndarray
+    open_interest: Optional[np.ndarray] = None
+    open_interest_change: Optional[np.ndarray] = None
+    timestamp: Optional[datetime] = None
+    records: Optional[List[MarketData]] = None  # source objects, reused when building analyses
+    
+    def __post_init__(self):
+        if self.open_interest is None:
+            self.open_interest = np.full(len(self.symbols), np.nan)
+        if self.open_interest_change is None:
+            self.open_interest_change = np.full(len(self.symbols), np.nan)
+    
+    def __len__(self) -> int:
+        return len(self.symbols)
+    
+    @classmethod
+    def from_market_data(cls, data: List[MarketData]) -> 'MarketDataBatch':
+        """Build a batch from MarketData objects"""
+        def column(name: str) -> np.ndarray:
+            return np.array([_nan_if_none(getattr(d, name)) for d in data], dtype=np.float64)
+        
+        def liquidation_column(key: str) -> np.ndarray:
+            return np.array([float(d.liquidations.get(key, 0)) if d.liquidations else np.nan for d in data],
+                            dtype=np.float64)
+        
+        return cls(
+            symbols=[d.symbol for d in data],
+            price=column('price'),
+            volume_24h=column('volume_24h'),
+            volume_avg_7d=column('volume_avg_7d'),
+            ma_20=column('ma_20'),
+            ma_50=column('ma_50'),
+            ma_200=column('ma_200'),
+            funding_rate=column('funding_rate'),
+            high_24h=column('high_24h'),
+            low_24h=column('low_24h'),
+            liquidations_total=liquidation_column('total_liquidations'),
+            liquidations_long=liquidation_column('long_liquidations'),
+            liquidations_short=liquidation_column('short_liquidations'),
+            open_interest=column('open_interest'),
+            open_interest_change=column('open_interest_change'),
+            records=list(data),
+        )
+    
+    def market_data(self, i: int) -> MarketData:
+        """MarketData for row i (the source object when available)"""
+        if self.records is not None:
+            return self.records[i]
+        liquidations = None
+        if not np.isnan(self.liquidations_total[i]):
+            liquidations = {
+                'total_liquidations': int(self.liquidations_total[i]),
+                'long_liquidations': int(self.liquidations_long[i]),
+                'short_liquidations': int(self.liquidations_short[i]),
+            }
+        return MarketData(
+            symbol=self.symbols[i],
+            timestamp=self.timestamp or datetime.now(),
+            price=float(self.price[i]),
+            volume_24h=float(self.volume_24h[i]),
+            volume_avg_7d=float(self.volume_avg_7d[i]),
+            open_interest=_none_if_nan(self.open_interest[i]),
+            open_interest_change=_none_if_nan(self.open_interest_change[i]),
+            funding_rate=_none_if_nan(self.funding_rate[i]),
+            ma_20=_none_if_nan(self.ma_20[i]),
+            ma_50=_none_if_nan(self.ma_50[i]),
+            ma_200=_none_if_nan(self.ma_200[i]),
+            high_24h=_none_if_nan(self.high_24h[i]),
+            low_24h=_none_if_nan(self.low_24h[i]),
+            liquidations=liquidations,
+        )
 
 
 @dataclass
@@ -47,6 +174,28 @@ class MarketAnalysis:
     key_levels: Dict[str, float] = field(default_factory=dict)
     trading_direction: str = ""
     market_data: Optional[MarketData] = None
+    timeframe_trends: Dict[str, Tuple[str, str]] = field(default_factory=dict)  # timeframe -> (trend, emoji)
+
+
+@dataclass
+class BatchAnalysis:
+    """Columnar analysis results for a MarketDataBatch"""
+    data: MarketDataBatch
+    trend: np.ndarray  # 'bullish', 'bearish', 'neutral'
+    trend_strong: np.ndarray  # price also beyond MA200
+    trend_known: np.ndarray  # False when MA20/MA50 are missing
+    volume_change_pct: np.ndarray
+    funding_rate_status: np.ndarray
+    volatility_status: np.ndarray
+    volume_spike: np.ndarray
+    funding_extreme: np.ndarray
+    oi_spike: np.ndarray
+    liquidation_risk: np.ndarray
+    
+    @property
+    def anomaly_mask(self) -> np.ndarray:
+        """Rows with at least one anomaly"""
+        return self.volume_spike | self.funding_extreme | self.oi_spike | self.liquidation_risk
 
 
 @dataclass
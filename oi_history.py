@@ -0,0 +1,84 @@
+"""Open interest history for OI spike detection"""
+import numpy as np
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class OIHistory:
+    """
+    Open interest samples for one symbol, bucketed into fixed-width time
+    slots of a ring buffer. The newest sample in a slot wins, memory is
+    bounded by the slot count, and looking up the value N slots back is O(1).
+    """
+
+    def __init__(self, resolution: int = 300, slots: int = 288):
+        self.resolution_ms = resolution * 1000
+        self.slots = slots
+        self._buckets = np.full(slots, -1, dtype=np.int64)  # bucket number held by each slot
+        self._values = np.full(slots, np.nan, dtype=np.float64)
+        self.latest_bucket: Optional[int] = None
+
+    def __len__(self) -> int:
+        if self.latest_bucket is None:
+            return 0
+        return int(np.count_nonzero(self._buckets > self.latest_bucket - self.slots))
+
+    def add(self, timestamp_ms: int, value: float):
+        """Record a sample; samples older than the buffer span are ignored"""
+        bucket = int(timestamp_ms) // self.resolution_ms
+        if self.latest_bucket is not None and bucket <= self.latest_bucket - self.slots:
+            return
+        index = bucket % self.slots
+        if bucket >= self._buckets[index]:
+            self._buckets[index] = bucket
+            self._values[index] = value
+        if self.latest_bucket is None or bucket > self.latest_bucket:
+            self.latest_bucket = bucket
+
+    def extend(self, samples: Iterable[Tuple[int, float]]):
+        """Record (timestamp_ms, value) samples"""
+        for timestamp_ms, value in samples:
+            self.add(timestamp_ms, value)
+
+    def _value_at(self, bucket: int) -> Optional[float]:
+        index = bucket % self.slots
+        if self._buckets[index] != bucket:
+            return None
+        return float(self._values[index])
+
+    @property
+    def latest(self) -> Optional[float]:
+        """Most recent open interest value"""
+        if self.latest_bucket is None:
+            return None
+        return self._value_at(self.latest_bucket)
+
+    def change(self, lookback: int) -> Optional[float]:
+        """
+        Fractional change of the latest value against the value `lookback`
+        seconds earlier, or None when that slot has no sample
+        """
+        if self.latest_bucket is None:
+            return None
+        steps = max(1, lookback * 1000 // self.resolution_ms)
+        if steps >= self.slots:
+            return None
+        past = self._value_at(self.latest_bucket - steps)
+        current = self.latest
+        if not past or current is None:
+            return None
+        return (current - past) / past
+
+
+class OIHistoryStore:
+    """Per-symbol open interest histories"""
+
+    def __init__(self, resolution: int = 300, slots: int = 288):
+        self.resolution = resolution
+        self.slots = slots
+        self._histories: Dict[str, OIHistory] = {}
+
+    def get(self, symbol: str) -> OIHistory:
+        """Get the history for a symbol, creating an empty one"""
+        if symbol not in self._histories:
+            self._histories[symbol] = OIHistory(self.resolution, self.slots)
+        return self._histories[symbol]
@@ -0,0 +1,198 @@
+"""Binance request-weight budget with priority dispatch"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Mapping, Optional, Tuple
+from metrics import RATE_LIMIT_WAIT, WEIGHT_USED
+import config
+
+
+def kline_weight(limit: Optional[int]) -> int:
+    """Weight of a USD-M klines request for a given limit"""
+    limit = limit or 500
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def request_weight(endpoint: str, params: Optional[Mapping] = None) -> int:
+    """
+    Request weight of an endpoint. Endpoints are the ccxt method names
+    used by DataCollector or raw REST paths.
+    """
+    params = params or {}
+    if endpoint == 'fetch_ohlcv':
+        return kline_weight(params.get('limit'))
+    if endpoint == '/fapi/v1/allForceOrders':
+        return config.REQUEST_WEIGHTS[endpoint] if params.get('symbol') else config.REQUEST_WEIGHTS['allForceOrders_all']
+    return config.REQUEST_WEIGHTS.get(endpoint, 1)
+
+
+def _normalize(symbol: str) -> str:
+    # 'BTC/USDT', 'BTC/USDT:USDT' and 'BTCUSDT' all name the same market
+    return symbol.split(':')[0].replace('/', '')
+
+
+class WeightBudget:
+    """
+    Weight used in the current one-minute window. Binance counts weight
+    per IP in fixed windows that reset on the minute.
+    """
+
+    def __init__(self, limit: int, window: int = 60):
+        self.limit = limit
+        self.window = window
+        self.window_start = 0.0
+        self.used = 0
+        self.blocked_until = 0.0
+
+    def _roll(self, now: float):
+        start = now - now % self.window
+        if start != self.window_start:
+            self.window_start = start
+            self.used = 0
+
+    def wait_time(self, weight: int, now: float) -> float:
+        """Seconds until a request of this weight may be sent"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._roll(now)
+        if self.used + min(weight, self.limit) <= self.limit:
+            return 0.0
+        return self.window_start + self.window - now
+
+    def consume(self, weight: int, now: float):
+        self._roll(now)
+        self.used += weight
+
+    def observe_used(self, used: int, now: float):
+        """Adopt the server's count for this window if it is higher than ours"""
+        self._roll(now)
+        self.used = max(self.used, used)
+
+    def block(self, seconds: float, now: float):
+        """Send nothing for `seconds` (after a 429/418)"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """
+    Dispatches requests within the per-minute weight budget. Requests
+    that do not fit wait in a priority queue: symbols on screen before
+    background ones, then by endpoint priority (price data first).
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, limit: int = int(config.BINANCE_WEIGHT_LIMIT * config.RATE_LIMIT_SAFETY)):
+        self.budget = WeightBudget(limit)
+        self._queue: List[Tuple[Tuple[int, int], int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._visible: Dict[str, float] = {}  # normalized symbol -> visible until
+        self._visible_lock = threading.Lock()
+        self.parts = 1  # processes sharing the IP's budget, see share()
+        self.stats = Counter()
+
+    def share(self, parts: int):
+        """
+        Keep to 1/parts of the budget, for one of `parts` processes sending
+        from the same IP. The server's used-weight count is IP-wide, so it
+        is split the same way when synced from response headers.
+        """
+        self.parts = max(1, parts)
+        self.budget.limit = max(1, self.budget.limit // self.parts)
+
+    def mark_visible(self, symbols: List[str], ttl: float = config.VISIBLE_SYMBOL_TTL):
+        """Give symbols foreground priority for the next `ttl` seconds (thread-safe)"""
+        until = time.monotonic() + ttl
+        with self._visible_lock:
+            for symbol in symbols:
+                self._visible[_normalize(symbol)] = until
+
+    def is_visible(self, symbol: Optional[str]) -> bool:
+        if not symbol:
+            return False
+        with self._visible_lock:
+            return self._visible.get(_normalize(symbol), 0.0) > time.monotonic()
+
+    def priority(self, endpoint: str, symbol: Optional[str] = None) -> Tuple[int, int]:
+        """Sort key: lower is dispatched first"""
+        return (0 if symbol is None or self.is_visible(symbol) else 1,
+                config.REQUEST_PRIORITIES.get(endpoint, max(config.REQUEST_PRIORITIES.values()) + 1))
+
+    async def acquire(self, endpoint: str, params: Optional[Mapping] = None, symbol: Optional[str] = None):
+        """Wait until the request may be sent, and charge its weight"""
+        weight = request_weight(endpoint, params)
+        self.stats['requests'] += 1
+        if not self._queue and self.budget.wait_time(weight, time.time()) == 0:
+            self._consume(weight)
+            return
+
+        self.stats['queued'] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (self.priority(endpoint, symbol), next(self._seq), weight, future))
+        self._notify()
+        with RATE_LIMIT_WAIT.time(source=endpoint):
+            # A cancelled waiter's entry is skipped by the dispatcher
+            await future
+
+    def _consume(self, weight: int):
+        self.budget.consume(weight, time.time())
+        WEIGHT_USED.set(self.budget.used)
+
+    def _notify(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while self._queue:
+            _, _, weight, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = self.budget.wait_time(weight, time.time())
+            if wait > 0:
+                # Wake early if a higher-priority request arrives
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._queue)
+            self._consume(weight)
+            future.set_result(None)
+
+    def observe_headers(self, headers: Optional[Mapping]):
+        """Sync the budget with the X-MBX-USED-WEIGHT-1M response header"""
+        if not headers:
+            return
+        used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('x-mbx-used-weight-1m')
+        if used is not None:
+            try:
+                self.budget.observe_used(int(used) // self.parts, time.time())
+                WEIGHT_USED.set(self.budget.used)
+            except ValueError:
+                pass
+
+    def backoff(self, headers: Optional[Mapping] = None):
+        """Pause all requests after a 429/418, for Retry-After seconds if given"""
+        self.stats['rate_limited'] += 1
+        retry_after = (headers or {}).get('Retry-After') or (headers or {}).get('retry-after')
+        try:
+            seconds = float(retry_after) if retry_after is not None else config.RATE_LIMIT_BACKOFF
+        except ValueError:
+            seconds = config.RATE_LIMIT_BACKOFF
+        print(f"⚠️ Rate limited by exchange, pausing requests for {seconds:g}s")
+        self.budget.block(seconds, time.time())
@@ -23,6 +23,11 @@ class ReportGenerator:
         # Trend
         report += f"**Xu hướng:** {analysis.trend_emoji} {analysis.trend_description}\n\n"
         
+        # Trend on each analyzed timeframe
+        if len(analysis.timeframe_trends) > 1:
+            timeframes = " | ".join(f"{tf} {emoji}" for tf, (_, emoji) in analysis.timeframe_trends.items())
+            report += f"**Đa khung thời gian:** {timeframes}\n\n"
+        
         # Volume
         volume_emoji = "📊" if abs(analysis.volume_change_pct) > 20 else "📈"
         volume_text = f"+{analysis.volume_change_pct:.1f}%" if analysis.volume_change_pct > 0 else f"{analysis.volume_change_pct:.1f}%"
@@ -0,0 +1,75 @@
+"""Incremental resampling of a base candle series into higher timeframes"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+UNIT_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000}
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """Length of a ccxt-style timeframe ('15m', '4h', '1d') in milliseconds"""
+    try:
+        return int(timeframe[:-1]) * UNIT_MS[timeframe[-1]]
+    except (KeyError, ValueError):
+        # Weeks and months do not start on epoch-aligned boundaries
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+
+class Resampler:
+    """
+    Folds base candles into one higher timeframe. Only the base candles of
+    the current bucket are kept, so each update re-aggregates at most one
+    bucket's worth of rows. Buckets are aligned to the epoch, as Binance's
+    are for minute, hour and day timeframes.
+    """
+
+    def __init__(self, base_timeframe: str, timeframe: str):
+        self.base_ms = timeframe_ms(base_timeframe)
+        self.bucket_ms = timeframe_ms(timeframe)
+        if self.bucket_ms % self.base_ms:
+            raise ValueError(f"{timeframe} is not a multiple of {base_timeframe}")
+        self.bucket_start: Optional[int] = None
+        self._rows: Dict[int, Sequence[float]] = {}  # base open time -> candle
+        self._dirty = False
+
+    def add(self, candles: Iterable[Sequence[float]]) -> List[List[float]]:
+        """
+        Apply new or updated base rows (in time order). Returns the
+        resampled rows of the buckets they changed, oldest first, in the
+        same ccxt layout. A bucket whose first base candle was never seen
+        is not emitted, so partial aggregates never overwrite native data.
+        """
+        changed = []
+        for candle in candles:
+            timestamp = int(candle[0])
+            bucket = timestamp - timestamp % self.bucket_ms
+            if self.bucket_start is not None and bucket < self.bucket_start:
+                continue
+            if bucket != self.bucket_start:
+                self._flush(changed)
+                self.bucket_start = bucket
+                self._rows = {}
+            self._rows[timestamp] = candle
+            self._dirty = True
+        self._flush(changed)
+        return changed
+
+    def _flush(self, changed: List[List[float]]):
+        if not self._dirty:
+            return
+        self._dirty = False
+        row = self.current()
+        if row is not None:
+            changed.append(row)
+
+    def current(self) -> Optional[List[float]]:
+        """Aggregate of the current bucket, or None if it is partial"""
+        if self.bucket_start is None or self.bucket_start not in self._rows:
+            return None
+        rows = [self._rows[t] for t in sorted(self._rows)]
+        return [
+            float(self.bucket_start),
+            float(rows[0][1]),
+            float(max(row[2] for row in rows)),
+            float(min(row[3] for row in rows)),
+            float(rows[-1][4]),
+            float(sum(row[5] for row in rows)),
+        ]
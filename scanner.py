@@ -0,0 +1,118 @@
+"""Full-universe market scanner: cheap bulk screening, deep analysis on the top candidates"""
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from models import MarketSnapshot
+import config
+
+
+@dataclass
+class ScanResult:
+    """Outcome of one scan"""
+    timestamp: datetime
+    screen: pd.DataFrame  # screening metrics for every symbol, best score first
+    candidates: List[str]
+    reports: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def _is_usdt_perpetual(market_id: str) -> bool:
+    # Perpetuals are keyed BASE/USDT:USDT; dated futures carry an expiry suffix
+    return market_id.endswith('/USDT:USDT')
+
+
+class MarketScanner:
+    """
+    Screens every USDT-M perpetual from one bulk ticker/funding snapshot,
+    ranks them by how unusual they look, and runs the full collect ->
+    analyze -> report pipeline only on the top candidates.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self._previous_volumes: Optional[pd.Series] = None
+        self._previous_timestamp: Optional[datetime] = None
+
+    @staticmethod
+    def universe(snapshot: MarketSnapshot) -> List[str]:
+        """All USDT-M perpetual symbols in the snapshot, as BASE/USDT"""
+        return sorted(key.split(':')[0] for key in snapshot.tickers if _is_usdt_perpetual(key))
+
+    def screen(self, snapshot: MarketSnapshot) -> pd.DataFrame:
+        """Screening metrics and score for every symbol with enough liquidity"""
+        rows = []
+        for key, ticker in snapshot.tickers.items():
+            if not _is_usdt_perpetual(key):
+                continue
+            funding = snapshot.funding_rates.get(key) or {}
+            rows.append({
+                'symbol': key.split(':')[0],
+                'price': ticker.get('last'),
+                'quote_volume': ticker.get('quoteVolume'),
+                'price_change_pct': ticker.get('percentage'),
+                'high': ticker.get('high'),
+                'low': ticker.get('low'),
+                'funding_rate': funding.get('fundingRate'),
+            })
+        columns = ['symbol', 'price', 'quote_volume', 'price_change_pct', 'range_pct',
+                   'funding_rate', 'volume_change_pct', 'funding_extreme', 'score']
+        if not rows:
+            return pd.DataFrame(columns=columns)
+
+        frame = pd.DataFrame(rows).set_index('symbol')
+        numeric = frame.apply(pd.to_numeric, errors='coerce')
+        frame = numeric[numeric['quote_volume'] >= config.SCANNER_MIN_QUOTE_VOLUME].copy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['range_pct'] = (frame['high'] - frame['low']) / frame['price'] * 100
+        # 24h volume against the previous scan; NaN on the first scan
+        if self._previous_volumes is not None and snapshot.timestamp != self._previous_timestamp:
+            previous = self._previous_volumes.reindex(frame.index)
+            frame['volume_change_pct'] = (frame['quote_volume'] - previous) / previous * 100
+        else:
+            frame['volume_change_pct'] = np.nan
+        if snapshot.timestamp != self._previous_timestamp:
+            self._previous_volumes = numeric['quote_volume']
+            self._previous_timestamp = snapshot.timestamp
+        frame['funding_extreme'] = frame['funding_rate'].abs() > config.FUNDING_RATE_THRESHOLD
+
+        # Score: mean percentile rank of each unusualness measure present
+        signals = pd.DataFrame({
+            'move': frame['price_change_pct'].abs(),
+            'range': frame['range_pct'],
+            'funding': frame['funding_rate'].abs(),
+            'volume': frame['volume_change_pct'].abs(),
+        })
+        frame['score'] = signals.rank(pct=True).mean(axis=1, skipna=True).fillna(0.0)
+
+        frame = frame.sort_values('score', ascending=False)
+        return frame.reset_index()[columns]
+
+    async def ascan(self, top_k: int = config.SCANNER_TOP_K, concurrency: Optional[int] = None) -> ScanResult:
+        """Screen the whole market and deep-analyze the top_k candidates (on the agent loop)"""
+        start = time.perf_counter()
+        collector = self.agent.data_collector
+        snapshot = collector.get_fresh_snapshot() or await collector.fetch_bulk_snapshot()
+        if snapshot is None:
+            return ScanResult(timestamp=datetime.now(), screen=self.screen(MarketSnapshot(datetime.now())),
+                              candidates=[], seconds=time.perf_counter() - start)
+
+        screen = self.screen(snapshot)
+        candidates = screen['symbol'].head(top_k).tolist()
+        reports = {}
+        async for symbol, report in self.agent.analyze_many(candidates, concurrency):
+            reports[symbol] = report
+        return ScanResult(timestamp=snapshot.timestamp, screen=screen, candidates=candidates,
+                          reports=reports, seconds=time.perf_counter() - start)
+
+    def scan(self, top_k: int = config.SCANNER_TOP_K, concurrency: Optional[int] = None) -> ScanResult:
+        """Blocking scan, for sync callers such as Streamlit"""
+        return self.agent._run(self.ascan(top_k, concurrency))
+
+
+def get_market_scanner(agent) -> MarketScanner:
+    """Factory function to get MarketScanner instance"""
+    return MarketScanner(agent)
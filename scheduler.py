@@ -0,0 +1,220 @@
+"""Background refresh of tracked symbols"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+import config
+
+
+class ReportStore:
+    """Thread-safe latest report per symbol, in the app's {'report', 'timestamp'} format"""
+
+    def __init__(self):
+        self._reports: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+    def subscribe(self, listener: Callable[[str, Dict], None]):
+        """Call listener(symbol, entry) after every publish, in the publishing thread"""
+        self._listeners.append(listener)
+
+    def publish(self, symbol: str, report: str, timestamp: Optional[datetime] = None):
+        entry = {'report': report, 'timestamp': timestamp or datetime.now()}
+        with self._lock:
+            self._reports[symbol] = entry
+        for listener in self._listeners:
+            listener(symbol, entry)
+
+    def latest(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Latest reports, optionally limited to some symbols"""
+        with self._lock:
+            if symbols is None:
+                return dict(self._reports)
+            return {s: self._reports[s] for s in symbols if s in self._reports}
+
+
+class SymbolLeases:
+    """
+    Symbols wanted by each owner (a UI session), with the interval it wants
+    them at. An owner's registration lapses unless renewed within `lease`
+    seconds, so sessions that go away without releasing are dropped.
+    Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, lease: float = config.SESSION_LEASE_TTL):
+        self.lease = lease
+        self._owners: Dict[Hashable, Dict[str, float]] = {}
+        self._expires: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __contains__(self, owner: Hashable) -> bool:
+        return owner in self._owners
+
+    def register(self, owner: Hashable, symbols: Iterable[str], interval: float = 0.0):
+        """Replace the owner's symbols and renew its lease"""
+        self._owners[owner] = {symbol: interval for symbol in symbols}
+        self.renew(owner)
+
+    def renew(self, owner: Hashable):
+        if owner in self._owners:
+            self._expires[owner] = time.monotonic() + self.lease
+
+    def release(self, owner: Hashable):
+        self._owners.pop(owner, None)
+        self._expires.pop(owner, None)
+
+    def expire(self) -> List[Hashable]:
+        """Release and return the owners whose lease lapsed"""
+        now = time.monotonic()
+        expired = [owner for owner, until in self._expires.items() if until <= now]
+        for owner in expired:
+            self.release(owner)
+        return expired
+
+    def wanted(self) -> Dict[str, float]:
+        """Every registered symbol and the shortest interval any owner wants it at"""
+        wanted: Dict[str, float] = {}
+        for symbols in self._owners.values():
+            for symbol, interval in symbols.items():
+                wanted[symbol] = min(interval, wanted.get(symbol, interval))
+        return wanted
+
+
+class RefreshScheduler:
+    """
+    Re-analyzes tracked symbols on their interval in the agent's event loop
+    and publishes the reports to a ReportStore, so readers never block on
+    a refresh. Symbols are tracked directly (track/untrack) or on behalf of
+    sessions (register/release), in which case a symbol stays tracked while
+    any session with a live lease wants it.
+    """
+
+    def __init__(self, agent, concurrency: Optional[int] = None, tick: float = config.SCHEDULER_TICK):
+        self.agent = agent
+        self.concurrency = concurrency
+        self.tick = tick
+        self.store = ReportStore()
+        self._intervals: Dict[str, float] = {}
+        self._next_due: Dict[str, float] = {}
+        self._running: set = set()
+        self._leases = SymbolLeases()
+        self._registered: Dict[str, float] = {}  # symbols tracked for sessions, at their shortest interval
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+
+    def _track(self, symbol: str, interval: float):
+        if symbol not in self._intervals:
+            self._next_due[symbol] = 0.0
+        elif interval < self._intervals[symbol]:
+            self._next_due[symbol] = min(self._next_due[symbol], time.monotonic() + interval)
+        self._intervals[symbol] = interval
+
+    def _untrack(self, symbol: str):
+        self._intervals.pop(symbol, None)
+        self._next_due.pop(symbol, None)
+
+    def track(self, symbols: Iterable[str], interval: float = config.REFRESH_INTERVAL):
+        """Refresh symbols every `interval` seconds (new symbols are due immediately)"""
+        with self._lock:
+            for symbol in symbols:
+                self._track(symbol, interval)
+
+    def untrack(self, symbols: Iterable[str]):
+        """Stop refreshing symbols (their last reports stay in the store)"""
+        with self._lock:
+            for symbol in symbols:
+                self._untrack(symbol)
+
+    def register(self, owner: Hashable, symbols: Iterable[str], interval: float = config.REFRESH_INTERVAL):
+        """Track symbols for a session, replacing what it registered before"""
+        with self._lock:
+            self._leases.register(owner, symbols, interval)
+            self._sync_registered()
+
+    def renew(self, owner: Hashable):
+        """Keep a session's registration alive for another lease period"""
+        with self._lock:
+            self._leases.renew(owner)
+
+    def release(self, owner: Hashable):
+        """Drop a session's symbols (those no other session wants are untracked)"""
+        with self._lock:
+            self._leases.release(owner)
+            self._sync_registered()
+
+    def _sync_registered(self):
+        """Track what sessions want now and untrack what only lapsed registrations wanted"""
+        wanted = self._leases.wanted()
+        for symbol in self._registered.keys() - wanted.keys():
+            self._untrack(symbol)
+        for symbol, interval in wanted.items():
+            if symbol in self._registered and interval > self._intervals.get(symbol, interval):
+                self._intervals[symbol] = interval  # the faster session left; slow down from the next run
+            else:
+                self._track(symbol, interval)
+        self._registered = wanted
+
+    @property
+    def tracked(self) -> Dict[str, float]:
+        """Tracked symbols and their intervals"""
+        with self._lock:
+            return dict(self._intervals)
+
+    def _due(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            if self._leases.expire():
+                self._sync_registered()
+            due = [s for s, t in self._next_due.items() if t <= now and s not in self._running]
+            for symbol in due:
+                # Schedule from the planned time so intervals do not drift
+                planned = self._next_due[symbol] or now
+                self._next_due[symbol] = max(planned + self._intervals[symbol], now)
+                self._running.add(symbol)
+        return due
+
+    async def _refresh(self, symbols: List[str]):
+        try:
+            # Due symbols come in small batches; decide on the bulk snapshot for
+            # everything tracked so one snapshot serves the whole cycle
+            await self.agent.prefetch_snapshot(list(self.tracked))
+            async for symbol, report in self.agent.analyze_many(symbols, self.concurrency):
+                self.store.publish(symbol, report)
+                self._running.discard(symbol)
+        except Exception as e:
+            print(f"❌ Error in background refresh: {e}")
+        finally:
+            self._running.difference_update(symbols)
+
+    async def _run(self):
+        tasks = set()
+        try:
+            while True:
+                due = self._due()
+                if due:
+                    task = asyncio.create_task(self._refresh(due))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                await asyncio.sleep(self.tick)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @property
+    def running(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def start(self):
+        """Start the scheduler on the agent loop (no-op if already running)"""
+        if not self.running:
+            self._future = asyncio.run_coroutine_threadsafe(self._run(), self.agent.loop)
+
+    def stop(self):
+        """Stop scheduling new refreshes"""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
@@ -0,0 +1,224 @@
+"""Multi-process sharded analysis with shared-memory columnar results"""
+import asyncio
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from models import MarketDataBatch, BatchAnalysis
+from market_analyzer import FUNDING_STATUSES, VOLATILITY_STATUSES
+from data_collector import DataCollector, get_data_collector
+import config
+
+
+TREND_CODES = ['bullish', 'bearish', 'neutral']
+
+# One float64 row per column in the shared block, one entry per symbol
+INPUT_COLUMNS = [
+    'price', 'volume_24h', 'volume_avg_7d', 'ma_20', 'ma_50', 'ma_200', 'funding_rate',
+    'high_24h', 'low_24h', 'liquidations_total', 'liquidations_long', 'liquidations_short',
+    'open_interest', 'open_interest_change',
+]
+RESULT_COLUMNS = [
+    'trend', 'trend_strong', 'trend_known', 'volume_change_pct', 'funding_rate_status',
+    'volatility_status', 'volume_spike', 'funding_extreme', 'oi_spike', 'liquidation_risk',
+]
+COLUMNS = INPUT_COLUMNS + RESULT_COLUMNS + ['ok']
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+
+@dataclass
+class ShardedResult:
+    """Analysis of all symbols, decoded from the shared block"""
+    analysis: BatchAnalysis
+    ok: np.ndarray  # False where collection failed (row values are NaN)
+    reports: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+# ---------------------------------------------------------------------------
+# Worker process side: each worker keeps its own collector and candle state
+# ---------------------------------------------------------------------------
+
+_worker: Dict = {}
+
+
+def _init_worker(collector_factory: Callable[[], DataCollector], workers: int):
+    from market_analyzer import get_market_analyzer
+    from report_generator import get_report_generator
+    _worker['loop'] = asyncio.new_event_loop()
+    _worker['collector'] = collector_factory()
+    # All workers send from one IP, so each keeps to its share of the weight limit
+    _worker['collector'].limiter.share(workers)
+    _worker['analyzer'] = get_market_analyzer()
+    _worker['report_generator'] = get_report_generator()
+
+
+def _encode(result: BatchAnalysis) -> Dict[str, np.ndarray]:
+    """Analysis columns as float64 codes"""
+    def codes(values: np.ndarray, labels: List[str]) -> np.ndarray:
+        lookup = {label: i for i, label in enumerate(labels)}
+        return np.array([lookup[value] for value in values], dtype=np.float64)
+
+    encoded = {name: getattr(result.data, name) for name in INPUT_COLUMNS}
+    encoded.update({
+        'trend': codes(result.trend, TREND_CODES),
+        'funding_rate_status': codes(result.funding_rate_status, FUNDING_STATUSES),
+        'volatility_status': codes(result.volatility_status, VOLATILITY_STATUSES),
+        'volume_change_pct': result.volume_change_pct,
+    })
+    for name in ('trend_strong', 'trend_known', 'volume_spike', 'funding_extreme', 'oi_spike', 'liquidation_risk'):
+        encoded[name] = getattr(result, name).astype(np.float64)
+    return encoded
+
+
+def _analyze_shard(symbols: List[str], rows: List[int], shm_name: str, total: int,
+                   concurrency: int, with_reports: bool) -> Dict[str, str]:
+    """Collect and analyze one shard, writing its columns into the shared block"""
+    collector = _worker['collector']
+    analyzer = _worker['analyzer']
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def collect(symbol: str):
+        async with semaphore:
+            try:
+                return await collector.collect_market_data(symbol)
+            except Exception as e:
+                print(f"❌ Error collecting data for {symbol}: {e}")
+                return None
+
+    async def collect_all():
+        return await asyncio.gather(*(collect(symbol) for symbol in symbols))
+
+    collected = _worker['loop'].run_until_complete(collect_all())
+    ok = [i for i, data in enumerate(collected) if data is not None]
+    reports = {}
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((len(COLUMNS), total), dtype=np.float64, buffer=shm.buf)
+        if ok:
+            result = analyzer.analyze_batch(MarketDataBatch.from_market_data([collected[i] for i in ok]))
+            targets = np.asarray(rows)[ok]
+            for name, values in _encode(result).items():
+                block[COLUMN_INDEX[name], targets] = values
+            block[COLUMN_INDEX['ok'], targets] = 1.0
+            if with_reports:
+                generator = _worker['report_generator']
+                reports = {a.symbol: generator.format_report(a) for a in analyzer.build_analyses(result)}
+        del block  # release the view before closing the mapping
+    finally:
+        shm.close()
+    return reports
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+class ShardedAnalyzer:
+    """
+    Partitions symbols across worker processes by a stable hash, so each
+    symbol's candle and indicator state stays in one worker, and each
+    worker's rate limiter gets 1/workers of the weight budget. Workers write
+    compact columnar results into one shared-memory block instead of
+    pickling dataclasses back to the parent.
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 collector_factory: Callable[[], DataCollector] = get_data_collector,
+                 concurrency: int = config.ANALYSIS_CONCURRENCY):
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrency = concurrency
+        # Spawned rather than forked: the parent may be running the agent loop and executor threads
+        context = multiprocessing.get_context('spawn')
+        # One single-process pool per shard keeps a symbol on the same worker
+        self._pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                initializer=_init_worker, initargs=(collector_factory, self.workers))
+            for _ in range(self.workers)
+        ]
+
+    def shard_of(self, symbol: str) -> int:
+        """Worker index for a symbol (stable across runs)"""
+        return zlib.crc32(symbol.encode()) % self.workers
+
+    def start(self):
+        """Spawn the worker processes ahead of the first analysis"""
+        for future in [pool.submit(os.getpid) for pool in self._pools]:
+            future.result()
+
+    def analyze(self, symbols: List[str], reports: bool = False) -> ShardedResult:
+        """Collect and analyze symbols across all workers"""
+        start = time.perf_counter()
+        total = len(symbols)
+        shards: Dict[int, List[int]] = {}
+        for row, symbol in enumerate(symbols):
+            shards.setdefault(self.shard_of(symbol), []).append(row)
+
+        shm = SharedMemory(create=True, size=max(len(COLUMNS) * total * 8, 1))
+        try:
+            block = np.ndarray((len(COLUMNS), total), dtype=np.float64, buffer=shm.buf)
+            block[:] = np.nan
+            block[COLUMN_INDEX['ok']] = 0.0
+
+            futures = [
+                self._pools[shard].submit(_analyze_shard, [symbols[r] for r in rows], rows, shm.name,
+                                          total, self.concurrency, reports)
+                for shard, rows in shards.items()
+            ]
+            all_reports = {}
+            for future in futures:
+                all_reports.update(future.result())
+
+            result = self._decode(symbols, block.copy())
+            del block
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return ShardedResult(analysis=result[0], ok=result[1], reports=all_reports,
+                             seconds=time.perf_counter() - start)
+
+    @staticmethod
+    def _decode(symbols: List[str], block: np.ndarray):
+        """BatchAnalysis and ok mask from the shared block"""
+        def column(name: str) -> np.ndarray:
+            return block[COLUMN_INDEX[name]]
+
+        def labels(name: str, values: List[str], fallback: int) -> np.ndarray:
+            codes = np.nan_to_num(column(name), nan=fallback).astype(np.intp)
+            return np.array(values, dtype=object)[codes]
+
+        def flags(name: str) -> np.ndarray:
+            return column(name) == 1.0
+
+        batch = MarketDataBatch(symbols=list(symbols), **{name: column(name) for name in INPUT_COLUMNS})
+        analysis = BatchAnalysis(
+            data=batch,
+            trend=labels('trend', TREND_CODES, TREND_CODES.index('neutral')),
+            trend_strong=flags('trend_strong'),
+            trend_known=flags('trend_known'),
+            volume_change_pct=column('volume_change_pct'),
+            funding_rate_status=labels('funding_rate_status', FUNDING_STATUSES, 0),
+            volatility_status=labels('volatility_status', VOLATILITY_STATUSES, 0),
+            volume_spike=flags('volume_spike'),
+            funding_extreme=flags('funding_extreme'),
+            oi_spike=flags('oi_spike'),
+            liquidation_risk=flags('liquidation_risk'),
+        )
+        return analysis, flags('ok')
+
+    def close(self):
+        """Shut down the worker processes"""
+        for pool in self._pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def get_sharded_analyzer(workers: Optional[int] = None) -> ShardedAnalyzer:
+    """Factory function to get ShardedAnalyzer instance"""
+    return ShardedAnalyzer(workers)
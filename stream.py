@@ -0,0 +1,233 @@
+"""Streaming market data over one multiplexed Binance futures WebSocket"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, TYPE_CHECKING
+from data_collector import DataCollector, liquidation_summary
+from metrics import STREAM_EVENTS, STREAM_LAG, STREAM_RECONNECTS
+import config
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+def _stream_symbol(symbol: str) -> str:
+    # 'BTC/USDT' and 'BTC/USDT:USDT' are streamed as 'btcusdt'
+    return symbol.split(':')[0].replace('/', '').lower()
+
+
+@dataclass
+class SymbolState:
+    """Latest streamed values for one symbol"""
+    mark_price: Optional[float] = None
+    funding_rate: Optional[float] = None
+    liquidations: Deque[str] = field(default_factory=lambda: deque(maxlen=config.STREAM_LIQUIDATION_HISTORY))
+    updated: float = 0.0  # time.time() of the last applied event
+    backfilled: bool = False  # REST backfill done since the last (re)connect
+    pending: List[List[float]] = field(default_factory=list)  # klines received during the backfill
+
+    def liquidation_summary(self) -> Dict[str, int]:
+        """Counts over the latest force orders, in the fetch_liquidations format"""
+        return liquidation_summary(self.liquidations)
+
+
+class MarketStream:
+    """
+    Keeps one multiplexed WebSocket subscribed to the kline, markPrice and
+    forceOrder streams of every tracked symbol and applies each event to the
+    collector's candle buffers and to per-symbol state as it arrives. After
+    every (re)connect the streams are resubscribed and candles and force
+    orders missed while disconnected are backfilled over REST. Symbols
+    beyond the per-connection stream limit are left to REST polling.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, collector: DataCollector, url: str = config.BINANCE_WS_URL):
+        self.collector = collector
+        self.url = url
+        self.states: Dict[str, SymbolState] = {}
+        self._symbols: Dict[str, str] = {}  # stream symbol -> tracked symbol
+        self._ws: Optional['aiohttp.ClientWebSocketResponse'] = None
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+        self._backfills: set = set()
+        self.stats = Counter()
+
+    @staticmethod
+    def streams(symbol: str) -> List[str]:
+        """Stream names subscribed for a symbol"""
+        name = _stream_symbol(symbol)
+        return [f"{name}@kline_{config.BASE_TIMEFRAME}", f"{name}@markPrice@1s", f"{name}@forceOrder"]
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    @property
+    def tracked(self) -> List[str]:
+        return list(self.states)
+
+    def live_state(self, symbol: str) -> Optional[SymbolState]:
+        """The symbol's state if it is streaming and backfilled, else None (poll instead)"""
+        state = self.states.get(symbol)
+        if state is None or not state.backfilled or not self.connected:
+            return None
+        return state
+
+    async def track(self, symbols: Iterable[str]) -> List[str]:
+        """
+        Subscribe to symbols not yet tracked and backfill them. Symbols that
+        do not fit in the connection's STREAM_MAX_STREAMS are not tracked
+        (they keep being polled over REST) and are returned.
+        """
+        new = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.states]
+        if not new:
+            return []
+        free = max(0, config.STREAM_MAX_STREAMS // len(self.streams(new[0])) - len(self.states))
+        new, rejected = new[:free], new[free:]
+        if rejected:
+            print(f"⚠️ {len(rejected)} symbols exceed {config.STREAM_MAX_STREAMS} streams per connection, polling them instead")
+        for symbol in new:
+            self.states[symbol] = SymbolState()
+            self._symbols[_stream_symbol(symbol)] = symbol
+        if new and self.connected:
+            await self._send('SUBSCRIBE', [name for symbol in new for name in self.streams(symbol)])
+            self._start_backfill(new)
+        return rejected
+
+    async def untrack(self, symbols: Iterable[str]):
+        """Unsubscribe from symbols (their candle buffers are kept)"""
+        removed = [symbol for symbol in symbols if symbol in self.states]
+        for symbol in removed:
+            del self.states[symbol]
+            self._symbols.pop(_stream_symbol(symbol), None)
+        if removed and self.connected:
+            await self._send('UNSUBSCRIBE', [name for symbol in removed for name in self.streams(symbol)])
+
+    async def _send(self, method: str, params: List[str]):
+        await self._ws.send_str(json.dumps({'method': method, 'params': params, 'id': next(self._ids)}))
+
+    def _start_backfill(self, symbols: List[str]):
+        task = asyncio.get_running_loop().create_task(self._backfill(symbols))
+        self._backfills.add(task)
+        task.add_done_callback(self._backfills.discard)
+
+    async def _backfill(self, symbols: List[str]):
+        """Fill the gap since the last candle over REST, then apply klines queued meanwhile"""
+        async def backfill(symbol: str):
+            delay = config.STREAM_RECONNECT_MIN
+            orders = None
+            while symbol in self.states:
+                try:
+                    await self.collector.refresh_timeframes(symbol)
+                    orders = await self.collector.fetch_force_orders(symbol)
+                    break
+                except Exception as e:
+                    print(f"Error backfilling {symbol}: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, config.STREAM_RECONNECT_MAX)
+            state = self.states.get(symbol)
+            if state is None:
+                return
+            if orders is not None:
+                state.liquidations.clear()
+                state.liquidations.extend(order['side'] for order in orders)
+            self.collector.apply_base_candles(symbol, state.pending)
+            state.pending.clear()
+            state.updated = time.time()
+            state.backfilled = True
+            self.stats['backfills'] += 1
+
+        await asyncio.gather(*(backfill(symbol) for symbol in symbols))
+
+    def _handle(self, message: Dict):
+        data = message.get('data', message)
+        event = data.get('e')
+        if event == 'forceOrder':
+            data = dict(data['o'], E=data.get('E'))
+            symbol = self._symbols.get(data['s'].lower())
+        elif event in ('kline', 'markPriceUpdate'):
+            symbol = self._symbols.get(data['s'].lower())
+        else:
+            if 'error' in message:
+                print(f"Stream error: {message['error']}")
+            return
+        state = self.states.get(symbol) if symbol else None
+        if state is None:
+            return  # unsubscribed while the event was in flight
+
+        if event == 'kline':
+            k = data['k']
+            row = [float(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+            if state.backfilled:
+                self.collector.apply_base_candles(symbol, [row])
+            else:
+                state.pending.append(row)
+        elif event == 'markPriceUpdate':
+            state.mark_price = float(data['p'])
+            if data.get('r') not in (None, ''):
+                state.funding_rate = float(data['r'])
+        else:
+            state.liquidations.append(data['S'])
+
+        state.updated = time.time()
+        STREAM_EVENTS.inc(event=event)
+        if data.get('E'):
+            STREAM_LAG.observe(max(0.0, state.updated - data['E'] / 1000))
+
+    async def run(self):
+        """Connect, subscribe and apply events until cancelled, reconnecting on failure"""
+        import aiohttp
+        delay = config.STREAM_RECONNECT_MIN
+        while True:
+            try:
+                session = self.collector._get_session()
+                async with session.ws_connect(f"{self.url}/stream", heartbeat=config.STREAM_HEARTBEAT) as ws:
+                    self._ws = ws
+                    delay = config.STREAM_RECONNECT_MIN
+                    # Resubscribe everything; candles are polled no more until backfilled
+                    for state in self.states.values():
+                        state.backfilled = False
+                        state.pending.clear()
+                    if self.states:
+                        await self._send('SUBSCRIBE', [name for symbol in self.states for name in self.streams(symbol)])
+                        self._start_backfill(list(self.states))
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            self._handle(json.loads(message.data))
+                        elif message.type == aiohttp.WSMsgType.ERROR:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream connection error: {e}")
+            finally:
+                self._ws = None
+                for task in list(self._backfills):
+                    task.cancel()
+            self.stats['disconnects'] += 1
+            STREAM_RECONNECTS.inc()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, config.STREAM_RECONNECT_MAX)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start streaming on the running loop (no-op if already running)"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """Close the connection and stop reconnecting"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,123 @@
+"""AnalysisService over the aiohttp test client, on a fake exchange"""
+import json
+from aiohttp.test_utils import TestClient, TestServer
+import config
+from agent import CryptoAnalysisAgent
+from api import AnalysisService
+from fake_exchange import FakeBinanceServer, FakeExchange
+from rate_limiter import RateLimiter
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+
+
+def run_with_service(monkeypatch, test):
+    """Run test(service, client, exchange, server) on the agent loop once every symbol is analyzed"""
+    monkeypatch.setattr(config, 'HISTORY_ENABLED', False)
+    agent = CryptoAnalysisAgent()
+    server = FakeBinanceServer()
+    service = AnalysisService(agent, interval=3600)  # no refresh during the test
+    
+    async def main():
+        monkeypatch.setattr(config, 'BINANCE_FAPI_URL', await server.start())
+        exchange = agent.data_collector.exchange = FakeExchange(SYMBOLS)
+        agent.data_collector.limiter = RateLimiter(limit=10 ** 12)
+        service.track(SYMBOLS)
+        service.scheduler.start()
+        client = TestClient(TestServer(service.build_app()))
+        await client.start_server()
+        try:
+            await service.wait_ready(SYMBOLS, timeout=30)
+            await test(service, client, exchange, server)
+        finally:
+            await service.stop()
+            await client.close()
+            await server.stop()
+    
+    try:
+        agent._run(main())
+    finally:
+        agent.close()
+
+
+def test_etag_gives_304(monkeypatch):
+    async def test(service, client, exchange, server):
+        response = await client.get('/analysis/btc-usdt')
+        assert response.status == 200
+        etag = response.headers['ETag']
+        assert etag == service.snapshots['BTC/USDT'].etag
+        assert (await response.json())['symbol'] == 'BTC/USDT'
+        
+        response = await client.get('/analysis/BTC/USDT', headers={'If-None-Match': etag})
+        assert response.status == 304 and await response.read() == b''
+        response = await client.get('/analysis/BTC/USDT', headers={'If-None-Match': '"stale"'})
+        assert response.status == 200
+    
+    run_with_service(monkeypatch, test)
+
+
+def test_batch_endpoint(monkeypatch):
+    async def test(service, client, exchange, server):
+        response = await client.get('/analysis', params={'symbols': 'BTC/USDT,eth-usdt'})
+        assert response.status == 200
+        batch = await response.json()
+        assert list(batch) == SYMBOLS
+        assert all(batch[symbol] == json.loads(service.snapshots[symbol].body) for symbol in SYMBOLS)
+        
+        posted = await client.post('/analysis', json={'symbols': SYMBOLS})
+        assert await posted.read() == await response.read()
+        assert posted.headers['ETag'] == response.headers['ETag']
+        
+        response = await client.get('/analysis', params={'symbols': ','.join(SYMBOLS)},
+                                    headers={'If-None-Match': response.headers['ETag']})
+        assert response.status == 304
+        assert (await client.post('/analysis', json={'wrong': []})).status == 400
+        assert (await client.get('/analysis')).status == 400
+    
+    run_with_service(monkeypatch, test)
+
+
+def test_events_push_each_publish(monkeypatch):
+    async def test(service, client, exchange, server):
+        response = await client.get('/events', params={'symbols': 'BTC/USDT'})
+        assert response.headers['Content-Type'] == 'text/event-stream'
+        
+        async def next_event() -> dict:
+            event = {}
+            while True:
+                line = (await response.content.readline()).decode().rstrip('\n')
+                if not line:
+                    return event
+                if not line.startswith(':'):
+                    name, _, value = line.partition(': ')
+                    event[name] = value
+        
+        first = await next_event()
+        assert first['event'] == 'analysis' and first['id'] == service.snapshots['BTC/USDT'].etag
+        
+        # A new analysis of the symbol is published by the scheduler
+        agent = service.agent
+        agent.incremental.forget('BTC/USDT')
+        exchange.tick('BTC/USDT')
+        data = await agent.data_collector.collect_market_data('BTC/USDT')
+        analysis, _ = agent.incremental.analyze(data)
+        service.scheduler.store.publish('BTC/USDT', agent.incremental.report(analysis))
+        
+        pushed = await next_event()
+        assert pushed['id'] == service.snapshots['BTC/USDT'].etag != first['id']
+        assert json.loads(pushed['data'])['symbol'] == 'BTC/USDT'
+        response.close()
+    
+    run_with_service(monkeypatch, test)
+
+
+def test_requests_make_no_exchange_calls(monkeypatch):
+    async def test(service, client, exchange, server):
+        calls = sum(exchange.calls.values()) + server.requests
+        etag = service.snapshots['ETH/USDT'].etag
+        for _ in range(20):
+            assert (await client.get('/analysis/BTC/USDT')).status == 200
+            assert (await client.get('/analysis/ETH/USDT', headers={'If-None-Match': etag})).status == 304
+            assert (await client.post('/analysis', json={'symbols': SYMBOLS})).status == 200
+        assert sum(exchange.calls.values()) + server.requests == calls
+    
+    run_with_service(monkeypatch, test)
@@ -0,0 +1,110 @@
+"""ReplayEngine must reproduce analyze_market bar by bar"""
+import bisect
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from backtest import ReplayEngine
+from indicators import IndicatorEngine
+from market_analyzer import MarketAnalyzer, TREND_INSUFFICIENT
+from models import MarketData
+import config
+
+
+HOUR = 3_600_000
+BARS = 400
+
+
+def fixed_history():
+    """Hourly candles through an uptrend, a selloff and a range, with 8h funding and 5m OI"""
+    rng = np.random.default_rng(7)
+    steps = np.concatenate([rng.normal(0.004, 0.01, 150), rng.normal(-0.006, 0.012, 120),
+                            rng.normal(0, 0.008, BARS - 270)])
+    close = 100 * np.exp(np.cumsum(steps))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    ohlcv = pd.DataFrame({
+        'timestamp': np.arange(BARS, dtype=np.int64) * HOUR,
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, BARS)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, BARS)),
+        'close': close,
+        'volume': rng.uniform(500, 1500, BARS) * rng.choice([1, 1, 1, 1, 4], BARS),
+    })
+    # No funding before the first sample, then some readings past the threshold
+    funding_times = np.arange(3, BARS + 8, 8) * HOUR
+    funding = pd.DataFrame({'timestamp': funding_times,
+                            'fundingRate': rng.normal(0, 0.008, len(funding_times))})
+    oi_times = np.arange(10 * HOUR, (BARS + 1) * HOUR, 300_000)
+    oi_steps = rng.normal(0, 0.01, len(oi_times))
+    oi_steps[::97] += 0.2  # occasional jumps past OI_SPIKE_THRESHOLD
+    open_interest = pd.DataFrame({'timestamp': oi_times,
+                                  'openInterestAmount': 1e5 * np.exp(np.cumsum(oi_steps))})
+    return ohlcv, funding, open_interest
+
+
+def as_of(timestamps, values, at):
+    index = bisect.bisect_right(timestamps, at) - 1
+    return float(values[index]) if index >= 0 else None
+
+
+def live_market_data(ohlcv, funding, open_interest):
+    """Per-bar MarketData built the live way: indicator engine plus as-of funding and OI"""
+    indicators = IndicatorEngine({'close': config.MA_PERIODS, 'volume': [config.VOLUME_LOOKBACK * 24]},
+                                 {'volume': 1})
+    funding_times, funding_rates = list(funding['timestamp']), funding['fundingRate'].to_numpy()
+    oi_times, oi_values = list(open_interest['timestamp']), open_interest['openInterestAmount'].to_numpy()
+    rows = ohlcv.to_numpy()
+    for i, row in enumerate(rows):
+        indicators.update([row])
+        closes_at = int(row[0]) + HOUR
+        day = rows[max(0, i - 23):i + 1]
+        oi = as_of(oi_times, oi_values, closes_at)
+        oi_past = as_of(oi_times, oi_values, closes_at - config.OI_SPIKE_LOOKBACK * 1000)
+        yield MarketData(
+            symbol="TEST/USDT",
+            timestamp=datetime.fromtimestamp(closes_at / 1000),
+            price=float(row[4]),
+            volume_24h=float(day[:, 5].sum()),
+            volume_avg_7d=indicators.mean('volume', config.VOLUME_LOOKBACK * 24),
+            open_interest=oi,
+            open_interest_change=(oi - oi_past) / oi_past if oi and oi_past else None,
+            funding_rate=as_of(funding_times, funding_rates, closes_at),
+            **{f'ma_{period}': indicators.mean('close', period) for period in config.MA_PERIODS},
+            high_24h=float(day[:, 2].max()),
+            low_24h=float(day[:, 3].min()),
+        )
+
+
+def test_replay_matches_analyze_market():
+    ohlcv, funding, open_interest = fixed_history()
+    engine = ReplayEngine()
+    analyzer = MarketAnalyzer()
+    
+    signals = engine.replay("TEST/USDT", ohlcv, funding, open_interest)
+    replayed = analyzer.build_analyses(
+        analyzer.analyze_batch(engine.build_batch("TEST/USDT", ohlcv, funding, open_interest)))
+    
+    assert len(signals) == len(replayed) == BARS
+    seen = {'trends': set(), 'anomalies': set()}
+    for i, data in enumerate(live_market_data(ohlcv, funding, open_interest)):
+        live = analyzer.analyze_market(data)
+        row = signals.iloc[i]
+        
+        trend = 'unknown' if live.trend_description == TREND_INSUFFICIENT[2] else live.trend
+        assert row['trend'] == trend, i
+        assert replayed[i].trend_description == live.trend_description, i
+        
+        anomalies = {a.type for a in live.anomalies}
+        flagged = {name for name in ('volume_spike', 'funding_extreme', 'oi_spike') if row[name]}
+        assert flagged == anomalies, i
+        assert [(a.type, a.severity) for a in replayed[i].anomalies] == \
+               [(a.type, a.severity) for a in live.anomalies], i
+        
+        assert row['funding_rate_status'] == live.funding_rate_status, i
+        assert row['volatility_status'] == live.volatility_status, i
+        assert replayed[i].trading_direction == live.trading_direction, i
+        seen['trends'].add(trend)
+        seen['anomalies'] |= anomalies
+    
+    # The fixture must exercise every label being compared
+    assert seen['trends'] == {'bullish', 'bearish', 'neutral', 'unknown'}
+    assert seen['anomalies'] == {'volume_spike', 'funding_extreme', 'oi_spike'}
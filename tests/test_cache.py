@@ -0,0 +1,166 @@
+"""SingleFlight cancellation/error semantics and TTLCache stale-while-revalidate"""
+import asyncio
+from cache import SingleFlight, TTLCache, cached, coalesced
+
+
+class Fetch:
+    """A fetch that blocks until released, counting its calls"""
+
+    def __init__(self, value='fresh'):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_waiter_leaves_shared_task_running():
+    async def main():
+        flight, fetch = SingleFlight(), Fetch()
+        first = asyncio.create_task(flight.do('k', fetch))
+        second = asyncio.create_task(flight.do('k', fetch))
+        await settle()
+        
+        first.cancel()
+        await settle()
+        assert first.cancelled()
+        assert 'k' in flight and not fetch.cancelled
+        
+        fetch.release.set()
+        assert await second == 'fresh'
+        assert fetch.calls == 1
+    
+    asyncio.run(main())
+
+
+def test_last_waiter_cancelling_cancels_shared_task():
+    async def main():
+        flight, fetch = SingleFlight(), Fetch()
+        waiters = [asyncio.create_task(flight.do('k', fetch)) for _ in range(2)]
+        await settle()
+        
+        for waiter in waiters:
+            waiter.cancel()
+        await settle()
+        
+        assert fetch.cancelled
+        assert 'k' not in flight
+        # A later caller starts afresh instead of joining the cancelled task
+        retry = Fetch('again')
+        retry.release.set()
+        assert await flight.do('k', retry) == 'again'
+    
+    asyncio.run(main())
+
+
+def test_exception_reaches_every_waiter_and_is_not_cached():
+    async def main():
+        cache, fetch = TTLCache(), Fetch(RuntimeError("exchange down"))
+        waiters = [asyncio.create_task(cache.get_or_fetch(('ohlcv', 'BTC'), 10, fetch)) for _ in range(3)]
+        await settle()
+        fetch.release.set()
+        
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert fetch.calls == 1
+        assert len(cache) == 0
+        
+        fetch.value = 'recovered'
+        assert await cache.get_or_fetch(('ohlcv', 'BTC'), 10, fetch) == 'recovered'
+        assert fetch.calls == 2
+    
+    asyncio.run(main())
+
+
+def test_stale_value_served_while_refresh_runs(monkeypatch):
+    async def main():
+        clock = [1000.0]
+        monkeypatch.setattr('cache.time.monotonic', lambda: clock[0])
+        cache, key = TTLCache(stale_factor=2.0), ('ticker', 'BTC')
+        first = Fetch('old')
+        first.release.set()
+        assert await cache.get_or_fetch(key, 10, first) == 'old'
+        
+        clock[0] += 15  # past the TTL, within TTL * stale_factor
+        refresh = Fetch('new')
+        assert await cache.get_or_fetch(key, 10, refresh) == 'old'
+        await settle()
+        assert refresh.calls == 1 and key in cache.inflight
+        # Further reads keep getting the old value without a second refresh
+        assert await cache.get_or_fetch(key, 10, refresh) == 'old'
+        assert refresh.calls == 1
+        
+        refresh.release.set()
+        await settle()
+        assert await cache.get_or_fetch(key, 10, refresh) == 'new'
+        assert cache.stats['ticker']['stale_hits'] == 2
+    
+    asyncio.run(main())
+
+
+def test_entry_past_stale_window_is_refetched(monkeypatch):
+    async def main():
+        clock = [1000.0]
+        monkeypatch.setattr('cache.time.monotonic', lambda: clock[0])
+        cache, key = TTLCache(stale_factor=2.0), ('ticker', 'BTC')
+        fetch = Fetch('old')
+        fetch.release.set()
+        await cache.get_or_fetch(key, 10, fetch)
+        
+        clock[0] += 25
+        fetch.value = 'new'
+        assert await cache.get_or_fetch(key, 10, fetch) == 'new'
+        assert cache.stats['ticker']['misses'] == 2
+    
+    asyncio.run(main())
+
+
+class Collector:
+    """Two cached methods sharing a source, like update_candles / update_timeframes"""
+
+    def __init__(self):
+        self.cache = TTLCache()
+
+    @cached('ohlcv')
+    async def candles(self, symbol: str):
+        return 'candles', symbol
+
+    @cached('ohlcv')
+    async def timeframes(self, symbol: str):
+        return 'timeframes', symbol
+
+    @coalesced('ohlcv')
+    async def seed(self, symbol: str):
+        await asyncio.sleep(0)
+        return 'seed', symbol
+
+
+def test_methods_sharing_a_source_get_their_own_entries():
+    async def main():
+        collector = Collector()
+        assert await collector.candles('BTC') == ('candles', 'BTC')
+        assert await collector.timeframes('BTC') == ('timeframes', 'BTC')
+        assert await collector.candles('BTC') == ('candles', 'BTC')
+        assert collector.cache.stats['ohlcv']['hits'] == 1
+        
+        # In-flight calls are not shared across methods either
+        collector.cache.invalidate('ohlcv')
+        seeded, candles = await asyncio.gather(collector.seed('BTC'), collector.candles('BTC'))
+        assert seeded == ('seed', 'BTC') and candles == ('candles', 'BTC')
+    
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""Daemon output: JSON lines on stdout, diagnostics on stderr"""
+import contextlib
+import io
+import json
+from daemon import DiagnosticsStream, JsonLinesWriter
+
+
+def run_cycle(verbose: bool):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    writer = JsonLinesWriter(stream=stdout)
+    with contextlib.redirect_stdout(DiagnosticsStream(stderr, verbose)):
+        print("📊 Collecting data for BTC/USDT...")
+        print("Timeout fetching ticker for BTC/USDT after 5s")
+        print("⚠️ Rate limited by exchange, pausing requests for 60s")
+        writer.write({'symbol': 'BTC/USDT', 'price': 1.0})
+        print("✅ Report generated for BTC/USDT")
+    writer.close()
+    return stdout.getvalue(), stderr.getvalue()
+
+
+def test_diagnostics_go_to_stderr_and_stdout_has_only_json():
+    stdout, stderr = run_cycle(verbose=False)
+    assert [json.loads(line) for line in stdout.splitlines()] == [{'symbol': 'BTC/USDT', 'price': 1.0}]
+    assert stderr.splitlines() == ["Timeout fetching ticker for BTC/USDT after 5s",
+                                   "⚠️ Rate limited by exchange, pausing requests for 60s"]
+
+
+def test_verbose_adds_progress():
+    stdout, stderr = run_cycle(verbose=True)
+    assert len(stdout.splitlines()) == 1
+    assert stderr.splitlines()[0] == "📊 Collecting data for BTC/USDT..."
+    assert len(stderr.splitlines()) == 4
@@ -0,0 +1,43 @@
+"""HistoryStore: incremental vacuum and idempotent writes"""
+from datetime import datetime, timedelta
+from history import HistoryStore
+from market_analyzer import MarketAnalyzer
+from models import MarketData
+
+
+def analysis(timestamp: datetime, symbol: str = "BTC/USDT"):
+    data = MarketData(symbol=symbol, timestamp=timestamp, price=100.0, volume_24h=5000.0, volume_avg_7d=1000.0,
+                      funding_rate=0.05, open_interest_change=0.5)
+    result = MarketAnalyzer().analyze_market(data)
+    result.timestamp = timestamp
+    return result
+
+
+def test_new_file_compacts_incrementally(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'), retention_days=1)
+    conn = store._connection()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    
+    start = datetime(2026, 1, 1)
+    store.write(analysis(start + timedelta(minutes=i), f"SYM{i % 50}/USDT") for i in range(5000))
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    store.compact(now=start + timedelta(days=10))
+    
+    assert conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0] == 0
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert conn.execute("PRAGMA page_count").fetchone()[0] < pages
+
+
+def test_rewritten_analysis_adds_no_duplicate_anomalies(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'), retention_days=0)
+    recorded = analysis(datetime(2026, 1, 1))
+    assert len(recorded.anomalies) == 3
+    
+    store.write([recorded])
+    store.write([recorded])
+    
+    conn = store._connection()
+    assert conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM anomalies").fetchone()[0] == 3
+
@@ -0,0 +1,68 @@
+"""DataCollector's pooled aiohttp session against the local stand-in server"""
+import asyncio
+import config
+from data_collector import DataCollector
+from fake_exchange import FakeBinanceServer
+
+
+def run_with_server(monkeypatch, test):
+    async def main():
+        server = FakeBinanceServer()
+        monkeypatch.setattr(config, 'BINANCE_FAPI_URL', await server.start())
+        collector = DataCollector()
+        try:
+            await test(collector, server)
+        finally:
+            await collector.close()
+            await server.stop()
+    
+    asyncio.run(main())
+
+
+def test_one_session_is_reused_across_requests(monkeypatch):
+    async def test(collector, server):
+        await collector.fetch_liquidations('BTC/USDT')
+        session = collector.session
+        await collector._get_json('/fapi/v1/allForceOrders', {'symbol': 'ETHUSDT'})
+        await collector.fetch_liquidations('SOL/USDT')
+        
+        assert collector.session is session
+        assert server.requests == 3
+        assert len(server.peers) == 1  # sequential requests share one keep-alive connection
+    
+    run_with_server(monkeypatch, test)
+
+
+def test_pool_limits_come_from_config(monkeypatch):
+    monkeypatch.setattr(config, 'HTTP_POOL_SIZE', 7)
+    monkeypatch.setattr(config, 'HTTP_POOL_PER_HOST', 3)
+    
+    async def test(collector, server):
+        connector = collector._get_session().connector
+        assert connector.limit == 7
+        assert connector.limit_per_host == 3
+        
+        # No more than the per-host limit of connections are opened at once
+        await asyncio.gather(*(collector._get_json('/fapi/v1/allForceOrders', {'symbol': f'S{i}USDT'})
+                               for i in range(12)))
+        assert server.requests == 12
+        assert len(server.peers) <= 3
+    
+    run_with_server(monkeypatch, test)
+
+
+def test_close_releases_connector_and_session_is_recreated(monkeypatch):
+    async def test(collector, server):
+        await collector._get_json('/fapi/v1/allForceOrders', {'symbol': 'BTCUSDT'})
+        session = collector.session
+        connector = session.connector
+        
+        await collector.close()
+        assert session.closed and connector.closed
+        assert collector.session is None
+        
+        assert await collector._get_json('/fapi/v1/allForceOrders', {'symbol': 'BTCUSDT'}) is not None
+        assert collector.session is not session and not collector.session.closed
+        assert len(server.peers) == 2  # a new connection from the new pool
+    
+    run_with_server(monkeypatch, test)
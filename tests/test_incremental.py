@@ -0,0 +1,48 @@
+"""IncrementalAnalyzer reuse / full re-analysis decisions"""
+import dataclasses
+from datetime import datetime
+from incremental import IncrementalAnalyzer
+from market_analyzer import MarketAnalyzer
+from models import MarketData
+from report_generator import ReportGenerator
+
+
+def make_incremental() -> IncrementalAnalyzer:
+    return IncrementalAnalyzer(MarketAnalyzer(), ReportGenerator(),
+                               {'price': 0.001, 'volume_24h': 0.01, 'funding_rate': 0.02})
+
+
+DATA = MarketData(symbol="BTC/USDT", timestamp=datetime(2026, 1, 1), price=100.0, volume_24h=1000.0,
+                  volume_avg_7d=900.0, funding_rate=0.0001, ma_20=98.0, ma_50=95.0, candle_time=0)
+
+
+def test_small_moves_reuse_analysis_and_report():
+    incremental = make_incremental()
+    first, changed = incremental.analyze(DATA)
+    report = incremental.report(first)
+    assert changed
+    
+    analysis, changed = incremental.analyze(dataclasses.replace(DATA, price=100.05, ma_20=98.01))
+    assert analysis is first and changed == set()
+    assert incremental.report(analysis) is report
+
+
+def test_move_past_threshold_reanalyzes():
+    incremental = make_incremental()
+    first, _ = incremental.analyze(DATA)
+    
+    analysis, changed = incremental.analyze(dataclasses.replace(DATA, price=101.0))
+    assert analysis is not first and changed == {'price'}
+    assert analysis.market_data.price == 101.0
+
+
+def test_new_field_value_and_new_candle_reanalyze():
+    incremental = make_incremental()
+    first, _ = incremental.analyze(DATA)
+    
+    # No threshold: any change counts, including a reading appearing
+    second, changed = incremental.analyze(dataclasses.replace(DATA, open_interest_change=0.01))
+    assert second is not first and changed == {'open_interest_change'}
+    
+    third, _ = incremental.analyze(dataclasses.replace(DATA, open_interest_change=0.01, candle_time=3_600_000))
+    assert third is not second
@@ -0,0 +1,69 @@
+"""IndicatorEngine / RollingMean against pandas' rolling mean"""
+import random
+import pandas as pd
+from indicators import IndicatorEngine, RollingMean
+
+
+def make_candles(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    price = 100.0
+    candles = []
+    for i in range(count):
+        price *= 1 + rng.uniform(-0.01, 0.01)
+        candles.append([i * 60_000, price, price * 1.002, price * 0.998, price, rng.uniform(10, 1000)])
+    return candles
+
+
+def pandas_mean(values, window: int, min_periods=None):
+    result = pd.Series(values, dtype=float).rolling(window, min_periods=min_periods).mean().iloc[-1]
+    return None if pd.isna(result) else result
+
+
+def test_rolling_mean_matches_pandas_through_rollover():
+    values = [c[4] for c in make_candles(200)]
+    rolling = RollingMean(20)
+    for i, value in enumerate(values):
+        rolling.push(value)
+        assert rolling.value == pandas_mean(values[:i + 1], 20)
+
+
+def test_warm_up_shorter_than_period():
+    values = [c[4] for c in make_candles(10)]
+    rolling = RollingMean(50)
+    partial = RollingMean(50, min_periods=5)
+    for i, value in enumerate(values):
+        rolling.push(value)
+        partial.push(value)
+        assert rolling.value is None
+        assert partial.value == pandas_mean(values[:i + 1], 50, min_periods=5)
+    assert partial.value is not None
+
+
+def test_replacing_open_candle_matches_pandas():
+    candles = make_candles(80)
+    engine = IndicatorEngine({'close': [20, 50], 'volume': [24]})
+    rng = random.Random(3)
+    closed = []
+    for candle in candles:
+        # Several updates of the still-open candle before the next one opens
+        for _ in range(4):
+            live = list(candle)
+            live[4] = candle[4] * (1 + rng.uniform(-0.005, 0.005))
+            live[5] = candle[5] * rng.uniform(0.5, 1.0)
+            engine.update([live])
+            for window in (20, 50):
+                assert engine.mean('close', window) == pandas_mean([c[4] for c in closed + [live]], window)
+            assert engine.mean('volume', 24) == pandas_mean([c[5] for c in closed + [live]], 24)
+        engine.update([candle])
+        closed.append(candle)
+    
+    for window in (20, 50):
+        assert engine.mean('close', window) == pandas_mean([c[4] for c in candles], window)
+
+
+def test_older_rows_are_ignored():
+    candles = make_candles(30)
+    engine = IndicatorEngine({'close': [10]})
+    engine.update(candles)
+    engine.update(candles[:5])
+    assert engine.mean('close', 10) == pandas_mean([c[4] for c in candles], 10)
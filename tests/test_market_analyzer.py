@@ -0,0 +1,84 @@
+"""analyze_batch / build_analyses must agree with per-symbol analyze_market"""
+import dataclasses
+from datetime import datetime
+import numpy as np
+import pytest
+from market_analyzer import MarketAnalyzer
+from models import MarketData, MarketDataBatch
+
+
+NOW = datetime(2026, 1, 1)
+
+
+def market_data(symbol: str, **overrides) -> MarketData:
+    fields = dict(
+        symbol=symbol, timestamp=NOW, price=100.0, volume_24h=1000.0, volume_avg_7d=900.0,
+        open_interest=5e6, open_interest_change=0.02, funding_rate=0.0001,
+        ma_20=98.0, ma_50=95.0, ma_200=90.0, high_24h=103.0, low_24h=97.0,
+        liquidations={'total_liquidations': 10, 'long_liquidations': 6, 'short_liquidations': 4},
+        timeframe_mas={'4h': {'ma_20': 101.0, 'ma_50': 102.0, 'ma_200': None}},
+    )
+    fields.update(overrides)
+    return MarketData(**fields)
+
+
+CASES = [
+    market_data("BULL/USDT"),
+    market_data("BULL_WEAK/USDT", ma_200=120.0),
+    market_data("BEAR/USDT", price=90.0, ma_20=95.0, ma_50=98.0, ma_200=80.0),
+    market_data("NEUTRAL/USDT", price=96.0),
+    market_data("NO_FUNDING/USDT", funding_rate=None),
+    market_data("ZERO_FUNDING/USDT", funding_rate=0.0),
+    market_data("HIGH_FUNDING/USDT", funding_rate=0.007),
+    market_data("EXTREME_FUNDING/USDT", funding_rate=-0.02),
+    market_data("ZERO_VOLUME_AVG/USDT", volume_avg_7d=0.0),
+    market_data("VOLUME_SPIKE/USDT", volume_24h=2000.0),
+    market_data("NO_OI/USDT", open_interest=None, open_interest_change=None),
+    market_data("OI_SPIKE/USDT", open_interest_change=0.4),
+    market_data("NO_MAS/USDT", ma_20=None, ma_50=None, ma_200=None, timeframe_mas={}),
+    market_data("ZERO_MA/USDT", ma_20=0.0),
+    market_data("NO_RANGE/USDT", high_24h=None, low_24h=None),
+    market_data("WIDE_RANGE/USDT", high_24h=110.0, low_24h=95.0),
+    market_data("NO_LIQUIDATIONS/USDT", liquidations=None),
+    market_data("SHORT_LIQUIDATIONS/USDT",
+                liquidations={'total_liquidations': 80, 'long_liquidations': 10, 'short_liquidations': 70}),
+    market_data("EVERYTHING/USDT", volume_24h=5000.0, funding_rate=0.05, open_interest_change=0.5,
+                liquidations={'total_liquidations': 120, 'long_liquidations': 60, 'short_liquidations': 60}),
+]
+
+
+def comparable(analysis) -> dict:
+    """Every analysis field except the build time"""
+    fields = dataclasses.asdict(analysis)
+    del fields['timestamp']
+    del fields['market_data']
+    return fields
+
+
+@pytest.mark.parametrize('from_records', [True, False], ids=['records', 'columns'])
+def test_batch_matches_analyze_market(from_records):
+    analyzer = MarketAnalyzer()
+    batch = MarketDataBatch.from_market_data(CASES)
+    if not from_records:
+        # Rebuild each row from the arrays alone (timeframe MAs are not columnar)
+        batch.records = None
+    
+    batched = analyzer.build_analyses(analyzer.analyze_batch(batch))
+    
+    assert [a.symbol for a in batched] == [d.symbol for d in CASES]
+    for data, analysis in zip(CASES, batched):
+        if not from_records:
+            data = dataclasses.replace(data, timeframe_mas={})
+        assert comparable(analysis) == comparable(analyzer.analyze_market(data)), data.symbol
+
+
+def test_build_analyses_mask_selects_rows():
+    analyzer = MarketAnalyzer()
+    result = analyzer.analyze_batch(MarketDataBatch.from_market_data(CASES))
+    mask = result.volume_spike | result.funding_extreme | result.oi_spike | result.liquidation_risk
+    
+    flagged = analyzer.build_analyses(result, mask)
+    
+    expected = [d.symbol for d in CASES if analyzer.detect_anomalies(d)]
+    assert [a.symbol for a in flagged] == expected
+    assert np.count_nonzero(mask) == len(expected)
@@ -0,0 +1,51 @@
+"""Open interest history seeding: back-off after a failed seed"""
+import asyncio
+import ccxt
+import config
+from data_collector import DataCollector
+from fake_exchange import FakeBinanceServer, FakeExchange
+
+
+class FailingSeedExchange(FakeExchange):
+    def __init__(self, symbols, error: Exception):
+        super().__init__(symbols)
+        self.error = error
+
+    def fetch_open_interest_history(self, *args, **kwargs):
+        self._call('fetch_open_interest_history')
+        raise self.error
+
+
+def seed_calls(monkeypatch, error: Exception, steps: list) -> list:
+    """fetch_open_interest_history calls seen after each collection, moving the clock by each step"""
+    clock = [1000.0]
+    monkeypatch.setattr('data_collector.time.monotonic', lambda: clock[0])
+    
+    async def main():
+        server = FakeBinanceServer()
+        monkeypatch.setattr(config, 'BINANCE_FAPI_URL', await server.start())
+        collector = DataCollector()
+        collector.exchange = FailingSeedExchange(['BTC/USDT'], error)
+        calls = []
+        try:
+            for step in steps:
+                clock[0] += step
+                await collector.collect_market_data('BTC/USDT')
+                calls.append(collector.exchange.calls.get('fetch_open_interest_history', 0))
+        finally:
+            await collector.close()
+            await server.stop()
+        return calls
+    
+    return asyncio.run(main())
+
+
+def test_failed_seed_is_retried_after_the_back_off(monkeypatch):
+    retry = config.OI_HISTORY_SEED_RETRY
+    calls = seed_calls(monkeypatch, ccxt.NetworkError('boom'), [0, 1, retry / 2, retry])
+    assert calls == [1, 1, 1, 2]
+
+
+def test_unsupported_endpoint_is_not_retried(monkeypatch):
+    calls = seed_calls(monkeypatch, ccxt.NotSupported('no OI history'), [0, config.OI_HISTORY_SEED_RETRY * 10])
+    assert calls == [1, 1]
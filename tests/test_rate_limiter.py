@@ -0,0 +1,65 @@
+"""RateLimiter: priority dispatch, waiting out the window, and the budget split between processes sharing one IP"""
+import asyncio
+from rate_limiter import RateLimiter
+
+
+def test_share_splits_limit_and_server_count():
+    limiter = RateLimiter(limit=2000)
+    limiter.share(4)
+    assert limiter.budget.limit == 500
+    
+    limiter.observe_headers({'X-MBX-USED-WEIGHT-1M': '1200'})
+    assert limiter.budget.used == 300
+
+
+def short_window_limiter(monkeypatch, limit: int) -> RateLimiter:
+    """A limiter with a 0.2s window, on the event loop's clock so waits line up with the budget"""
+    monkeypatch.setattr('rate_limiter.time.time', lambda: asyncio.get_running_loop().time())
+    limiter = RateLimiter(limit=limit)
+    limiter.budget.window = 0.2
+    return limiter
+
+
+def test_queued_requests_go_out_by_priority(monkeypatch):
+    async def main():
+        limiter = short_window_limiter(monkeypatch, 3)
+        limiter.mark_visible(['BTC/USDT'])
+        limiter.budget.block(0.05, asyncio.get_running_loop().time())  # everything queues until then
+        order = []
+        
+        async def request(name: str, endpoint: str, symbol: str):
+            await limiter.acquire(endpoint, symbol=symbol)
+            order.append(name)
+        
+        background = [asyncio.create_task(request(f'background{i}', 'fetch_open_interest_history', 'ETH/USDT'))
+                      for i in range(3)]
+        await asyncio.sleep(0)
+        visible = asyncio.create_task(request('visible', 'fetch_ticker', 'BTC/USDT'))
+        await asyncio.gather(visible, *background)
+        assert order[0] == 'visible'
+        assert order[1:] == ['background0', 'background1', 'background2']
+    
+    asyncio.run(main())
+
+
+def test_waits_out_the_window_instead_of_exceeding_the_limit(monkeypatch):
+    async def main():
+        limiter = short_window_limiter(monkeypatch, 5)
+        windows = {}
+        consume = limiter._consume
+        
+        def record(weight: int):
+            consume(weight)
+            windows[limiter.budget.window_start] = limiter.budget.used
+        
+        monkeypatch.setattr(limiter, '_consume', record)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(limiter.acquire('fetch_ticker', symbol='ETH/USDT') for _ in range(12)))
+        
+        assert max(windows.values()) <= 5
+        assert len(windows) == 3 and sum(windows.values()) == 12
+        assert loop.time() - start >= limiter.budget.window  # waited for at least one full window
+        assert limiter.stats['queued'] >= 7
+    
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Session registrations on the shared RefreshScheduler"""
+import config
+from agent import CryptoAnalysisAgent
+from fake_exchange import FakeBinanceServer, FakeExchange
+from rate_limiter import RateLimiter
+from scheduler import RefreshScheduler
+
+
+def test_symbols_stay_tracked_while_any_session_wants_them():
+    scheduler = RefreshScheduler(agent=None)
+    scheduler.register('a', ['BTC/USDT', 'ETH/USDT'], 60)
+    scheduler.register('b', ['BTC/USDT', 'SOL/USDT'], 30)
+    assert scheduler.tracked == {'BTC/USDT': 30, 'ETH/USDT': 60, 'SOL/USDT': 30}
+    
+    scheduler.release('b')
+    assert scheduler.tracked == {'BTC/USDT': 60, 'ETH/USDT': 60}
+    
+    scheduler.register('a', ['ETH/USDT'], 60)
+    assert scheduler.tracked == {'ETH/USDT': 60}
+    scheduler.release('a')
+    assert scheduler.tracked == {}
+
+
+def test_lapsed_sessions_are_dropped():
+    scheduler = RefreshScheduler(agent=None)
+    scheduler._leases.lease = 0.0
+    scheduler.register('gone', ['BTC/USDT'], 60)
+    scheduler.track(['XRP/USDT'], 60)  # tracked directly, not by a session
+    
+    scheduler._due()
+    
+    assert set(scheduler.tracked) == {'XRP/USDT'}
+
+
+def bulk_cycle_calls(monkeypatch, count: int) -> dict:
+    """Exchange calls of one scheduler cycle over `count` symbols refreshed in batches of 5"""
+    monkeypatch.setattr(config, 'HISTORY_ENABLED', False)
+    symbols = [f"FAKE{i}/USDT" for i in range(count)]
+    agent = CryptoAnalysisAgent()
+    server = FakeBinanceServer()
+    try:
+        monkeypatch.setattr(config, 'BINANCE_FAPI_URL', agent._run(server.start()))
+        exchange = agent.data_collector.exchange = FakeExchange(symbols)
+        agent.data_collector.limiter = RateLimiter(limit=10**12)
+        scheduler = RefreshScheduler(agent)
+        scheduler.track(symbols, 60)
+        for start in range(0, count, 5):
+            agent._run(scheduler._refresh(symbols[start:start + 5]))
+        assert set(scheduler.store.latest()) == set(symbols)
+        return exchange.calls
+    finally:
+        agent._run(server.stop())
+        agent.close()
+
+
+def test_one_bulk_snapshot_serves_the_whole_cycle(monkeypatch):
+    for count in (config.BULK_SNAPSHOT_MIN_SYMBOLS, 2 * config.BULK_SNAPSHOT_MIN_SYMBOLS):
+        calls = bulk_cycle_calls(monkeypatch, count)
+        assert calls.get('fetch_tickers') == 1 and calls.get('fetch_funding_rates') == 1
+        assert 'fetch_ticker' not in calls and 'fetch_funding_rate' not in calls
@@ -0,0 +1,117 @@
+"""MarketStream against the local WebSocket stand-in server"""
+import asyncio
+import numpy as np
+import config
+from data_collector import DataCollector
+from fake_exchange import FakeBinanceServer, FakeExchange
+from rate_limiter import RateLimiter
+from stream import MarketStream
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+
+
+async def wait_until(condition, timeout: float = 10.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def run_with_stream(monkeypatch, test, symbols=SYMBOLS):
+    monkeypatch.setattr(config, 'STREAM_RECONNECT_MIN', 0.05)
+    
+    async def main():
+        exchange = FakeExchange(symbols)
+        server = FakeBinanceServer(exchange=exchange, stream_interval=0.02)
+        monkeypatch.setattr(config, 'BINANCE_FAPI_URL', await server.start())
+        collector = DataCollector()
+        collector.exchange = exchange
+        collector.limiter = RateLimiter(limit=10 ** 12)
+        stream = collector.stream = MarketStream(collector, url=server.ws_url)
+        try:
+            await test(stream, server, exchange)
+        finally:
+            await collector.close()
+            await server.stop()
+    
+    asyncio.run(main())
+
+
+def all_live(stream: MarketStream, symbols=SYMBOLS):
+    return lambda: all(stream.live_state(symbol) is not None for symbol in symbols)
+
+
+def last_close(stream: MarketStream, symbol: str) -> float:
+    return stream.collector.candle_store.get(symbol, config.BASE_TIMEFRAME).tail('close')[-1]
+
+
+def test_subscribes_and_applies_events(monkeypatch):
+    async def test(stream, server, exchange):
+        await stream.track(SYMBOLS)
+        stream.start()
+        await wait_until(all_live(stream))
+        
+        subscribe = server.commands[0]
+        assert subscribe['method'] == 'SUBSCRIBE'
+        assert sorted(subscribe['params']) == sorted(name for s in SYMBOLS for name in stream.streams(s))
+        
+        state = stream.live_state('BTC/USDT')
+        close = last_close(stream, 'BTC/USDT')
+        state.liquidations.clear()
+        await wait_until(lambda: last_close(stream, 'BTC/USDT') != close and state.liquidations)
+        assert state.mark_price > 0  # follows the live candle, so it keeps moving
+        assert state.funding_rate == exchange._funding('BTC/USDT')['fundingRate']
+    
+    run_with_stream(monkeypatch, test)
+
+
+def test_reconnects_resubscribes_and_backfills_the_gap(monkeypatch):
+    async def test(stream, server, exchange):
+        await stream.track(SYMBOLS)
+        stream.start()
+        await wait_until(all_live(stream))
+        ohlcv_calls = exchange.calls.get('fetch_ohlcv', 0)
+        
+        await server.drop_connections()
+        await wait_until(lambda: not stream.connected)
+        assert all(stream.live_state(symbol) is None for symbol in SYMBOLS)  # polled while disconnected
+        for symbol in SYMBOLS:
+            exchange.tick(symbol, new_candles=3)
+        await wait_until(all_live(stream))
+        
+        assert server.connections == 2 and stream.stats['disconnects'] == 1
+        resubscribe = [c for c in server.commands if c['method'] == 'SUBSCRIBE'][-1]
+        assert sorted(resubscribe['params']) == sorted(name for s in SYMBOLS for name in stream.streams(s))
+        assert exchange.calls['fetch_ohlcv'] > ohlcv_calls
+        # Closed candles opened while disconnected match the exchange
+        for symbol in SYMBOLS:
+            buffer = stream.collector.candle_store.get(symbol, config.BASE_TIMEFRAME)
+            expected = np.array(exchange.fetch_ohlcv(symbol, config.BASE_TIMEFRAME, limit=len(buffer)))
+            assert np.array_equal(buffer.tail('close')[:-1], expected[:-1, 4])
+    
+    run_with_stream(monkeypatch, test)
+
+
+def test_symbols_over_the_stream_limit_are_polled(monkeypatch):
+    monkeypatch.setattr(config, 'STREAM_MAX_STREAMS', 6)  # two symbols of three streams
+    symbols = SYMBOLS + ['SOL/USDT']
+    
+    async def test(stream, server, exchange):
+        stream.start()
+        await wait_until(lambda: stream.connected)
+        assert await stream.track(symbols) == ['SOL/USDT']
+        assert stream.tracked == SYMBOLS
+        await wait_until(all_live(stream))
+        assert len(server.commands[0]['params']) == 6
+        
+        ohlcv_calls = exchange.calls.get('fetch_ohlcv', 0)
+        data = await stream.collector.collect_market_data('SOL/USDT')
+        assert data.price and exchange.calls['fetch_ohlcv'] > ohlcv_calls
+        
+        # Untracking a symbol frees room for the one left out
+        await stream.untrack(['ETH/USDT'])
+        assert await stream.track(['SOL/USDT']) == []
+        await wait_until(all_live(stream, ['BTC/USDT', 'SOL/USDT']))
+    
+    run_with_stream(monkeypatch, test, symbols)